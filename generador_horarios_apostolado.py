@@ -1,9 +1,38 @@
 import streamlit as st
-import pandas as pd
-from ortools.sat.python import cp_model
 from datetime import datetime
-import matplotlib.pyplot as plt
 import io
+import time
+
+# Solo módulos ligeros al arrancar: OR-Tools se importa al pulsar generar
+# y xlsxwriter al descargar, porque Streamlit re-ejecuta el script en cada interacción
+from horarios.alternativas import DIFERENCIA_MINIMA, MAX_ALTERNATIVAS, comparar_alternativas
+from horarios.aulas import capacidades_aulas, tiene_aulas
+from horarios.cache import CacheSoluciones, clave_solucion
+from horarios.calidad import NOMBRES_TERMINOS, PESOS_CALIDAD, evaluar_calidad
+from horarios.datos import cargar_datos_en_cache, huella_archivo
+from horarios.diagnostico import HORAS_MAXIMAS_PROFESOR, comprobar_viabilidad, diagnosticar, texto_grupo
+from horarios.exportar import (
+    MIME_EXCEL,
+    PARQUET_DISPONIBLE,
+    generar_csv,
+    generar_excel,
+    generar_parquet,
+    huella_solucion,
+)
+from horarios.indices import construir_indices
+from horarios.medicion import (
+    ETAPAS,
+    NOMBRES_SOLVER,
+    RUTA_LOG,
+    cronometrar,
+    registrar_metricas,
+    tiempos_resolucion,
+)
+from horarios.reglas import activa_por_defecto, cargar_reglas, compilar_reglas, peso_regla
+from horarios.rejilla import REJILLA_POR_DEFECTO, cargar_rejilla
+from horarios.sesiones import DURACIONES_POR_DEFECTO, filas_compatibles, sesiones_por_fila
+from horarios.tablas import rejillas, tabla_larga
+from horarios.trabajos import ColaTrabajos
 
 st.set_page_config(
     page_title="Generador de Horarios Flexible - Apostolado del Sagrado Corazón",
@@ -19,6 +48,22 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Cola de generaciones compartida por todas las sesiones del servidor
+@st.cache_resource
+def cola_trabajos():
+    return ColaTrabajos()
+
+
+# Una generación enviada antes de recargar la página sigue en la cola: se recupera por la dirección
+id_en_direccion = st.query_params.get("trabajo")
+if id_en_direccion and "trabajo" not in st.session_state:
+    trabajo_recuperado = cola_trabajos().obtener(id_en_direccion)
+    if trabajo_recuperado is None:
+        del st.query_params["trabajo"]
+    else:
+        st.session_state["trabajo"] = id_en_direccion
+        st.session_state.setdefault("df", trabajo_recuperado.datos["df"])
+
 tabs = st.tabs([
     "📁 Cargar Datos",
     "🔍 Diagnóstico",
@@ -30,101 +75,237 @@ tabs = st.tabs([
 
 # -----------------------------------------------
 # 📁 TAB 1: CARGA DE DATOS
+
+# Se analiza una vez por contenido (clave: hash de los bytes), no en cada re-ejecución
+@st.cache_data(max_entries=8, show_spinner="📖 Leyendo archivo...")
+def leer_datos(huella, _contenido, nombre, franjas_por_hora):
+    return cargar_datos_en_cache(_contenido, nombre, huella=huella, franjas_por_hora=franjas_por_hora)
+
+
+@st.cache_data(show_spinner=False)
+def leer_rejilla(contenido, nombre):
+    return cargar_rejilla(io.BytesIO(contenido), nombre)
+
+
+def rejilla_actual():
+    """Rejilla elegida en 📁 Cargar Datos (la de siempre si no se ha subido ninguna)."""
+    return st.session_state.get("rejilla_configurada", REJILLA_POR_DEFECTO)
+
+
 with tabs[0]:
     st.header("📁 Subir archivo de datos")
+    archivo_rejilla = st.file_uploader(
+        "🗓️ Rejilla semanal (JSON o YAML, opcional): días, franjas, recreos y jornada de cada curso. "
+        "Si no se sube, de lunes a viernes de 9:00 a 14:00 en franjas de 30 minutos",
+        type=["json", "yaml", "yml"],
+        key="archivo_rejilla"
+    )
+    rejilla = REJILLA_POR_DEFECTO
+    if archivo_rejilla:
+        try:
+            rejilla = leer_rejilla(archivo_rejilla.getvalue(), archivo_rejilla.name)
+        except Exception as e:
+            st.error(f"❌ Error en la rejilla: {e}")
+    st.session_state["rejilla_configurada"] = rejilla
+    with st.expander(
+        f"🗓️ Rejilla: {len(rejilla.dias)} días × {len(rejilla.franjas_por_dia)} franjas "
+        f"de {rejilla.minutos_franja} min · recreo {', '.join(rejilla.horas_recreo) or 'ninguno'}"
+    ):
+        st.write(f"**Días**: {', '.join(rejilla.dias)}")
+        st.write(f"**Franjas**: {', '.join(rejilla.franjas_por_dia)}")
+        st.write(f"**Cada hora semanal son** {rejilla.franjas_por_hora} franja(s)")
+        for jornada in rejilla.jornadas:
+            cursos = jornada.get("cursos", "todos")
+            st.write(
+                f"• Jornada de {cursos if isinstance(cursos, str) else ', '.join(cursos)}: "
+                f"{jornada.get('desde', 'inicio')}-{jornada.get('hasta', 'fin')}"
+                + (f" ({', '.join(jornada['dias'])})" if jornada.get("dias") else "")
+            )
+
     archivo = st.file_uploader(
-        "Sube un archivo Excel/CSV con columnas: Profesor, Asignatura, Curso, Horas por semana",
+        "Sube un archivo Excel/CSV con columnas: Profesor, Asignatura, Curso, Horas por semana "
+        "(y, opcionalmente, Aula y Capacidad aula)",
         type=["xlsx", "csv"]
     )
 
     if archivo:
         try:
-            df = pd.read_excel(archivo) if archivo.name.endswith(".xlsx") else pd.read_csv(archivo)
+            contenido = archivo.getvalue()
+            huella_datos = huella_archivo(contenido)
+            tiempos_carga = {}
+            with cronometrar(tiempos_carga, "carga"):
+                df = leer_datos(huella_datos, contenido, archivo.name, rejilla.franjas_por_hora)
+            # Solo cuenta la primera lectura de cada archivo; después sale de la caché
+            if st.session_state.get("huella_datos") != huella_datos:
+                st.session_state["huella_datos"] = huella_datos
+                st.session_state["tiempo_carga"] = tiempos_carga["carga"]
             
-            # Validar columnas
-            columnas_requeridas = ["Profesor", "Asignatura", "Curso", "Horas por semana"]
-            columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
+            st.success(f"✅ Archivo '{archivo.name}' cargado correctamente.")
+            st.session_state["df"] = df
             
-            if columnas_faltantes:
-                st.error(f"❌ Faltan las siguientes columnas: {', '.join(columnas_faltantes)}")
-            else:
-                # Limpiar datos
-                df["Profesor"] = df["Profesor"].astype(str).str.strip()
-                df["Asignatura"] = df["Asignatura"].astype(str).str.strip()
-                df["Curso"] = df["Curso"].astype(str).str.strip()
-                
-                # Convertir comas a puntos en horas
-                if df["Horas por semana"].dtype == 'object':
-                    df["Horas por semana"] = df["Horas por semana"].astype(str).str.replace(',', '.').astype(float)
-                
-                # Convertir a franjas de 30 minutos
-                df["Franjas_necesarias"] = (df["Horas por semana"] * 2).astype(int)
-                
-                st.success(f"✅ Archivo '{archivo.name}' cargado correctamente.")
-                st.session_state["df"] = df
-                
-                st.subheader("🔍 Vista previa de datos")
-                df_preview = df.copy()
-                df_preview["Franjas de 30min"] = df_preview["Franjas_necesarias"]
-                st.dataframe(df_preview, use_container_width=True, height=400)
+            st.subheader("🔍 Vista previa de datos")
+            df_preview = df.copy()
+            df_preview[f"Franjas de {rejilla.minutos_franja}min"] = df_preview["Franjas_necesarias"]
+            st.dataframe(df_preview, use_container_width=True, height=400)
                 
+        except ValueError as e:
+            st.error(f"❌ {e}")
         except Exception as e:
             st.error(f"❌ Error al procesar el archivo: {e}")
 
 # -----------------------------------------------
 # 🔍 TAB 2: DIAGNÓSTICO
+
+MAX_PROBLEMAS = 20  # problemas de viabilidad que se listan como máximo
+SESIONES_OFRECIDAS = 3  # duraciones de sesión que se ofrecen, desde la clase más corta
+
+@st.cache_data(show_spinner=False)
+def leer_reglas_por_defecto():
+    return cargar_reglas()
+
+
+@st.cache_data(show_spinner=False)
+def leer_reglas_subidas(contenido, nombre):
+    return cargar_reglas(io.BytesIO(contenido), nombre)
+
+
+def clave_casilla(regla, flexibilidad):
+    return f"regla_{regla['id']}_{flexibilidad}"
+
+
+def clave_peso(regla):
+    return f"peso_{regla['id']}"
+
+
+def clave_sesiones(rejilla):
+    # Una casilla por duración de franja: las opciones en minutos cambian con la rejilla
+    return f"minutos_sesion_{rejilla.minutos_franja}"
+
+
+def duraciones_elegidas():
+    """Duraciones de sesión (en franjas) elegidas en ⚙️ Configurar; vacío si se coloca franja a franja."""
+    rejilla = rejilla_actual()
+    minutos = st.session_state.get(clave_sesiones(rejilla), DURACIONES_POR_DEFECTO)
+    return rejilla.duraciones_en_franjas(minutos) if minutos else ()
+
+
+def configuracion_actual():
+    """Reglas, casillas, pesos y flexibilidad elegidos en ⚙️ Configurar, leídos del estado de los widgets.
+
+    El diagnóstico se dibuja antes que esa pestaña, así que no puede esperar a
+    que guarde ``restricciones`` en esta misma ejecución.
+    """
+    flexibilidad = st.session_state.get("nivel_flexibilidad", "Moderado")
+    reglas = st.session_state.get("reglas") or leer_reglas_por_defecto()
+    restricciones = {
+        regla["id"]: st.session_state.get(clave_casilla(regla, flexibilidad), activa_por_defecto(regla, flexibilidad))
+        for regla in reglas
+    }
+    pesos_reglas = {regla["id"]: st.session_state.get(clave_peso(regla), peso_regla(regla)) for regla in reglas}
+    return reglas, restricciones, flexibilidad, pesos_reglas
+
+
 with tabs[1]:
     st.header("🔍 Diagnóstico de Viabilidad")
     if "df" not in st.session_state:
         st.info("🔔 Por favor, sube primero un archivo en la pestaña 📁 Cargar Datos.")
     else:
         df = st.session_state["df"]
+        rejilla = rejilla_actual()
+        diagnostico = diagnosticar(df, rejilla)
         
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("👨‍🏫 Profesores únicos", df['Profesor'].nunique())
-            st.metric("🎓 Cursos únicos", df['Curso'].nunique())
+            st.metric("👨‍🏫 Profesores únicos", diagnostico["profesores"])
+            st.metric("🎓 Cursos únicos", diagnostico["cursos"])
             
         with col2:
-            st.metric("📚 Asignaturas únicas", df['Asignatura'].nunique())
-            st.metric("⏰ Franjas totales necesarias", int(df['Franjas_necesarias'].sum()))
+            st.metric("📚 Asignaturas únicas", diagnostico["asignaturas"])
+            st.metric("⏰ Franjas totales necesarias", diagnostico["franjas_necesarias"])
         
         # Análisis de capacidad corregido (descontando recreo)
-        franjas_por_curso = 5 * 9  # 5 días x 9 franjas útiles (10 - 1 recreo)
-        total_cursos = df["Curso"].nunique()
-        capacidad_total = franjas_por_curso * total_cursos
-        franjas_necesarias = df['Franjas_necesarias'].sum()
-        
         st.subheader("📊 Análisis de Capacidad")
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("📅 Franjas útiles por curso", franjas_por_curso)
+            franjas_curso = diagnostico["franjas_curso"]
+            st.metric(
+                "📅 Franjas útiles por curso",
+                diagnostico["franjas_por_curso"] if franjas_curso.nunique() <= 1
+                else f"{franjas_curso.min()}-{franjas_curso.max()}"
+            )
         with col2:
-            st.metric("🏫 Capacidad total", capacidad_total)
+            st.metric("🏫 Capacidad total", diagnostico["capacidad_total"])
         with col3:
-            porcentaje_uso = (franjas_necesarias / capacidad_total) * 100
-            st.metric("📈 % de ocupación", f"{porcentaje_uso:.1f}%")
+            st.metric("📈 % de ocupación", f"{diagnostico['porcentaje_uso']:.1f}%")
         
-        st.info("🔔 **Recreo descontado**: 12:00-12:30 diariamente (5 franjas menos)")
+        st.info(
+            f"🔔 **Recreo descontado**: {', '.join(rejilla.horas_recreo)} "
+            f"({len(rejilla.franjas_recreo)} franjas menos)"
+            + (f" · 🗓️ **{len(rejilla.jornadas)} jornadas** limitan las franjas de algunos cursos"
+               if rejilla.jornadas else "")
+        )
         
         # Análisis por profesor
         st.subheader("👨‍🏫 Carga por Profesor")
-        carga_profesor = df.groupby("Profesor")["Horas por semana"].sum().sort_values(ascending=False)
-        profesores_sobrecargados = carga_profesor[carga_profesor > 25]
+        profesores_sobrecargados = diagnostico["profesores_sobrecargados"]
         
         if not profesores_sobrecargados.empty:
-            st.warning("⚠️ Profesores con más de 25 horas semanales:")
+            st.warning(f"⚠️ Profesores con más de {HORAS_MAXIMAS_PROFESOR} horas semanales:")
             for prof, horas in profesores_sobrecargados.items():
                 st.write(f"• {prof}: {horas} horas")
         
-        if porcentaje_uso <= 80:
+        # Aulas compartidas: plazas-franja que piden sus clases frente a las que ofrecen
+        if diagnostico["aulas"]:
+            st.subheader("🏫 Ocupación de Aulas")
+            ocupacion_aulas = diagnostico["ocupacion_aulas"]
+            capacidades = capacidades_aulas(df)
+            st.dataframe(
+                [
+                    {"Aula": aula, "Capacidad": capacidades[aula], "% de ocupación": round(porcentaje, 1)}
+                    for aula, porcentaje in ocupacion_aulas.items()
+                ],
+                use_container_width=True,
+            )
+            saturadas = ocupacion_aulas[ocupacion_aulas > 100]
+            if not saturadas.empty:
+                st.warning(f"⚠️ Aulas con más clases que plazas: {', '.join(map(str, saturadas.index))}")
+        
+        if diagnostico["viable"]:
             st.success("✅ La carga horaria es viable.")
         else:
             st.error("❌ Sobrecarga horaria detectada.")
+        
+        # Comprobación previa con las reglas configuradas: lo imposible no llega al solver
+        st.subheader("🧪 Comprobación de Viabilidad")
+        reglas, restricciones, flexibilidad, pesos_reglas = configuracion_actual()
+        inicio_comprobacion = time.perf_counter()
+        compiladas = compilar_reglas(
+            reglas, df, rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo, restricciones, flexibilidad,
+            pesos=pesos_reglas, jornadas=rejilla.jornadas
+        )
+        problemas = comprobar_viabilidad(
+            df, compiladas, rejilla.dias, rejilla.franjas_por_dia, duraciones=duraciones_elegidas()
+        )
+        duracion_comprobacion = (time.perf_counter() - inicio_comprobacion) * 1000
+        
+        st.caption(
+            f"Por fila, profesor, curso y día, frente a las franjas que dejan libres la jornada, el recreo y las "
+            f"{len(compiladas.aplicadas) - len(compiladas.blandas)} reglas obligatorias activas "
+            f"(nivel '{flexibilidad}') · {duracion_comprobacion:.0f} ms"
+        )
+        if problemas:
+            st.error(f"❌ **{len(problemas)} imposibilidades detectadas**: no se podrá generar el horario así")
+            for problema in problemas[:MAX_PROBLEMAS]:
+                st.write(f"• {texto_grupo(problema, reglas)}")
+            if len(problemas) > MAX_PROBLEMAS:
+                st.caption(f"… y {len(problemas) - MAX_PROBLEMAS} más")
+        else:
+            st.success("✅ No se detectan imposibilidades evidentes con la configuración actual.")
 
 # -----------------------------------------------
 # ⚙️ TAB 3: CONFIGURAR RESTRICCIONES
+
 with tabs[2]:
     st.header("⚙️ Configurar Restricciones")
     
@@ -137,72 +318,268 @@ with tabs[2]:
             "Selecciona el nivel de restricciones:",
             options=["Muy Estricto", "Estricto", "Moderado", "Flexible", "Muy Flexible"],
             value="Moderado",
-            help="Más flexible = más posibilidades de encontrar solución"
+            help="Más flexible = más posibilidades de encontrar solución",
+            key="nivel_flexibilidad"
         )
         
         st.session_state["flexibilidad"] = flexibilidad
         
         st.subheader("📋 Restricciones Específicas")
         
+        archivo_reglas = st.file_uploader(
+            "Archivo de reglas (JSON, YAML o Excel). Si no se sube, se usa reglas_restricciones.json",
+            type=["json", "yaml", "yml", "xlsx"],
+            key="archivo_reglas"
+        )
+        try:
+            if archivo_reglas:
+                reglas = leer_reglas_subidas(archivo_reglas.getvalue(), archivo_reglas.name)
+            else:
+                reglas = leer_reglas_por_defecto()
+        except Exception as e:
+            st.error(f"❌ Error en el archivo de reglas: {e}")
+            reglas = leer_reglas_por_defecto()
+        
+        st.session_state["reglas"] = reglas
+        
+        # Una casilla por regla, repartidas por grupo como antes
+        restricciones = {}
         col1, col2 = st.columns(2)
+        for columna, grupo in ((col1, "Profesores"), (col2, "Asignaturas")):
+            with columna:
+                st.write(f"**Restricciones de {grupo}:**")
+                for regla in reglas:
+                    if regla.get("grupo", "Profesores") == grupo:
+                        restricciones[regla["id"]] = st.checkbox(
+                            regla.get("descripcion", regla["id"]),
+                            value=activa_por_defecto(regla, flexibilidad),
+                            key=clave_casilla(regla, flexibilidad)
+                        )
         
-        with col1:
-            st.write("**Restricciones de Profesores:**")
-            
-            # Ana Inaraja
-            ana_restriccion = st.checkbox(
-                "Ana Inaraja: Solo martes, miércoles, jueves 11:00-14:00",
-                value=(flexibilidad in ["Muy Estricto", "Estricto"])
-            )
-            
-            # Juan Carlos Ed. Física
-            jc_restriccion = st.checkbox(
-                "Juan Carlos: Ed. Física solo martes/miércoles 9:00-11:00",
-                value=(flexibilidad in ["Muy Estricto", "Estricto"])
-            )
-            
-            # Mª José López
-            mariajose_restriccion = st.checkbox(
-                "Mª José López: No puede jueves 11:00-12:00",
-                value=(flexibilidad != "Muy Flexible")
-            )
+        st.subheader("🧱 Sesiones")
+        rejilla = rejilla_actual()
+        minutos_franja = rejilla.minutos_franja
+        por_defecto = rejilla.duraciones_en_franjas(DURACIONES_POR_DEFECTO)
+        ofrecidas = range(rejilla.franjas_clase_minima, rejilla.franjas_clase_minima + SESIONES_OFRECIDAS)
+        st.multiselect(
+            "Duraciones de las sesiones seguidas en que se divide cada asignatura",
+            options=[franjas * minutos_franja for franjas in sorted(set(ofrecidas) | set(por_defecto))],
+            default=[franjas * minutos_franja for franjas in por_defecto],
+            format_func=lambda minutos: f"{minutos} min ({minutos // minutos_franja} franjas)",
+            help="Por ejemplo, con franjas de 30 min, 2,5 h semanales con 60 y 90 min son una sesión de 60 "
+                 "y otra de 90 min, en días distintos. Sin ninguna duración, las clases se colocan franja a "
+                 f"franja ({minutos_franja} min). Las asignaturas con un mínimo diario obligatorio van siempre "
+                 "franja a franja.",
+            key=clave_sesiones(rejilla)
+        )
         
-        with col2:
-            st.write("**Restricciones de Asignaturas:**")
-            
-            # Inglés-Fernando/Iván
-            ingles_restriccion = st.checkbox(
-                "Fernando/Iván libres durante clases de Inglés específicas",
-                value=(flexibilidad in ["Muy Estricto", "Estricto"])
-            )
-            
-            # Toni Coro
-            coro_restriccion = st.checkbox(
-                "Toni: Coro solo 10:00-11:00",
-                value=(flexibilidad != "Muy Flexible")
-            )
-            
-            # Andrea Inglés Infantil
-            andrea_restriccion = st.checkbox(
-                "Andrea: Una clase diaria de Inglés Infantil",
-                value=(flexibilidad in ["Muy Estricto", "Estricto", "Moderado"])
+        # Reglas blandas y calidad: el solver busca el horario con menor penalización total
+        with st.expander("⚖️ Restricciones blandas y calidad del horario"):
+            st.caption(
+                "Con peso 0 la regla es obligatoria; con peso mayor que 0 puede incumplirse pagando ese "
+                "peso por cada franja de la rejilla. Los términos de calidad se penalizan igual."
             )
+            pesos_reglas = {}
+            for regla in reglas:
+                pesos_reglas[regla["id"]] = st.number_input(
+                    regla.get("descripcion", regla["id"]),
+                    min_value=0,
+                    value=peso_regla(regla),
+                    step=1,
+                    disabled=not restricciones[regla["id"]],
+                    key=clave_peso(regla)
+                )
+            st.write("**Calidad del horario:**")
+            pesos_calidad = {}
+            for termino, peso in PESOS_CALIDAD.items():
+                pesos_calidad[termino] = st.number_input(
+                    NOMBRES_TERMINOS[termino], min_value=0, value=peso, step=1, key=f"peso_calidad_{termino}"
+                )
         
         # Guardar configuración
-        st.session_state["restricciones"] = {
-            "ana_horario": ana_restriccion,
-            "juan_carlos_ef": jc_restriccion,
-            "mariajose_jueves": mariajose_restriccion,
-            "ingles_fernando_ivan": ingles_restriccion,
-            "toni_coro": coro_restriccion,
-            "andrea_diaria": andrea_restriccion
-        }
+        st.session_state["restricciones"] = restricciones
+        st.session_state["pesos_reglas"] = pesos_reglas
+        st.session_state["pesos_calidad"] = pesos_calidad
         
         if flexibilidad in ["Flexible", "Muy Flexible"]:
             st.info("🔔 **Modo flexible activado**: Se priorizará encontrar una solución viable.")
 
 # -----------------------------------------------
 # 🚀 TAB 4: GENERAR HORARIO FLEXIBLE
+
+@st.cache_resource
+def cache_soluciones():
+    return CacheSoluciones()
+
+
+def resolver_trabajo(trabajo, df, compiladas, indices, estadisticas, rejilla, flexibilidad, semilla,
+                     por_componentes, anterior, fijar_no_afectados, pesos_calidad, duraciones, clave, cache,
+                     tiempo_carga, hilos, alternativas=1, diferencia=DIFERENCIA_MINIMA):
+    """Construye y resuelve el modelo en un hilo de la cola de trabajos (sin llamar a Streamlit).
+
+    ``anterior`` es ``(df, asignacion)`` del último horario para re-optimizar
+    solo lo afectado, o ``None``. Devuelve ``{status, asignacion, estadisticas}``;
+    con varias ``alternativas``, también la lista ordenada en ``alternativas``.
+    """
+    inicio_construccion = time.perf_counter()
+    previa = None
+    if por_componentes and anterior is None and alternativas <= 1:
+        from horarios.descomposicion import ResolucionPorComponentes
+        
+        # Un modelo por componente, construido y resuelto en procesos aparte
+        ejecucion = ResolucionPorComponentes(
+            df, rejilla.dias, rejilla.franjas_por_dia, compiladas, flexibilidad, semilla, hilos,
+            indices=indices, pesos=pesos_calidad, duraciones=duraciones, rejilla=rejilla,
+            registro_busqueda=bool(RUTA_LOG)
+        )
+        estadisticas["componentes"] = ejecucion.componentes
+    else:
+        from horarios.incremental import alinear_asignacion, filas_afectadas, preparar_incremental
+        from horarios.modelo import construir_modelo, tamano_modelo
+        from horarios.resolucion import ResolucionEnCurso, configurar_solver
+        
+        model, variables, objetivo = construir_modelo(
+            df, rejilla.dias, rejilla.franjas_por_dia, compiladas, indices, pesos_calidad, duraciones, rejilla
+        )
+        
+        # Modo incremental: el horario anterior como pista y vecindario acotado
+        if anterior is not None:
+            df_anterior, asignacion_anterior = anterior
+            previa, emparejadas, anterior_de = alinear_asignacion(df_anterior, asignacion_anterior, df)
+            # Las filas que no forman las sesiones pedidas se vuelven a colocar
+            compatibles = None
+            if duraciones:
+                compatibles = filas_compatibles(
+                    previa, sesiones_por_fila(df["Franjas_necesarias"], duraciones, compiladas),
+                    len(rejilla.franjas_por_dia)
+                )
+            afectadas = filas_afectadas(
+                df_anterior, df, previa, emparejadas, anterior_de, compiladas.permitidas, compatibles
+            )
+            estadisticas["filas_afectadas"] = int(afectadas.sum())
+            estadisticas["filas_fijadas"] = preparar_incremental(
+                model, variables, previa, afectadas, fijar_no_afectados, objetivo
+            )
+        estadisticas.update(tamano_modelo(model))
+        
+        forma = (len(df), rejilla.franjas_totales)
+        if alternativas > 1:
+            from horarios.alternativas import ResolucionAlternativas
+            
+            ejecucion = ResolucionAlternativas(
+                model, variables, forma, flexibilidad, alternativas, semilla, hilos, diferencia,
+                registro_busqueda=bool(RUTA_LOG)
+            )
+        else:
+            solver = configurar_solver(flexibilidad, semilla, hilos, registro_busqueda=bool(RUTA_LOG))
+            ejecucion = ResolucionEnCurso(model, solver, variables, forma)
+        del model, variables, objetivo
+    estadisticas["tiempo_construccion"] += time.perf_counter() - inicio_construccion
+    trabajo.asignar_ejecucion(ejecucion)
+    ejecucion.esperar()
+    
+    # Resultado materializado: solo la matriz de asignación, sin objetos del solver
+    status = ejecucion.estado
+    asignacion = ejecucion.asignacion
+    estadisticas.update(
+        tiempo_resolucion=ejecucion.tiempo_resolucion,
+        tiempo_primera=ejecucion.seguimiento.tiempo_primera,
+        hilos=ejecucion.hilos,
+        detenida=ejecucion.detenida,
+        tiempos=tiempos_resolucion(ejecucion, estadisticas["tiempo_construccion"]),
+        solver=ejecucion.estadisticas_solver,
+    )
+    if hasattr(ejecucion, "componentes"):
+        estadisticas.update(ejecucion.tamano)
+    if previa is not None and asignacion is not None:
+        estadisticas["franjas_cambiadas"] = int(((previa == 1) & (asignacion == 0)).sum())
+    if getattr(ejecucion, "estancada", False):
+        estadisticas["estancada"] = True
+    ranking = None
+    if alternativas > 1 and ejecucion.asignaciones:
+        # Varias alternativas: la de menor penalización pasa a ser el horario
+        ranking = comparar_alternativas(
+            ejecucion.asignaciones, df, len(rejilla.franjas_por_dia), compiladas, indices, pesos_calidad, rejilla
+        )
+        asignacion = ranking[0]["asignacion"]
+        estadisticas["penalizaciones"] = ranking[0]["penalizaciones"]
+        estadisticas["alternativas"] = [
+            {campo: alternativa[campo] for campo in ("penalizacion", "distinta_de_la_mejor", "distinta_minima")}
+            for alternativa in ranking
+        ]
+    elif asignacion is not None:
+        estadisticas["penalizaciones"] = evaluar_calidad(
+            asignacion, df, len(rejilla.franjas_por_dia), compiladas, indices, pesos_calidad, previa, rejilla
+        )
+    
+    # Horario imposible: buscar qué reglas, profesores y cursos chocan
+    if status == "INFEASIBLE" and not ejecucion.detenida:
+        from horarios.explicacion import explicar_inviabilidad
+        
+        estadisticas["conflicto"] = explicar_inviabilidad(
+            df, rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo, compiladas, indices
+        )
+    resultado = {"status": status, "asignacion": asignacion, "estadisticas": estadisticas}
+    if ranking is not None:
+        resultado["alternativas"] = ranking
+    
+    # Una búsqueda detenida a mano no es la mejor respuesta posible: no se guarda
+    if clave is not None and not ejecucion.detenida:
+        cache.guardar(clave, status, asignacion, estadisticas)
+    registrar_metricas({
+        "origen": "app", "trabajo": trabajo.id, "status": status, "filas": len(df), "flexibilidad": flexibilidad,
+        "tiempos": {"carga": tiempo_carga, **estadisticas["tiempos"]},
+        **{clave_metrica: estadisticas.get(clave_metrica) for clave_metrica in
+           ("solver", "variables", "restricciones", "terminos_objetivo", "hilos", "componentes", "alternativas")},
+    })
+    return resultado
+
+
+@st.fragment(run_every=1.0)
+def progreso_trabajo(id_trabajo):
+    """Progreso de una generación en la cola; al terminar vuelve a ejecutar la página para mostrar el resultado."""
+    cola = cola_trabajos()
+    trabajo = cola.obtener(id_trabajo)
+    if trabajo is None or trabajo.terminado:
+        st.rerun()
+    
+    if trabajo.estado == "en_cola":
+        st.info(
+            f"⏳ **En cola**: {cola.en_curso()} generaciones en marcha y {cola.posicion(trabajo)} esperando "
+            f"por delante · el servidor resuelve {cola.max_simultaneos} a la vez"
+        )
+        if st.button("✖️ Cancelar"):
+            trabajo.cancelar()
+            st.rerun()
+    else:
+        ejecucion = trabajo.ejecucion
+        if ejecucion is None:
+            st.info("🔄 **Construyendo el modelo...**")
+        else:
+            seguimiento = ejecucion.seguimiento
+            if hasattr(ejecucion, "componentes"):
+                avance = f"**Componentes resueltas**: {seguimiento.soluciones} de {seguimiento.total}"
+            elif hasattr(ejecucion, "asignaciones"):
+                avance = (
+                    f"**Alternativa** {min(ejecucion.alternativas + 1, ejecucion.total)} de {ejecucion.total}"
+                    + (f" · **Objetivo**: {seguimiento.objetivo:g}" if seguimiento.soluciones else "")
+                )
+            else:
+                avance = f"**Soluciones encontradas**: {seguimiento.soluciones}" + (
+                    f" · **Objetivo**: {seguimiento.objetivo:g} (cota {seguimiento.cota:g})"
+                    if seguimiento.soluciones else ""
+                )
+            st.info(
+                f"🔄 **Buscando horario...** {seguimiento.tiempo:.0f} s de {ejecucion.limite:.0f} s · " + avance
+            )
+            if st.button("⏹️ Detener y conservar la mejor solución"):
+                trabajo.cancelar()
+    st.caption(
+        f"🆔 Generación `{trabajo.id}`: puedes seguir usando la aplicación o recargar la página; "
+        "el resultado se conserva en esta dirección"
+    )
+
+
 with tabs[3]:
     st.header("🚀 Generar Horario")
     
@@ -211,225 +588,319 @@ with tabs[3]:
     else:
         df = st.session_state["df"]
         
-        # Configuración de horario
-        dias = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes"]
-        franjas_por_dia = [
-            "09:00-09:30", "09:30-10:00", "10:00-10:30", "10:30-11:00", "11:00-11:30", 
-            "11:30-12:00", "12:00-12:30", "12:30-13:00", "13:00-13:30", "13:30-14:00"
-        ]
-        franjas_totales = len(dias) * len(franjas_por_dia)
-        
-        # 🔔 RECREO: 12:00-12:30 todos los días (franja 6 de cada día)
-        franja_recreo = 6  # Posición de "12:00-12:30" en la lista
-        franjas_recreo = [d * len(franjas_por_dia) + franja_recreo for d in range(len(dias))]
+        # Rejilla elegida en 📁 Cargar Datos (por defecto, la construida al importar horarios.rejilla)
+        rejilla = rejilla_actual()
         
         # Mostrar configuración actual
         flexibilidad = st.session_state.get("flexibilidad", "Moderado")
         restricciones = st.session_state.get("restricciones", {})
+        pesos_reglas = st.session_state.get("pesos_reglas", {})
+        pesos_calidad = st.session_state.get("pesos_calidad", PESOS_CALIDAD)
+        duraciones = duraciones_elegidas()
         
         st.info(f"📋 **Nivel de flexibilidad**: {flexibilidad}")
-        st.info(f"🔔 **Recreo programado**: 12:00-12:30 (lunes a viernes)")
+        st.info(
+            f"🗓️ **Rejilla**: {', '.join(rejilla.dias)} · {len(rejilla.franjas_por_dia)} franjas "
+            f"de {rejilla.minutos_franja} min ({rejilla.franjas_por_dia[0].split('-')[0]}-"
+            f"{rejilla.franjas_por_dia[-1].split('-')[1]})"
+            + (f" · {len(rejilla.jornadas)} jornadas por curso" if rejilla.jornadas else "")
+        )
+        st.info(f"🔔 **Recreo programado**: {', '.join(rejilla.horas_recreo) or 'ninguno'}")
+        
+        reglas = st.session_state.get("reglas") or leer_reglas_por_defecto()
         
         restricciones_activas = sum(restricciones.values()) if restricciones else 0
-        st.info(f"🔧 **Restricciones activas**: {restricciones_activas} de 6")
+        st.info(f"🔧 **Restricciones activas**: {restricciones_activas} de {len(reglas)}")
+        
+        # Generación de esta sesión en la cola (también la recuperada tras recargar la página)
+        trabajo_sesion = None
+        if "trabajo" in st.session_state:
+            trabajo_sesion = cola_trabajos().obtener(st.session_state["trabajo"])
+            if trabajo_sesion is None:
+                st.warning("⌛ La última generación ya no está disponible en el servidor; vuelve a generar el horario.")
+                del st.session_state["trabajo"]
+                if "trabajo" in st.query_params:
+                    del st.query_params["trabajo"]
+        trabajo_activo = trabajo_sesion if trabajo_sesion is not None and not trabajo_sesion.terminado else None
         
         # Botones de generación
-        col1, col2 = st.columns([1, 1])
+        # Re-optimizar parte del horario anterior: solo tiene sentido con la misma rejilla
+        hay_horario_previo = "asignacion" in st.session_state and st.session_state.get("rejilla") == rejilla
+        col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
-            generar_horario = st.button("🚀 Generar Horario", type="primary")
+            generar_horario = st.button("🚀 Generar Horario", type="primary", disabled=trabajo_activo is not None)
         with col2:
-            regenerar_horario = st.button("🔄 Generar Versión Alternativa")
+            regenerar_horario = st.button("🔄 Generar Versión Alternativa", disabled=trabajo_activo is not None)
+        with col3:
+            reoptimizar_horario = st.button(
+                "♻️ Re-optimizar cambios",
+                disabled=not hay_horario_previo or trabajo_activo is not None,
+                help="Parte del último horario generado y solo recoloca lo afectado por los cambios"
+            )
+            fijar_no_afectados = st.checkbox(
+                "Fijar cursos y profesores no afectados",
+                value=True,
+                disabled=not hay_horario_previo
+            )
         
-        if generar_horario or regenerar_horario:
-            with st.spinner("🔄 Generando horario optimizado..."):
-                
-                # Crear modelo
-                model = cp_model.CpModel()
-                variables = {}
-                
-                # Variables binarias
-                for i in range(len(df)):
-                    for f in range(franjas_totales):
-                        variables[(i, f)] = model.NewBoolVar(f"clase_{i}_franja_{f}")
-                
-                # RESTRICCIONES BÁSICAS (siempre activas)
-                
-                # 🔔 RECREO: Prohibir clases durante 12:00-12:30 todos los días
-                for i in range(len(df)):
-                    for franja in franjas_recreo:
-                        model.Add(variables[(i, franja)] == 0)
-                
-                # Cada clase debe tener exactamente sus franjas necesarias
-                for i, fila in df.iterrows():
-                    franjas_requeridas = int(fila["Franjas_necesarias"])
-                    model.Add(
-                        sum(variables[(i, f)] for f in range(franjas_totales)) == franjas_requeridas
-                    )
-                
-                # Un profesor no puede estar en dos sitios a la vez
-                for f in range(franjas_totales):
-                    for profesor in df["Profesor"].unique():
-                        indices_profesor = df[df["Profesor"] == profesor].index
-                        model.Add(
-                            sum(variables[(i, f)] for i in indices_profesor) <= 1
-                        )
-                
-                # Un curso no puede tener dos clases simultáneas
-                for f in range(franjas_totales):
-                    for curso in df["Curso"].unique():
-                        indices_curso = df[df["Curso"] == curso].index
-                        model.Add(
-                            sum(variables[(i, f)] for i in indices_curso) <= 1
-                        )
-                
-                # RESTRICCIONES ESPECÍFICAS (configurables)
-                restricciones_aplicadas = 0
-                
-                if restricciones.get("ana_horario", False):
-                    # Ana Inaraja: solo martes, miércoles, jueves 11:00-14:00
-                    indices_ana = df[df["Profesor"].str.contains("Ana Inaraja", case=False, na=False)].index
-                    
-                    franjas_validas_ana = []
-                    for d in [1, 2, 3]:  # Martes, Miércoles, Jueves
-                        franjas_validas_ana.extend([d * len(franjas_por_dia) + h for h in range(4, 10)])
-                    
-                    for i in indices_ana:
-                        for f in range(franjas_totales):
-                            if f not in franjas_validas_ana:
-                                model.Add(variables[(i, f)] == 0)
-                    
-                    restricciones_aplicadas += 1
-                
-                if restricciones.get("juan_carlos_ef", False):
-                    # Juan Carlos: Ed. Física solo martes/miércoles 9:00-11:00
-                    indices_jc_ef = df[
-                        (df["Profesor"].str.contains("Juan Carlos", case=False, na=False)) &
-                        (df["Asignatura"].str.contains("Educación Física", case=False, na=False))
-                    ].index
-                    
-                    franjas_validas_jc = []
-                    for d in [1, 2]:  # Martes, Miércoles
-                        franjas_validas_jc.extend([d * len(franjas_por_dia) + h for h in range(4)])
-                    
-                    for i in indices_jc_ef:
-                        for f in range(franjas_totales):
-                            if f not in franjas_validas_jc:
-                                model.Add(variables[(i, f)] == 0)
-                    
-                    restricciones_aplicadas += 1
-                
-                if restricciones.get("mariajose_jueves", False):
-                    # Mª José López: no puede jueves 11:00-12:00
-                    indices_mariajose = df[df["Profesor"].str.contains("Mª José López", case=False, na=False)].index
-                    
-                    franjas_prohibidas = [3 * len(franjas_por_dia) + 4, 3 * len(franjas_por_dia) + 5]
-                    
-                    for i in indices_mariajose:
-                        for f in franjas_prohibidas:
-                            model.Add(variables[(i, f)] == 0)
-                    
-                    restricciones_aplicadas += 1
-                
-                if restricciones.get("toni_coro", False):
-                    # Toni: Coro solo 10:00-11:00
-                    indices_toni_coro = df[
-                        (df["Profesor"].str.contains("Toni", case=False, na=False)) &
-                        (df["Asignatura"].str.contains("Coro", case=False, na=False))
-                    ].index
-                    
-                    franjas_validas_coro = []
-                    for d in range(len(dias)):
-                        franjas_validas_coro.extend([d * len(franjas_por_dia) + 4, d * len(franjas_por_dia) + 5])
-                    
-                    for i in indices_toni_coro:
-                        for f in range(franjas_totales):
-                            if f not in franjas_validas_coro:
-                                model.Add(variables[(i, f)] == 0)
-                    
-                    restricciones_aplicadas += 1
+        por_componentes = st.checkbox(
+            "🧩 Resolver por componentes independientes en paralelo",
+            value=False,
+            help="Divide el colegio en grupos de profesores y cursos que no comparten clases "
+                 "(p. ej. Infantil y Secundaria) y resuelve cada uno en un proceso aparte"
+        )
+        
+        # Varios horarios distintos en una sola generación, para elegir entre ellos
+        col1, col2, col3 = st.columns([1, 1, 1])
+        with col1:
+            num_alternativas = st.number_input(
+                "Número de alternativas", min_value=2, max_value=MAX_ALTERNATIVAS, value=3
+            )
+        with col2:
+            diferencia = st.slider(
+                "Diferencia mínima entre alternativas (% de franjas)", 5, 50, int(DIFERENCIA_MINIMA * 100), step=5
+            )
+        with col3:
+            generar_alternativas = st.button(
+                "🗂️ Generar alternativas",
+                disabled=trabajo_activo is not None,
+                help="Busca varios horarios que difieren al menos en ese porcentaje de franjas, "
+                     "repartiendo entre ellos el tiempo de búsqueda, y los ordena por penalización"
+            )
+        
+        resultado = None
+        clave = None
+        
+        if generar_horario:
+            # Clave de caché: datos normalizados + toda la configuración que afecta al modelo
+            clave = clave_solucion(
+                df,
+                flexibilidad=flexibilidad,
+                reglas=[r for r in reglas if restricciones.get(r["id"], False)],
+                **rejilla.configuracion(),
+                pesos_reglas=pesos_reglas,
+                pesos_calidad=pesos_calidad,
+                duraciones=duraciones,
+            )
+            resultado = cache_soluciones().obtener(clave)
+            if resultado is not None:
+                resultado["estadisticas"]["desde_cache"] = True
+        
+        if (generar_horario and resultado is None) or regenerar_horario or reoptimizar_horario or generar_alternativas:
+            inicio_construccion = time.perf_counter()
+            indices = construir_indices(df)
+            compiladas = compilar_reglas(
+                reglas, df, rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo,
+                restricciones, flexibilidad, indices, pesos_reglas, rejilla.jornadas
+            )
+            
+            # Semilla aleatoria solo para la versión alternativa
+            semilla = None
+            if regenerar_horario:
+                import random
+                semilla = random.randint(1, 1000000)
+            
+            estadisticas = {
+                "flexibilidad": flexibilidad,
+                "restricciones_aplicadas": len(compiladas.aplicadas),
+                "sesiones": [duracion * rejilla.minutos_franja for duracion in duraciones],
+            }
+            
+            # Imposibilidades evidentes: se informa sin llegar a lanzar el solver
+            problemas = comprobar_viabilidad(
+                df, compiladas, rejilla.dias, rejilla.franjas_por_dia, indices, duraciones
+            )
+            estadisticas["tiempo_construccion"] = time.perf_counter() - inicio_construccion
+            if problemas:
+                estadisticas["viabilidad"] = problemas
+                resultado = {"status": "INFEASIBLE", "asignacion": None, "estadisticas": estadisticas}
+            else:
+                # El modelo se construye y se resuelve en la cola: la sesión no se bloquea
+                cola = cola_trabajos()
+                anterior = None
+                if reoptimizar_horario:
+                    anterior = (st.session_state["df_horario"], st.session_state["asignacion"])
+                trabajo = cola.enviar(
+                    resolver_trabajo, df, compiladas, indices, estadisticas, rejilla, flexibilidad, semilla,
+                    por_componentes, anterior, fijar_no_afectados, pesos_calidad, duraciones, clave,
+                    cache_soluciones(), st.session_state.get("tiempo_carga"), cola.hilos_por_resolucion,
+                    num_alternativas if generar_alternativas else 1, diferencia / 100,
+                    descripcion=f"{len(df)} clases · {flexibilidad}",
+                    datos={"df": df, "rejilla": rejilla},
+                )
+                st.session_state["trabajo"] = trabajo.id
+                st.query_params["trabajo"] = trabajo.id
+                # Volver a dibujar la página con los botones de generar deshabilitados
+                st.rerun()
+        
+        # Generación en segundo plano: se consulta su estado sin esperar a que termine
+        if trabajo_activo is not None:
+            progreso_trabajo(trabajo_activo.id)
+        elif (resultado is None and trabajo_sesion is not None
+              and st.session_state.get("trabajo_mostrado") != trabajo_sesion.id):
+            # Terminado: el resultado se muestra una vez por sesión (también tras recargar la página)
+            st.session_state["trabajo_mostrado"] = trabajo_sesion.id
+            if trabajo_sesion.estado == "terminado":
+                resultado = trabajo_sesion.resultado
+                df = trabajo_sesion.datos["df"]
+                rejilla = trabajo_sesion.datos.get("rejilla", rejilla)
+            elif trabajo_sesion.estado == "cancelado":
+                st.info("✖️ **Generación cancelada** antes de empezar")
+            else:
+                st.error(f"❌ Error al generar el horario: {trabajo_sesion.error}")
+        
+        if resultado is not None and "viabilidad" in resultado["estadisticas"]:
+            st.error(
+                "❌ **El horario es imposible** con estos datos y restricciones "
+                "(detectado sin lanzar el solver):"
+            )
+            for problema in resultado["estadisticas"]["viabilidad"][:MAX_PROBLEMAS]:
+                st.write(f"• {texto_grupo(problema, reglas)}")
+            st.warning(
+                "💡 **Sugerencia**: reduce las horas señaladas o desactiva las reglas que las limitan "
+                "en la pestaña ⚙️ Configurar; el detalle completo está en 🔍 Diagnóstico"
+            )
+        
+        elif resultado is not None:
+            status = resultado["status"]
+            estadisticas = resultado["estadisticas"]
+            restricciones_aplicadas = estadisticas["restricciones_aplicadas"]
+            flexibilidad = estadisticas["flexibilidad"]
+            
+            if estadisticas.get("desde_cache"):
+                st.info("⚡ **Horario recuperado de la caché**: mismos datos y configuración que una ejecución anterior")
+            
+            if "filas_afectadas" in estadisticas:
+                st.info(
+                    f"♻️ **Re-optimización incremental**: {estadisticas['filas_afectadas']} filas afectadas · "
+                    f"{estadisticas['filas_fijadas']} filas fijadas"
+                    + (f" · {estadisticas['franjas_cambiadas']} franjas movidas respecto al horario anterior"
+                       if "franjas_cambiadas" in estadisticas else "")
+                )
+            
+            st.info(f"🔧 **Restricciones aplicadas**: {restricciones_aplicadas} + Recreo obligatorio")
+            st.info(
+                f"⏱️ **Construcción del modelo**: {estadisticas['tiempo_construccion']:.2f} s · "
+                f"**Resolución**: {estadisticas['tiempo_resolucion']:.2f} s"
+                + (f" · **Primera solución**: {estadisticas['tiempo_primera']:.2f} s"
+                   if estadisticas.get("tiempo_primera") is not None else "")
+            )
+            st.info(
+                f"🧮 **Tamaño del modelo**: {estadisticas['variables']} variables · "
+                f"{estadisticas['restricciones']} restricciones · "
+                f"{estadisticas['hilos']} hilos de búsqueda"
+                + (f" · {estadisticas['componentes']} componentes independientes"
+                   if "componentes" in estadisticas else "")
+            )
+            
+            # Dónde se va el tiempo: Python (carga, modelo, tablas) frente a CP-SAT (presolve, búsqueda)
+            with st.expander("📈 Tiempos por etapa y estadísticas del solver"):
+                tiempos = {
+                    "carga": st.session_state.get("tiempo_carga"),
+                    **estadisticas.get("tiempos", {}),
+                    **st.session_state.get("tiempos_interfaz", {}),
+                }
+                st.table([
+                    {"Etapa": nombre, "Segundos": f"{tiempos[etapa]:.3f}"}
+                    for etapa, nombre in ETAPAS.items() if tiempos.get(etapa) is not None
+                ])
+                st.caption(
+                    "Las tablas de visualización y la exportación son las de la última vez que se "
+                    "abrieron las pestañas 🗕️ Visualización y 📅 Exportar."
+                )
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Variables", estadisticas["variables"])
+                col2.metric("Restricciones", estadisticas["restricciones"])
+                col3.metric("Términos del objetivo", estadisticas.get("terminos_objetivo", 0))
+                solver = estadisticas.get("solver")
+                if solver:
+                    st.table([
+                        {"Estadística de CP-SAT": nombre,
+                         "Valor": f"{solver[clave]:.2f}" if isinstance(solver[clave], float) else str(solver[clave])}
+                        for clave, nombre in NOMBRES_SOLVER.items() if clave in solver
+                    ])
+                if RUTA_LOG:
+                    st.caption(f"🪵 Cada generación se añade a `{RUTA_LOG}` (JSON Lines)")
+                else:
+                    st.caption("El presolve y la búsqueda solo se separan con `HORARIOS_LOG_METRICAS`.")
+            
+            if status in ("OPTIMAL", "FEASIBLE"):
+                st.success("✅ ¡Horario generado con éxito!")
                 
-                if restricciones.get("andrea_diaria", False):
-                    # Andrea: una clase diaria de Inglés Infantil
-                    indices_andrea = df[
-                        (df["Profesor"].str.contains("Andrea", case=False, na=False)) &
-                        (df["Asignatura"].str.contains("Inglés", case=False, na=False)) &
-                        (df["Curso"].str.contains("Infantil", case=False, na=False))
-                    ].index
-                    
-                    if not indices_andrea.empty:
-                        for d in range(len(dias)):
-                            franjas_dia = [d * len(franjas_por_dia) + h for h in range(len(franjas_por_dia))]
-                            clases_dia = [variables[(i, f)] for i in indices_andrea for f in franjas_dia]
-                            if clases_dia:
-                                model.Add(sum(clases_dia) >= 1)
-                    
-                    restricciones_aplicadas += 1
+                # Guardar resultados
+                asignacion = resultado["asignacion"]
+                st.session_state["asignacion"] = asignacion
+                st.session_state["huella"] = huella_solucion(df, asignacion)
+                st.session_state["df_horario"] = df
+                st.session_state["rejilla"] = rejilla
+                st.session_state["fecha_generacion"] = datetime.now().strftime("%d/%m/%Y %H:%M")
+                if "alternativas" in resultado:
+                    st.session_state["alternativas"] = {"df": df, "lista": resultado["alternativas"]}
+                    st.session_state.pop("alternativa_elegida", None)
+                else:
+                    st.session_state.pop("alternativas", None)
                 
-                # Solo aplicar restricción de Inglés en modo estricto
-                if restricciones.get("ingles_fernando_ivan", False) and flexibilidad in ["Muy Estricto", "Estricto"]:
-                    # Fernando libre cuando hay Inglés en ciertos cursos
-                    cursos_fernando = ["1ºA", "1ºB", "1ºC", "3ºA", "3ºB", "3ºC", "5ºA", "5ºB", "5ºC"]
-                    indices_ingles_f = df[
-                        (df["Curso"].isin(cursos_fernando)) & 
-                        (df["Asignatura"].str.contains("Inglés", case=False, na=False))
-                    ].index
-                    indices_fernando = df[df["Profesor"].str.contains("Fernando", case=False, na=False)].index
-                    
-                    for f in range(franjas_totales):
-                        clases_ingles = [variables[(i, f)] for i in indices_ingles_f]
-                        clases_fernando = [variables[(i, f)] for i in indices_fernando]
-                        
-                        if clases_ingles and clases_fernando:
-                            model.Add(sum(clases_ingles + clases_fernando) <= 1)
-                    
-                    restricciones_aplicadas += 1
+                # Estadísticas
+                total_asignadas = int(asignacion.sum())
                 
-                # Configurar solver
-                solver = cp_model.CpSolver()
+                st.info(f"📊 **{total_asignadas} franjas asignadas** con nivel '{flexibilidad}'")
                 
-                # Ajustar tiempo según flexibilidad
-                if flexibilidad in ["Muy Flexible", "Flexible"]:
-                    solver.parameters.max_time_in_seconds = 300.0  # 5 minutos
-                elif flexibilidad == "Moderado":
-                    solver.parameters.max_time_in_seconds = 180.0  # 3 minutos
+                if status == "OPTIMAL":
+                    st.success("🎯 **Solución óptima encontrada**")
+                elif estadisticas.get("detenida"):
+                    st.info("⏹️ **Búsqueda detenida**: se conserva la mejor solución encontrada")
+                elif estadisticas.get("estancada"):
+                    st.info("✅ **Solución factible encontrada**: el objetivo dejó de mejorar y se cortó la búsqueda")
                 else:
-                    solver.parameters.max_time_in_seconds = 120.0  # 2 minutos
-                
-                if regenerar_horario:
-                    import random
-                    solver.parameters.random_seed = random.randint(1, 1000000)
+                    st.info("✅ **Solución factible encontrada**")
                 
-                # Resolver
-                status = solver.Solve(model)
+                # Desglose de lo que penaliza el objetivo
+                penalizaciones = estadisticas.get("penalizaciones")
+                if penalizaciones:
+                    descripciones = {regla["id"]: regla.get("descripcion", regla["id"]) for regla in reglas}
+                    total = sum(valor["penalizacion"] for valor in penalizaciones.values())
+                    st.subheader(f"⚖️ Penalización total: {total}")
+                    st.table([
+                        {
+                            "Término": (f"📋 {descripciones.get(termino[6:], termino[6:])}"
+                                        if termino.startswith("regla:") else NOMBRES_TERMINOS[termino]),
+                            "Franjas": valor["cantidad"],
+                            "Peso": valor["peso"],
+                            "Penalización": valor["penalizacion"],
+                        }
+                        for termino, valor in penalizaciones.items()
+                    ])
                 
-                st.info(f"🔧 **Restricciones aplicadas**: {restricciones_aplicadas} + Recreo obligatorio")
+            elif status == "INFEASIBLE":
+                st.error("❌ **No se pudo generar un horario** con las restricciones actuales.")
                 
-                if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
-                    st.success("✅ ¡Horario generado con éxito!")
-                    
-                    # Guardar resultados
-                    st.session_state["solver"] = solver
-                    st.session_state["variables"] = variables
-                    st.session_state["df"] = df
-                    st.session_state["dias"] = dias
-                    st.session_state["franjas_por_dia"] = franjas_por_dia
-                    st.session_state["fecha_generacion"] = datetime.now().strftime("%d/%m/%Y %H:%M")
-                    
-                    # Estadísticas
-                    total_asignadas = sum(solver.BooleanValue(variables[(i, f)]) 
-                                        for i in range(len(df)) 
-                                        for f in range(franjas_totales))
-                    
-                    st.info(f"📊 **{total_asignadas} franjas asignadas** con nivel '{flexibilidad}'")
-                    
-                    if status == cp_model.OPTIMAL:
-                        st.success("🎯 **Solución óptima encontrada**")
-                    else:
-                        st.info("✅ **Solución factible encontrada**")
-                    
-                elif status == cp_model.INFEASIBLE:
-                    st.error("❌ **No se pudo generar un horario** con las restricciones actuales.")
-                    
+                conflicto = estadisticas.get("conflicto")
+                if conflicto and conflicto["grupos"]:
+                    st.error(
+                        "🔎 **Causa**: estas restricciones no pueden cumplirse a la vez"
+                        + ("" if conflicto["minimo"] else " (puede que alguna no sea imprescindible)")
+                    )
+                    for grupo in conflicto["grupos"]:
+                        st.write(f"• {texto_grupo(grupo, reglas)}")
+                    if any(grupo["tipo"] == "regla" for grupo in conflicto["grupos"]):
+                        st.warning("💡 **Sugerencia**: desactiva alguna de las reglas 📋 en la pestaña ⚙️ Configurar")
+                    if any(grupo["tipo"] != "regla" for grupo in conflicto["grupos"]):
+                        st.warning("💡 **Sugerencia**: reparte o reduce las horas de los profesores y cursos señalados")
+                    if any(grupo["tipo"] == "aula" for grupo in conflicto["grupos"]):
+                        st.warning("💡 **Sugerencia**: pasa clases a otra aula o aumenta la columna 'Capacidad aula'")
+                elif (conflicto and conflicto["estado"] in ("OPTIMAL", "FEASIBLE")
+                      and "filas_afectadas" not in estadisticas):
+                    # Sin filas fijadas, lo único que el modelo de la explicación no tiene son las sesiones
+                    st.warning(
+                        "💡 **Sugerencia**: colocando las clases franja a franja sí hay horario; "
+                        "cambia las duraciones de 🧱 Sesiones en la pestaña ⚙️ Configurar"
+                    )
+                elif conflicto and conflicto["estado"] in ("OPTIMAL", "FEASIBLE"):
+                    st.warning(
+                        "💡 **Sugerencia**: sin las filas fijadas sí hay horario; "
+                        "desmarca 'Fijar cursos y profesores no afectados' y vuelve a re-optimizar"
+                    )
+                else:
                     if restricciones_aplicadas > 3:
                         st.warning("💡 **Sugerencia**: Reduce las restricciones en la pestaña ⚙️ Configurar")
                     
@@ -437,46 +908,72 @@ with tabs[3]:
                     st.error("• Cambiar a modo 'Flexible' o 'Muy Flexible'")
                     st.error("• Desactivar algunas restricciones específicas")
                     st.error("• Revisar si hay profesores sobrecargados")
-                    
-                else:
-                    st.warning("⏰ **Tiempo agotado** - Intenta con modo más flexible")
+                
+            elif estadisticas.get("detenida"):
+                st.warning("⏹️ **Búsqueda detenida** antes de encontrar una solución")
+            else:
+                st.warning("⏰ **Tiempo agotado** - Intenta con modo más flexible")
+        
+        # Alternativas de la última generación: se comparan y se elige cuál es el horario activo
+        if "alternativas" in st.session_state:
+            lista = st.session_state["alternativas"]["lista"]
+            descripciones = {regla["id"]: regla.get("descripcion", regla["id"]) for regla in reglas}
+            terminos = [
+                termino for termino in lista[0]["penalizaciones"]
+                if any(alternativa["penalizaciones"][termino]["penalizacion"] for alternativa in lista)
+            ]
+            st.subheader(f"🗂️ Alternativas generadas: {len(lista)}")
+            st.table([
+                {
+                    "Alternativa": n,
+                    "Penalización": alternativa["penalizacion"],
+                    **{
+                        (descripciones.get(termino[6:], termino[6:]) if termino.startswith("regla:")
+                         else NOMBRES_TERMINOS[termino]): alternativa["penalizaciones"][termino]["penalizacion"]
+                        for termino in terminos
+                    },
+                    "Franjas distintas de la mejor": alternativa["distinta_de_la_mejor"],
+                    "Franjas distintas de la más parecida": alternativa["distinta_minima"],
+                }
+                for n, alternativa in enumerate(lista, start=1)
+            ])
+            elegida = st.radio(
+                "Horario activo (visualización y exportación)",
+                range(len(lista)),
+                format_func=lambda n: f"Alternativa {n + 1} · penalización {lista[n]['penalizacion']}",
+                horizontal=True,
+                key="alternativa_elegida",
+            )
+            if st.session_state.get("asignacion") is not lista[elegida]["asignacion"]:
+                df_alternativas = st.session_state["alternativas"]["df"]
+                st.session_state["asignacion"] = lista[elegida]["asignacion"]
+                st.session_state["huella"] = huella_solucion(df_alternativas, lista[elegida]["asignacion"])
+                st.session_state["df_horario"] = df_alternativas
 
 # -----------------------------------------------
-# 🗕️ TAB 5: VISUALIZACIÓN (igual que antes)
+# 🗕️ TAB 5: VISUALIZACIÓN
 with tabs[4]:
     st.header("🗕️ Visualización del Horario")
-    if "solver" not in st.session_state:
+    if "asignacion" not in st.session_state:
         st.info("🔔 Genera un horario en la pestaña 🚀 Generar Horario.")
     else:
-        solver = st.session_state["solver"]
-        variables = st.session_state["variables"]
-        df = st.session_state["df"]
-        dias = st.session_state["dias"]
-        franjas_por_dia = st.session_state["franjas_por_dia"]
-        franjas_totales = len(dias) * len(franjas_por_dia)
+        df = st.session_state["df_horario"]
+        rejilla = st.session_state["rejilla"]
+        tiempos_interfaz = st.session_state.setdefault("tiempos_interfaz", {})
+        tiempos_interfaz.pop("visualizacion", None)
+        with cronometrar(tiempos_interfaz, "visualizacion"):
+            larga = tabla_larga(df, st.session_state["asignacion"], rejilla.dias, rejilla.franjas_por_dia)
 
-        sub_tabs = st.tabs(["🎓 Ver por Curso", "👨‍🏫 Ver por Profesor"])
+        con_aulas = tiene_aulas(df)
+        sub_tabs = st.tabs(["🎓 Ver por Curso", "👨‍🏫 Ver por Profesor"] + (["🏫 Ver por Aula"] if con_aulas else []))
 
         # Por Curso
         with sub_tabs[0]:
             curso_seleccionado = st.selectbox("📘 Selecciona un curso", sorted(df["Curso"].unique()))
-            
-            tabla = pd.DataFrame(index=franjas_por_dia, columns=dias)
-            
-            for f in range(franjas_totales):
-                dia = dias[f // len(franjas_por_dia)]
-                franja = franjas_por_dia[f % len(franjas_por_dia)]
-                
-                # Mostrar RECREO en la franja correspondiente
-                if f in franjas_recreo:
-                    tabla.at[franja, dia] = "🔔 RECREO"
-                else:
-                    clases = []
-                    for i, fila in df.iterrows():
-                        if fila["Curso"] == curso_seleccionado and solver.BooleanValue(variables[(i, f)]):
-                            clases.append(f"{fila['Asignatura']} ({fila['Profesor']})")
-                    
-                    tabla.at[franja, dia] = "\n".join(clases) if clases else ""
+            with cronometrar(tiempos_interfaz, "visualizacion"):
+                tabla = rejillas(
+                    larga, "Curso", "Profesor", [curso_seleccionado], rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo
+                )[curso_seleccionado]
             
             st.subheader(f"🗓 Horario para {curso_seleccionado}")
             st.dataframe(tabla, use_container_width=True, height=500)
@@ -484,100 +981,98 @@ with tabs[4]:
         # Por Profesor
         with sub_tabs[1]:
             profe_seleccionado = st.selectbox("👨‍🏫 Selecciona un profesor", sorted(df["Profesor"].unique()))
-            
-            tabla = pd.DataFrame(index=franjas_por_dia, columns=dias)
-            
-            for f in range(franjas_totales):
-                dia = dias[f // len(franjas_por_dia)]
-                franja = franjas_por_dia[f % len(franjas_por_dia)]
-                
-                # Mostrar RECREO en la franja correspondiente
-                if f in franjas_recreo:
-                    tabla.at[franja, dia] = "🔔 RECREO"
-                else:
-                    clases = []
-                    for i, fila in df.iterrows():
-                        if fila["Profesor"] == profe_seleccionado and solver.BooleanValue(variables[(i, f)]):
-                            clases.append(f"{fila['Asignatura']} ({fila['Curso']})")
-                    
-                    tabla.at[franja, dia] = "\n".join(clases) if clases else ""
+            with cronometrar(tiempos_interfaz, "visualizacion"):
+                tabla = rejillas(
+                    larga, "Profesor", "Curso", [profe_seleccionado], rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo
+                )[profe_seleccionado]
             
             st.subheader(f"🗓 Horario para {profe_seleccionado}")
             st.dataframe(tabla, use_container_width=True, height=500)
 
+        # Por Aula
+        if con_aulas:
+            with sub_tabs[2]:
+                aulas = sorted(set(df["Aula"].astype(str)) - {""})
+                aula_seleccionada = st.selectbox("🏫 Selecciona un aula", aulas)
+                with cronometrar(tiempos_interfaz, "visualizacion"):
+                    tabla = rejillas(
+                        larga, "Aula", "Curso", [aula_seleccionada], rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo
+                    )[aula_seleccionada]
+                
+                st.subheader(f"🗓 Horario para {aula_seleccionada}")
+                st.dataframe(tabla, use_container_width=True, height=500)
+
 # -----------------------------------------------
-# 📅 TAB 6: EXPORTACIÓN (igual que antes)
+# 📅 TAB 6: EXPORTACIÓN
+
+# El libro se genera solo al pulsar la descarga y una vez por horario (clave: huella)
+@st.cache_data(max_entries=16, show_spinner=False)
+def excel_en_cache(huella, _df, _asignacion, rejilla):
+    return generar_excel(_df, _asignacion, rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo)
+
+
+def excel_medido(huella, df, asignacion, rejilla, tiempos):
+    """Libro Excel anotando en ``tiempos`` lo que tarda (casi nada si ya estaba en caché)."""
+    tiempos.pop("exportacion", None)
+    with cronometrar(tiempos, "exportacion"):
+        return excel_en_cache(huella, df, asignacion, rejilla)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def csv_en_cache(huella, _df, _asignacion, rejilla):
+    return generar_csv(_df, _asignacion, rejilla.dias, rejilla.franjas_por_dia)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def parquet_en_cache(huella, _df, _asignacion, rejilla):
+    return generar_parquet(_df, _asignacion, rejilla.dias, rejilla.franjas_por_dia)
+
+
 with tabs[5]:
     st.header("📅 Exportar Horario Generado")
 
-    if "solver" not in st.session_state or "df" not in st.session_state:
+    if "asignacion" not in st.session_state:
         st.info("🔔 Genera un horario antes de exportarlo.")
     else:
-        df = st.session_state["df"]
-        solver = st.session_state["solver"]
-        variables = st.session_state["variables"]
-        dias = st.session_state["dias"]
-        franjas_por_dia = st.session_state["franjas_por_dia"]
-        franjas_totales = len(dias) * len(franjas_por_dia)
-
-        buffer = io.BytesIO()
-
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            # Exportar por Curso
-            for curso in sorted(df["Curso"].unique()):
-                tabla = pd.DataFrame(index=franjas_por_dia, columns=dias)
-                
-                for f in range(franjas_totales):
-                    dia = dias[f // len(franjas_por_dia)]
-                    franja = franjas_por_dia[f % len(franjas_por_dia)]
-                    
-                    # Mostrar RECREO en la exportación
-                    if f in [d * len(franjas_por_dia) + 6 for d in range(len(dias))]:
-                        tabla.at[franja, dia] = "🔔 RECREO"
-                    else:
-                        clases = []
-                        for i, fila in df.iterrows():
-                            if fila["Curso"] == curso and solver.BooleanValue(variables[(i, f)]):
-                                clases.append(f"{fila['Asignatura']} ({fila['Profesor']})")
-                        
-                        tabla.at[franja, dia] = " | ".join(clases) if clases else ""
-                
-                tabla.index.name = "Franja"
-                tabla.to_excel(writer, sheet_name=f"Curso_{curso.replace('º', 'o')}")
-
-            # Exportar por Profesor  
-            for profesor in sorted(df["Profesor"].unique()):
-                tabla = pd.DataFrame(index=franjas_por_dia, columns=dias)
-                
-                for f in range(franjas_totales):
-                    dia = dias[f // len(franjas_por_dia)]
-                    franja = franjas_por_dia[f % len(franjas_por_dia)]
-                    
-                    # Mostrar RECREO en la exportación para profesores
-                    if f in [d * len(franjas_por_dia) + 6 for d in range(len(dias))]:
-                        tabla.at[franja, dia] = "🔔 RECREO"
-                    else:
-                        clases = []
-                        for i, fila in df.iterrows():
-                            if fila["Profesor"] == profesor and solver.BooleanValue(variables[(i, f)]):
-                                clases.append(f"{fila['Asignatura']} ({fila['Curso']})")
-                        
-                        tabla.at[franja, dia] = " | ".join(clases) if clases else ""
-                
-                tabla.index.name = "Franja"
-                nombre_hoja = profesor.replace(" ", "_")[:25]
-                tabla.to_excel(writer, sheet_name=f"Prof_{nombre_hoja}")
-
-        buffer.seek(0)
+        df = st.session_state["df_horario"]
+        asignacion = st.session_state["asignacion"]
+        huella = st.session_state["huella"]
+        rejilla = st.session_state["rejilla"]
+        # Diccionario de la sesión: la descarga se genera fuera de la ejecución del script
+        tiempos_interfaz = st.session_state.setdefault("tiempos_interfaz", {})
         
         flexibilidad = st.session_state.get("flexibilidad", "Normal")
-        filename = f"horario_{flexibilidad.lower()}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+        nombre_base = f"horario_{flexibilidad.lower()}_{datetime.now().strftime('%Y%m%d_%H%M')}"
 
         st.download_button(
             label="📥 Descargar horario completo en Excel",
-            data=buffer,
-            file_name=filename,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            data=lambda: excel_medido(huella, df, asignacion, rejilla, tiempos_interfaz),
+            file_name=f"{nombre_base}.xlsx",
+            mime=MIME_EXCEL,
+            on_click="ignore",
         )
         
+        with st.expander("🔗 Formatos para otros sistemas"):
+            st.caption("Una fila por clase y franja: Fila, Profesor, Asignatura, Curso, Dia, Franja, Indice_franja")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label="📄 Descargar CSV",
+                    data=lambda: csv_en_cache(huella, df, asignacion, rejilla),
+                    file_name=f"{nombre_base}.csv",
+                    mime="text/csv",
+                    on_click="ignore",
+                )
+            with col2:
+                if PARQUET_DISPONIBLE:
+                    st.download_button(
+                        label="🧱 Descargar Parquet",
+                        data=lambda: parquet_en_cache(huella, df, asignacion, rejilla),
+                        file_name=f"{nombre_base}.parquet",
+                        mime="application/vnd.apache.parquet",
+                        on_click="ignore",
+                    )
+                else:
+                    st.caption("Instala `pyarrow` para exportar en Parquet.")
+        
         st.success(f"✅ Horario generado con nivel de flexibilidad: **{flexibilidad}**")
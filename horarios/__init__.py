@@ -0,0 +1 @@
+"""Motor del generador de horarios del Colegio Apostolado del Sagrado Corazón."""
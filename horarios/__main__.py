@@ -0,0 +1,5 @@
+import sys
+
+from horarios.cli import main
+
+sys.exit(main())
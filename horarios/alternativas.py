@@ -0,0 +1,180 @@
+"""Varios horarios distintos en una sola generación, ordenados y comparados.
+
+El modelo se construye una vez y se resuelve ``k`` veces seguidas: tras cada
+horario se añade una restricción de diversidad (al menos una fracción de las
+franjas tiene que moverse respecto a cada horario anterior), así que cada
+alternativa es la mejor que el solver encuentra siendo de verdad distinta de
+las anteriores. Cada búsqueda aprovecha todos los hilos del solver, que ya
+lanza en paralelo trabajadores con estrategias y semillas distintas, y el
+tiempo del nivel de flexibilidad se reparte entre las ``k`` búsquedas.
+
+OR-Tools solo se importa al crear la resolución: la aplicación usa las
+constantes y la comparación sin cargarlo al arrancar.
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+
+from horarios.calidad import evaluar_calidad
+from horarios.medicion import combinar_estadisticas
+from horarios.rejilla import REJILLA_POR_DEFECTO
+
+# Fracción de las franjas que cada alternativa debe mover respecto a las anteriores
+DIFERENCIA_MINIMA = 0.1
+MAX_ALTERNATIVAS = 5
+
+
+def franjas_distintas(a, b):
+    """Franjas ocupadas en ``a`` que no lo están en ``b`` (mismas filas y rejilla)."""
+    return int((a.astype(bool) & ~b.astype(bool)).sum())
+
+
+def anadir_diversidad(model, variables, asignacion, diferencia):
+    """Obliga a que al menos ``diferencia`` franjas ocupadas en ``asignacion`` queden libres."""
+    from ortools.sat.python import cp_model
+
+    ocupadas = [variable for (i, f), variable in variables.items() if asignacion[i, f]]
+    model.Add(cp_model.LinearExpr.Sum(ocupadas) <= len(ocupadas) - diferencia)
+
+
+class ResolucionAlternativas:
+    """Busca ``k`` horarios distintos con el mismo modelo, uno tras otro, en un hilo.
+
+    Ofrece la misma interfaz que ``ResolucionEnCurso`` (``terminada``,
+    ``esperar``, ``detener``, ``estado``, ``asignacion``...); ``asignaciones``
+    guarda los horarios en el orden en que se encontraron y ``asignacion`` es
+    el primero. ``limite`` es el tiempo de cada búsqueda. El estado es el de
+    la primera búsqueda: si no hay horario, no se buscan alternativas; si una
+    alternativa posterior no existe, se devuelven las encontradas hasta ahí.
+    ``registro_busqueda`` se pasa a ``configurar_solver`` en cada búsqueda.
+    """
+
+    def __init__(self, model, variables, forma, flexibilidad, k, semilla=None, num_workers=None,
+                 diferencia=DIFERENCIA_MINIMA, sin_mejora=None, registro_busqueda=False):
+        from horarios.resolucion import TIEMPO_SIN_MEJORA, configurar_solver
+
+        self.model = model
+        self.variables = variables
+        self.forma = forma
+        self.flexibilidad = flexibilidad
+        self.total = k
+        self.semilla = semilla
+        self.num_workers = num_workers
+        self.diferencia = diferencia
+        self.registro_busqueda = registro_busqueda
+        self.sin_mejora = TIEMPO_SIN_MEJORA if sin_mejora is None else sin_mejora
+        self.limite = configurar_solver(flexibilidad).parameters.max_time_in_seconds / k
+        self.inicio = time.perf_counter()
+        self.resoluciones = []
+        self.asignaciones = []
+        self.estado = None
+        self.asignacion = None
+        self.tiempo_resolucion = None
+        self.tiempos = {}
+        self.estadisticas_solver = None
+        self.detenida = False
+        self.estancada = False
+        self._hilo = threading.Thread(target=self._resolver, daemon=True)
+        self._hilo.start()
+
+    @property
+    def alternativas(self):
+        return len(self.asignaciones)
+
+    @property
+    def seguimiento(self):
+        """Progreso de la búsqueda en curso; al terminar, el de la primera (la del mejor horario)."""
+        if not self.resoluciones:
+            from horarios.resolucion import SeguimientoSoluciones
+
+            return SeguimientoSoluciones()
+        return self.resoluciones[0 if self.terminada else -1].seguimiento
+
+    @property
+    def hilos(self):
+        return self.resoluciones[0].hilos if self.resoluciones else 1
+
+    def _resolver(self):
+        from horarios.resolucion import ResolucionEnCurso, configurar_solver
+
+        estadisticas = []
+        for n in range(self.total):
+            semilla = None if self.semilla is None else self.semilla + n
+            solver = configurar_solver(self.flexibilidad, semilla, self.num_workers, self.registro_busqueda)
+            solver.parameters.max_time_in_seconds = self.limite
+            actual = ResolucionEnCurso(self.model, solver, self.variables, self.forma, self.sin_mejora)
+            self.resoluciones.append(actual)
+            if self.detenida:
+                actual.detener()
+            actual.esperar()
+            estadisticas.append(actual.estadisticas_solver)
+            for etapa, segundos in actual.tiempos.items():
+                self.tiempos[etapa] = self.tiempos.get(etapa, 0.0) + segundos
+            self.estancada = self.estancada or actual.estancada
+            if n == 0:
+                self.estado = actual.estado
+            if actual.asignacion is None:
+                break
+            self.asignaciones.append(actual.asignacion)
+            if self.detenida:
+                break
+            # La siguiente alternativa debe mover una parte de las franjas de cada horario ya encontrado
+            franjas = int(actual.asignacion.sum())
+            anadir_diversidad(self.model, self.variables, actual.asignacion,
+                              max(1, math.ceil(self.diferencia * franjas)))
+
+        self.estadisticas_solver = combinar_estadisticas(estadisticas, en_paralelo=False)
+        # El objetivo y la cota de la primera búsqueda son los del mejor horario posible
+        for clave in ("objetivo", "cota"):
+            if clave in estadisticas[0]:
+                self.estadisticas_solver[clave] = estadisticas[0][clave]
+        if self.asignaciones:
+            self.asignacion = self.asignaciones[0]
+        self.tiempo_resolucion = time.perf_counter() - self.inicio
+        # Liberar el modelo en cuanto las soluciones están materializadas
+        self.model = self.variables = None
+
+    @property
+    def terminada(self):
+        return not self._hilo.is_alive()
+
+    def esperar(self, timeout=None):
+        self._hilo.join(timeout)
+        return self.terminada
+
+    def detener(self):
+        """Detiene la búsqueda en curso y no empieza más: se conservan las alternativas encontradas."""
+        self.detenida = True
+        if self.resoluciones:
+            self.resoluciones[-1].detener()
+
+
+def comparar_alternativas(asignaciones, df, franjas_dia, reglas, indices=None, pesos=None,
+                          rejilla=REJILLA_POR_DEFECTO):
+    """Alternativas ordenadas de menor a mayor penalización, con su comparación.
+
+    Cada elemento es ``{asignacion, penalizaciones, penalizacion,
+    distinta_de_la_mejor, distinta_minima}``: las dos últimas cuentan las
+    franjas que cambian respecto a la mejor y respecto a la más parecida.
+    """
+    alternativas = []
+    for asignacion in asignaciones:
+        penalizaciones = evaluar_calidad(asignacion, df, franjas_dia, reglas, indices, pesos, rejilla=rejilla)
+        alternativas.append({
+            "asignacion": asignacion,
+            "penalizaciones": penalizaciones,
+            "penalizacion": sum(valor["penalizacion"] for valor in penalizaciones.values()),
+        })
+    alternativas.sort(key=lambda alternativa: alternativa["penalizacion"])
+
+    for alternativa in alternativas:
+        distancias = [
+            franjas_distintas(alternativa["asignacion"], otra["asignacion"])
+            for otra in alternativas if otra is not alternativa
+        ]
+        alternativa["distinta_de_la_mejor"] = franjas_distintas(alternativa["asignacion"], alternativas[0]["asignacion"])
+        alternativa["distinta_minima"] = int(np.min(distancias)) if distancias else 0
+    return alternativas
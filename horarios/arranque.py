@@ -0,0 +1,76 @@
+"""Latencia de la aplicación: primera ejecución en frío y re-ejecuciones en caliente.
+
+Streamlit vuelve a ejecutar el script completo en cada interacción, así que lo
+que importa el script al arrancar se paga en la primera carga y lo que calcula
+en cada pasada, en todas las demás. Ejecutar en un intérprete nuevo::
+
+    python -m horarios.arranque --datos datos.xlsx --repeticiones 20
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+APP = Path(__file__).resolve().parent.parent / "generador_horarios_apostolado.py"
+
+# Módulos que no deberían cargarse hasta que se generan o descargan horarios
+MODULOS_PESADOS = ("ortools", "matplotlib", "xlsxwriter")
+
+
+def medir(repeticiones=10, datos=None, app=APP):
+    """Segundos de la primera ejecución (incluida la importación de Streamlit) y de las siguientes."""
+    inicio = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    prueba = AppTest.from_file(str(app), default_timeout=120)
+    if datos is not None:
+        from horarios.datos import cargar_datos
+
+        prueba.session_state["df"] = cargar_datos(datos)
+    prueba.run()
+    frio = time.perf_counter() - inicio
+    if prueba.exception:
+        raise RuntimeError(prueba.exception[0].message)
+
+    calientes = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        prueba.run()
+        calientes.append(time.perf_counter() - inicio)
+
+    return {
+        "frio": frio,
+        "caliente_mediana": statistics.median(calientes) if calientes else None,
+        "caliente_max": max(calientes) if calientes else None,
+        "repeticiones": repeticiones,
+        "modulos_pesados_cargados": [m for m in MODULOS_PESADOS if m in sys.modules],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m horarios.arranque", description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=10, help="re-ejecuciones en caliente (por defecto: 10)")
+    parser.add_argument("--datos", type=Path, help="archivo de datos que se deja cargado, como tras la pestaña 📁")
+    parser.add_argument("--json", action="store_true", help="imprime el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    resultado = medir(args.repeticiones, args.datos)
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+    else:
+        print(f"🥶 Primera ejecución: {resultado['frio'] * 1000:.0f} ms")
+        if resultado["caliente_mediana"] is not None:
+            print(
+                f"🔥 Re-ejecución: mediana {resultado['caliente_mediana'] * 1000:.0f} ms · "
+                f"máximo {resultado['caliente_max'] * 1000:.0f} ms ({args.repeticiones} repeticiones)"
+            )
+        cargados = resultado["modulos_pesados_cargados"]
+        print(f"📦 Módulos pesados cargados: {', '.join(cargados) if cargados else 'ninguno'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Aulas y recursos compartidos (gimnasio, laboratorio, sala de música...).
+
+La columna opcional ``Aula`` de la tabla indica dónde se da cada clase (vacía
+si no necesita un espacio concreto) y ``Capacidad aula`` cuántas clases caben
+a la vez en ella (1 si se omite; p. ej. 2 en un gimnasio con dos pistas). Un
+aula se trata como un profesor o un curso con capacidad: en ninguna franja
+puede tener más clases que plazas.
+"""
+
+import numpy as np
+
+from horarios.indices import construir_indices
+
+COLUMNA_AULA = "Aula"
+COLUMNA_CAPACIDAD = "Capacidad aula"
+COLUMNAS_AULA = [COLUMNA_AULA, COLUMNA_CAPACIDAD]
+CAPACIDAD_POR_DEFECTO = 1
+
+
+def tiene_aulas(df):
+    return COLUMNA_AULA in df.columns and bool((df[COLUMNA_AULA].astype(str) != "").any())
+
+
+def capacidades_aulas(df, indices=None):
+    """``{aula: capacidad}``; si las filas de un aula no coinciden, cuenta la mayor."""
+    if COLUMNA_AULA not in df.columns:
+        return {}
+    if indices is None:
+        indices = construir_indices(df)
+    capacidad = (
+        df[COLUMNA_CAPACIDAD].to_numpy(dtype=int) if COLUMNA_CAPACIDAD in df.columns
+        else np.full(len(df), CAPACIDAD_POR_DEFECTO)
+    )
+    return {aula: int(capacidad[filas].max()) for aula, filas in indices.get(COLUMNA_AULA, {}).items()}
+
+
+def aulas_compartidas(df, indices=None):
+    """``[(aula, filas, capacidad)]`` de las aulas con más filas que plazas.
+
+    Son las únicas en las que puede haber choques: un aula con tantas plazas
+    como clases no limita nada y no añade restricciones al modelo.
+    """
+    if indices is None:
+        indices = construir_indices(df)
+    capacidades = capacidades_aulas(df, indices)
+    return [
+        (aula, filas, capacidades[aula])
+        for aula, filas in indices.get(COLUMNA_AULA, {}).items() if len(filas) > capacidades[aula]
+    ]
@@ -0,0 +1,371 @@
+"""Banco de pruebas de rendimiento con colegios sintéticos.
+
+Genera una tabla de asignaciones con el mismo formato que sube el usuario
+(Profesor, Asignatura, Curso, Horas por semana y, opcionalmente, Aula y
+Capacidad aula) y reglas de disponibilidad según una densidad dada, mide por
+separado cada etapa del recorrido (carga, diagnóstico, construcción del
+modelo, resolución, tablas de visualización y exportación a Excel) y añade el
+resultado a un historial JSON para ver las regresiones entre versiones.
+Ejecutar::
+
+    python -m horarios.banco --escenario mediano --repeticiones 3
+"""
+
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from horarios.calidad import evaluar_calidad
+from horarios.datos import cargar_datos
+from horarios.diagnostico import comprobar_viabilidad, diagnosticar
+from horarios.exportar import generar_excel
+from horarios.indices import construir_indices
+from horarios.modelo import construir_modelo, tamano_modelo
+from horarios.pipeline import restricciones_por_defecto
+from horarios.reglas import compilar_reglas
+from horarios.rejilla import REJILLA_POR_DEFECTO, cargar_rejilla, limites
+from horarios.resolucion import TIEMPO_MAXIMO, ResolucionEnCurso, configurar_solver
+from horarios.sesiones import DURACIONES_POR_DEFECTO
+from horarios.tablas import rejillas, tabla_larga
+
+RUTA_HISTORIAL = Path("historial_banco.json")
+
+ASIGNATURAS = (
+    "Lengua", "Matemáticas", "Inglés", "Religión", "Sociales", "Naturales",
+    "Arte", "Música", "Educación Física", "Valores", "Francés", "Tecnología",
+)
+
+ESCENARIOS = {
+    "pequeño": {"profesores": 12, "cursos": 6},
+    "mediano": {"profesores": 40, "cursos": 18},
+    "grande": {"profesores": 90, "cursos": 40},
+    # Varios centros: cientos de clases y decenas de aulas compartidas
+    "campus": {"profesores": 120, "cursos": 54, "aulas": 30},
+}
+
+# Asignaturas que se dan en un aula específica cuando el colegio sintético tiene aulas
+ASIGNATURAS_CON_AULA = ("Educación Física", "Música", "Arte", "Tecnología", "Naturales")
+
+ETAPAS = ("carga", "diagnostico", "construccion", "resolucion", "visualizacion", "exportacion")
+
+# Una etapa empeora si tarda un 20 % más que en la ejecución anterior y al menos 50 ms más
+UMBRAL_REGRESION = 0.20
+MINIMO_REGRESION = 0.05
+
+
+def generar_colegio(profesores=40, cursos=18, asignaturas=9, horas=(1.0, 1.5, 2.0), ocupacion=0.75,
+                    densidad_restricciones=0.1, rejilla=REJILLA_POR_DEFECTO, semilla=0, aulas=0):
+    """Tabla de asignaciones y reglas sintéticas: ``(df, reglas)``.
+
+    Cada curso se llena hasta ``ocupacion`` (0-1) de las franjas lectivas de
+    su jornada en ``rejilla`` con clases de ``horas`` por semana, y ningún
+    profesor pasa de esa misma ocupación de la semana.
+    ``densidad_restricciones`` es la fracción de profesores con una
+    regla: la mitad solo están disponibles cuatro días y la otra mitad tiene
+    prohibida una hora de un día. Con ``aulas``, las clases de
+    ``ASIGNATURAS_CON_AULA`` se reparten entre ese número de aulas (una de
+    cada tres con capacidad 2) sin pasar de la misma ocupación. ``df`` tiene
+    las columnas del archivo original (sin normalizar), como si se hubiera
+    leído el Excel.
+    """
+    aleatorio = np.random.default_rng(semilla)
+    nombres_profesores = [f"Profesor {p + 1:03d}" for p in range(profesores)]
+    nombres_cursos = [f"{c // 3 + 1}º{'ABCDEFGHIJ'[c % 3]}" if c < 18 else f"Grupo {c - 17:02d}" for c in range(cursos)]
+    nombres_asignaturas = [
+        ASIGNATURAS[a] if a < len(ASIGNATURAS) else f"Asignatura {a + 1}" for a in range(asignaturas)
+    ]
+    por_hora = rejilla.franjas_por_hora
+    tope = int(ocupacion * rejilla.franjas_utiles)
+    carga_profesor = np.zeros(profesores, dtype=int)
+
+    filas = []
+    for curso in nombres_cursos:
+        tope_curso = int(ocupacion * rejilla.franjas_de_curso(curso))
+        carga_curso = 0
+        for k in range(4 * tope_curso):
+            franjas = max(1, int(por_hora * aleatorio.choice(horas)))
+            libres = np.flatnonzero(carga_profesor + franjas <= tope)
+            if carga_curso + franjas > tope_curso or not len(libres):
+                if carga_curso + por_hora * min(horas) > tope_curso or not len(libres):
+                    break
+                continue
+            # Se prefiere a los profesores con menos carga para repartir la plantilla
+            candidatos = libres[np.argsort(carga_profesor[libres], kind="stable")[:max(3, len(libres) // 4)]]
+            profesor = int(aleatorio.choice(candidatos))
+            carga_profesor[profesor] += franjas
+            carga_curso += franjas
+            filas.append((nombres_profesores[profesor], nombres_asignaturas[k % asignaturas], curso, franjas / por_hora))
+    df = pd.DataFrame(filas, columns=["Profesor", "Asignatura", "Curso", "Horas por semana"])
+
+    if aulas:
+        nombres_aulas = np.array([f"Aula {a + 1:02d}" for a in range(aulas)], dtype=object)
+        capacidad_aula = np.where(np.arange(aulas) % 3 == 2, 2, 1)
+        carga_aula = np.zeros(aulas, dtype=int)
+        asignada = np.full(len(df), -1)
+        for i in aleatorio.permutation(np.flatnonzero(df["Asignatura"].isin(ASIGNATURAS_CON_AULA))):
+            franjas = int(df["Horas por semana"].iloc[i] * por_hora)
+            libres = np.flatnonzero(carga_aula + franjas <= capacidad_aula * tope)
+            if len(libres):
+                aula = libres[np.argmin(carga_aula[libres] / capacidad_aula[libres])]
+                carga_aula[aula] += franjas
+                asignada[i] = aula
+        df["Aula"] = np.where(asignada >= 0, nombres_aulas[asignada], "")
+        df["Capacidad aula"] = np.where(asignada >= 0, capacidad_aula[asignada], 1)
+
+    reglas = []
+    dias = list(rejilla.dias)
+    # Horas en que empieza alguna franja lectiva: las de las reglas de una hora prohibida
+    en_recreo = rejilla.recreo.reshape(len(dias), -1).all(axis=0)
+    horas_inicio = sorted({
+        limites(franja)[0] // 60 for franja, recreo in zip(rejilla.franjas_por_dia, en_recreo) if not recreo
+    })
+    con_regla = aleatorio.permutation(profesores)[: int(round(densidad_restricciones * profesores))]
+    for k, p in enumerate(sorted(int(p) for p in con_regla)):
+        nombre = nombres_profesores[p]
+        base = {"grupo": "Profesores", "filas": {"profesor": [nombre]}, "por_defecto": list(TIEMPO_MAXIMO)}
+        if k % 2 == 0:
+            libre = dias[int(aleatorio.integers(len(dias)))]
+            reglas.append({**base, "id": f"sintetica_{p + 1:03d}", "tipo": "disponibilidad",
+                           "descripcion": f"{nombre}: no viene el {libre.lower()}",
+                           "dias": [d for d in dias if d != libre]})
+        else:
+            dia = dias[int(aleatorio.integers(len(dias)))]
+            desde = horas_inicio[int(aleatorio.integers(len(horas_inicio)))]
+            reglas.append({**base, "id": f"sintetica_{p + 1:03d}", "tipo": "prohibido",
+                           "descripcion": f"{nombre}: no puede el {dia.lower()} {desde}:00-{desde + 1}:00",
+                           "dias": [dia], "desde": f"{desde:02d}:00", "hasta": f"{desde + 1:02d}:00"})
+    return df, reglas
+
+
+def _version():
+    """Commit actual del repositorio (``-dirty`` si hay cambios) o ``None`` fuera de git."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, timeout=10, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _entorno():
+    versiones = {}
+    for paquete in ("ortools", "numpy", "pandas", "xlsxwriter", "python-calamine"):
+        try:
+            versiones[paquete] = metadata.version(paquete)
+        except metadata.PackageNotFoundError:
+            versiones[paquete] = None
+    return {"python": platform.python_version(), "procesador": platform.machine(), **versiones}
+
+
+def _ejecutar(contenido, reglas, flexibilidad, duraciones, semilla, rejilla):
+    """Una pasada completa; devuelve ``(tiempos por etapa, resultado)``. ``duraciones`` va en franjas."""
+    dias = list(rejilla.dias)
+    franjas_por_dia = list(rejilla.franjas_por_dia)
+    franjas_recreo = list(rejilla.franjas_recreo)
+    tiempos = {}
+    resultado = {}
+
+    inicio = time.perf_counter()
+    df = cargar_datos(io.BytesIO(contenido), "banco.xlsx", franjas_por_hora=rejilla.franjas_por_hora)
+    tiempos["carga"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    indices = construir_indices(df)
+    restricciones = restricciones_por_defecto(reglas, flexibilidad)
+    compiladas = compilar_reglas(
+        reglas, df, dias, franjas_por_dia, franjas_recreo, restricciones, flexibilidad, indices,
+        jornadas=rejilla.jornadas
+    )
+    diagnosticar(df, rejilla)
+    problemas = comprobar_viabilidad(df, compiladas, dias, franjas_por_dia, indices, duraciones)
+    tiempos["diagnostico"] = time.perf_counter() - inicio
+    if problemas:
+        return tiempos, {"status": "INFEASIBLE", "viabilidad": len(problemas)}
+
+    inicio = time.perf_counter()
+    model, variables, _ = construir_modelo(df, dias, franjas_por_dia, compiladas, indices, None, duraciones, rejilla)
+    tiempos["construccion"] = time.perf_counter() - inicio
+    resultado.update(tamano_modelo(model))
+
+    inicio = time.perf_counter()
+    ejecucion = ResolucionEnCurso(
+        model, configurar_solver(flexibilidad, semilla, registro_busqueda=True), variables,
+        (len(df), rejilla.franjas_totales)
+    )
+    del model, variables
+    ejecucion.esperar()
+    tiempos["resolucion"] = time.perf_counter() - inicio
+    resultado.update(status=ejecucion.estado, tiempo_primera=ejecucion.seguimiento.tiempo_primera,
+                     objetivo=ejecucion.seguimiento.objetivo, estancada=ejecucion.estancada,
+                     solver=ejecucion.estadisticas_solver)
+    asignacion = ejecucion.asignacion
+    if asignacion is None:
+        return tiempos, resultado
+    resultado["penalizacion"] = sum(
+        termino["penalizacion"]
+        for termino in evaluar_calidad(
+            asignacion, df, len(franjas_por_dia), compiladas, indices, rejilla=rejilla
+        ).values()
+    )
+
+    inicio = time.perf_counter()
+    larga = tabla_larga(df, asignacion, dias, franjas_por_dia)
+    for por, detalle in (("Curso", "Profesor"), ("Profesor", "Curso")):
+        valores = sorted(df[por].astype(str).unique())
+        rejillas(larga, por, detalle, valores, dias, franjas_por_dia, franjas_recreo)
+    tiempos["visualizacion"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    generar_excel(df, asignacion, dias, franjas_por_dia, franjas_recreo)
+    tiempos["exportacion"] = time.perf_counter() - inicio
+    return tiempos, resultado
+
+
+def medir(parametros, repeticiones=1, flexibilidad="Moderado", duraciones=DURACIONES_POR_DEFECTO, semilla=0,
+          rejilla=REJILLA_POR_DEFECTO):
+    """Mide cada etapa con un colegio generado con ``parametros`` (argumentos de ``generar_colegio``).
+
+    El solver usa una semilla fija para que las ejecuciones sean comparables.
+    ``duraciones`` son las sesiones en minutos (se redondean a la rejilla).
+    Devuelve la mediana de cada etapa sobre ``repeticiones`` pasadas, el tamaño
+    de los datos y del modelo y el resultado de la última pasada.
+    """
+    df, reglas = generar_colegio(rejilla=rejilla, semilla=semilla, **parametros)
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="xlsxwriter")
+    contenido = buffer.getvalue()
+
+    duraciones = rejilla.duraciones_en_franjas(duraciones) if duraciones else ()
+    pasadas = []
+    for _ in range(repeticiones):
+        tiempos, resultado = _ejecutar(contenido, reglas, flexibilidad, duraciones, semilla, rejilla)
+        pasadas.append(tiempos)
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version": _version(),
+        "entorno": _entorno(),
+        "parametros": {**parametros, "flexibilidad": flexibilidad,
+                       "sesiones": [d * rejilla.minutos_franja for d in duraciones], "semilla": semilla,
+                       **({"rejilla": rejilla.configuracion()} if rejilla != REJILLA_POR_DEFECTO else {})},
+        "datos": {"filas": len(df), "profesores": int(df["Profesor"].nunique()),
+                  "cursos": int(df["Curso"].nunique()), "reglas": len(reglas),
+                  "aulas": int(df["Aula"][df["Aula"] != ""].nunique()) if "Aula" in df else 0,
+                  "franjas": int((df["Horas por semana"] * rejilla.franjas_por_hora).sum())},
+        "repeticiones": repeticiones,
+        "tiempos": {
+            etapa: statistics.median(p[etapa] for p in pasadas) for etapa in ETAPAS if all(etapa in p for p in pasadas)
+        },
+        "resultado": resultado,
+    }
+
+
+def cargar_historial(ruta=RUTA_HISTORIAL):
+    ruta = Path(ruta)
+    return json.loads(ruta.read_text(encoding="utf-8")) if ruta.exists() else []
+
+
+def guardar_en_historial(medicion, ruta=RUTA_HISTORIAL):
+    """Añade una medición al historial JSON (una lista, de la más antigua a la más reciente)."""
+    historial = cargar_historial(ruta)
+    historial.append(medicion)
+    Path(ruta).write_text(json.dumps(historial, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def regresiones(medicion, historial, umbral=UMBRAL_REGRESION):
+    """Etapas más lentas que en la última medición con los mismos parámetros.
+
+    Devuelve ``{etapa: (segundos antes, segundos ahora)}``; vacío si no hay
+    medición anterior comparable.
+    """
+    anteriores = [m for m in historial if m["parametros"] == medicion["parametros"] and m is not medicion]
+    if not anteriores:
+        return {}
+    antes = anteriores[-1]["tiempos"]
+    return {
+        etapa: (antes[etapa], ahora)
+        for etapa, ahora in medicion["tiempos"].items()
+        if etapa in antes and ahora > antes[etapa] * (1 + umbral) and ahora - antes[etapa] > MINIMO_REGRESION
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m horarios.banco", description=__doc__.splitlines()[0])
+    parser.add_argument("--escenario", choices=ESCENARIOS, default="mediano",
+                        help="tamaño del colegio (por defecto: mediano)")
+    parser.add_argument("--profesores", type=int, help="número de profesores (sustituye al del escenario)")
+    parser.add_argument("--cursos", type=int, help="número de cursos (sustituye al del escenario)")
+    parser.add_argument("--aulas", type=int, help="aulas compartidas (sustituye al del escenario)")
+    parser.add_argument("--asignaturas", type=int, default=9, help="asignaturas distintas (por defecto: 9)")
+    parser.add_argument("--horas", default="1,1.5,2",
+                        help="horas por semana posibles de cada clase, separadas por comas (por defecto: 1,1.5,2)")
+    parser.add_argument("--ocupacion", type=float, default=0.75,
+                        help="fracción de las franjas lectivas de cada curso que se llena (por defecto: 0.75)")
+    parser.add_argument("--rejilla", type=Path,
+                        help="rejilla semanal en JSON o YAML (por defecto: lunes a viernes de 9:00 a 14:00)")
+    parser.add_argument("--densidad", type=float, default=0.1,
+                        help="fracción de profesores con una regla de disponibilidad (por defecto: 0.1)")
+    parser.add_argument("-f", "--flexibilidad", default="Moderado", choices=list(TIEMPO_MAXIMO))
+    parser.add_argument("--sin-sesiones", action="store_true", help="coloca las clases franja a franja")
+    parser.add_argument("--semilla", type=int, default=0, help="semilla de los datos y del solver (por defecto: 0)")
+    parser.add_argument("--repeticiones", type=int, default=1, help="pasadas por medición (por defecto: 1)")
+    parser.add_argument("--historial", type=Path, default=RUTA_HISTORIAL,
+                        help=f"historial JSON de mediciones (por defecto: {RUTA_HISTORIAL})")
+    parser.add_argument("--no-guardar", action="store_true", help="no añade la medición al historial")
+    parser.add_argument("--json", action="store_true", help="imprime la medición en JSON")
+    args = parser.parse_args(argv)
+
+    parametros = {
+        **ESCENARIOS[args.escenario],
+        "asignaturas": args.asignaturas,
+        "horas": tuple(float(h) for h in args.horas.split(",")),
+        "ocupacion": args.ocupacion,
+        "densidad_restricciones": args.densidad,
+    }
+    if args.profesores:
+        parametros["profesores"] = args.profesores
+    if args.cursos:
+        parametros["cursos"] = args.cursos
+    if args.aulas is not None:
+        parametros["aulas"] = args.aulas
+
+    medicion = medir(parametros, args.repeticiones, args.flexibilidad, None if args.sin_sesiones else DURACIONES_POR_DEFECTO,
+                     args.semilla, cargar_rejilla(args.rejilla))
+    # En el historial los parámetros deben compararse tal cual se leen del JSON
+    medicion = json.loads(json.dumps(medicion))
+    historial = cargar_historial(args.historial)
+    empeoradas = regresiones(medicion, historial)
+    if not args.no_guardar:
+        guardar_en_historial(medicion, args.historial)
+
+    if args.json:
+        print(json.dumps({**medicion, "regresiones": empeoradas}, indent=2, ensure_ascii=False))
+    else:
+        datos = medicion["datos"]
+        resultado = medicion["resultado"]
+        print(f"🏫 {datos['filas']} clases · {datos['profesores']} profesores · {datos['cursos']} cursos · "
+              f"{datos['aulas']} aulas · {datos['reglas']} reglas · {datos['franjas']} franjas")
+        for etapa, segundos in medicion["tiempos"].items():
+            aviso = ""
+            if etapa in empeoradas:
+                aviso = f"  ⚠️ antes {empeoradas[etapa][0] * 1000:.0f} ms"
+            print(f"   {etapa:<14}{segundos * 1000:>10.0f} ms{aviso}")
+        print(f"🧮 {resultado.get('status')} · {resultado.get('variables', 0)} variables · "
+              f"{resultado.get('restricciones', 0)} restricciones · penalización {resultado.get('penalizacion', '-')}")
+    return 1 if empeoradas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
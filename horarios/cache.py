@@ -0,0 +1,135 @@
+"""Caché persistente de soluciones en SQLite, con expulsión LRU y límite de tamaño.
+
+La clave es un hash del contenido normalizado de la tabla y de toda la
+configuración que influye en el modelo (flexibilidad, reglas activas, rejilla),
+de modo que repetir una petición idéntica devuelve el horario al instante.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+DIRECTORIO_POR_DEFECTO = Path(os.environ.get("HORARIOS_CACHE_DIR", ".cache_horarios"))
+
+COLUMNAS_CLAVE = ["Profesor", "Asignatura", "Curso", "Franjas_necesarias"]
+# Solo entran en la clave si la tabla las tiene, para no invalidar las soluciones sin aulas
+COLUMNAS_OPCIONALES = ["Aula", "Capacidad aula"]
+
+# Estados que merece la pena guardar (UNKNOWN depende del tiempo disponible)
+ESTADOS_CACHEABLES = ("OPTIMAL", "FEASIBLE", "INFEASIBLE")
+
+
+def clave_solucion(df, **configuracion):
+    """Hash SHA-256 de las filas normalizadas de ``df`` y de la configuración."""
+    h = hashlib.sha256()
+    normalizada = df[COLUMNAS_CLAVE + [c for c in COLUMNAS_OPCIONALES if c in df.columns]].astype(str)
+    h.update(normalizada.to_csv(index=False).encode("utf-8"))
+    h.update(json.dumps(configuracion, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _comprimir(asignacion):
+    return zlib.compress(np.packbits(asignacion.astype(bool), axis=None).tobytes())
+
+
+def _descomprimir(blob, forma):
+    bits = np.unpackbits(np.frombuffer(zlib.decompress(blob), dtype=np.uint8))
+    return bits[: forma[0] * forma[1]].reshape(forma).astype(np.uint8)
+
+
+class CacheSoluciones:
+    """Soluciones guardadas en disco por clave, expulsando las menos usadas.
+
+    Cada operación abre su propia conexión, así que una misma instancia puede
+    compartirse entre sesiones e hilos.
+    """
+
+    def __init__(self, directorio=None, max_bytes=256 * 1024 * 1024, max_entradas=500):
+        self.directorio = Path(directorio or DIRECTORIO_POR_DEFECTO)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.ruta = self.directorio / "soluciones.sqlite"
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        with self._conectar() as conexion:
+            conexion.execute(
+                """CREATE TABLE IF NOT EXISTS soluciones (
+                    clave TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    filas INTEGER,
+                    franjas INTEGER,
+                    asignacion BLOB,
+                    estadisticas TEXT,
+                    tamano INTEGER NOT NULL,
+                    ultimo_acceso REAL NOT NULL
+                )"""
+            )
+
+    @contextmanager
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def obtener(self, clave):
+        """Resultado guardado (``status``, ``asignacion``, ``estadisticas``) o ``None``."""
+        with self._conectar() as conexion:
+            fila = conexion.execute(
+                "SELECT status, filas, franjas, asignacion, estadisticas FROM soluciones WHERE clave = ?",
+                (clave,),
+            ).fetchone()
+            if fila is None:
+                return None
+            conexion.execute(
+                "UPDATE soluciones SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave)
+            )
+        status, filas, franjas, blob, estadisticas = fila
+        return {
+            "status": status,
+            "asignacion": _descomprimir(blob, (filas, franjas)) if blob is not None else None,
+            "estadisticas": json.loads(estadisticas or "{}"),
+        }
+
+    def guardar(self, clave, status, asignacion=None, estadisticas=None):
+        """Guarda un resultado y expulsa las entradas más antiguas si se supera el límite."""
+        if status not in ESTADOS_CACHEABLES:
+            return
+        blob = _comprimir(asignacion) if asignacion is not None else None
+        filas, franjas = asignacion.shape if asignacion is not None else (None, None)
+        texto = json.dumps(estadisticas or {}, default=str)
+        tamano = len(blob or b"") + len(texto)
+        with self._conectar() as conexion:
+            conexion.execute(
+                "INSERT OR REPLACE INTO soluciones VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (clave, status, filas, franjas, blob, texto, tamano, time.time()),
+            )
+            self._expulsar(conexion)
+
+    def _expulsar(self, conexion):
+        total, entradas = conexion.execute(
+            "SELECT COALESCE(SUM(tamano), 0), COUNT(*) FROM soluciones"
+        ).fetchone()
+        if total <= self.max_bytes and entradas <= self.max_entradas:
+            return
+        for clave, tamano in conexion.execute(
+            "SELECT clave, tamano FROM soluciones ORDER BY ultimo_acceso"
+        ).fetchall():
+            if total <= self.max_bytes and entradas <= self.max_entradas:
+                break
+            conexion.execute("DELETE FROM soluciones WHERE clave = ?", (clave,))
+            total -= tamano
+            entradas -= 1
+
+    def vaciar(self):
+        """Borra todas las soluciones guardadas."""
+        with self._conectar() as conexion:
+            conexion.execute("DELETE FROM soluciones")
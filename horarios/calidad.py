@@ -0,0 +1,109 @@
+"""Calidad del horario y reglas blandas: qué penaliza el objetivo del modelo y cuánto.
+
+Cada término cuenta franjas de la rejilla que empeoran el horario y se
+multiplica por su peso; el solver minimiza la suma. Términos de calidad:
+
+- ``huecos``: franjas libres de un profesor entre su primera y su última clase
+  del día (el recreo no cuenta como hueco).
+- ``bloques``: franjas sueltas de una clase, sin otra franja de la misma clase
+  justo antes o justo después. Solo cuenta si la franja es más corta que una
+  clase (con medias horas, no con periodos de 45 minutos o más).
+- ``reparto``: franjas de una clase que pasan en un mismo día de su reparto
+  equilibrado entre los días de la semana (hora y media seguida se admite).
+
+Los dos últimos dependen de la duración de las franjas, así que reciben la
+``rejilla``.
+
+Las reglas blandas añaden el término ``regla:<id>`` y la re-optimización
+incremental, ``cambios``. El modelo los penaliza en ``horarios.modelo``;
+``evaluar_calidad`` recalcula aquí el desglose con numpy a partir de la matriz
+de asignación, de modo que sirve igual para una resolución única, por
+componentes o recuperada de la caché, y no necesita OR-Tools.
+"""
+
+import numpy as np
+
+from horarios.indices import construir_indices
+from horarios.rejilla import REJILLA_POR_DEFECTO
+
+# Peso por franja de cada término de calidad (0 lo desactiva)
+PESOS_CALIDAD = {"huecos": 1, "bloques": 2, "reparto": 1}
+# Peso por franja del horario anterior que se mueve al re-optimizar
+PESO_CAMBIO = 10
+# Lo que una clase puede tener en un día aunque pase de su reparto equilibrado
+MINUTOS_TOPE_DIARIO = 90
+
+NOMBRES_TERMINOS = {
+    "huecos": "Huecos de profesores",
+    "bloques": "Franjas sueltas",
+    "reparto": "Clases concentradas en un día",
+    "cambios": "Franjas movidas respecto al horario anterior",
+}
+
+
+def tope_diario(necesarias, n_dias, rejilla=REJILLA_POR_DEFECTO):
+    """Franjas por día de un reparto equilibrado, en horas completas y nunca menos de hora y media."""
+    por_hora = rejilla.franjas_por_hora
+    reparto = por_hora * np.ceil(np.asarray(necesarias) / (por_hora * n_dias)).astype(int)
+    return np.maximum(rejilla.franjas_en(MINUTOS_TOPE_DIARIO), reparto)
+
+
+def penaliza_sueltas(rejilla):
+    """Si una franja suelta es menos que una clase (medias horas) y el término ``bloques`` tiene sentido."""
+    return rejilla.franjas_clase_minima > 1
+
+
+def evaluar_calidad(asignacion, df, franjas_dia, reglas, indices=None, pesos=None, previa=None,
+                    rejilla=REJILLA_POR_DEFECTO):
+    """Desglose ``{término: {cantidad, peso, penalizacion}}`` de un horario ya resuelto.
+
+    Cuenta lo mismo que penaliza el modelo con la misma ``rejilla``. Con
+    ``previa`` (horario anterior alineado) añade las franjas movidas.
+    """
+    pesos = PESOS_CALIDAD if pesos is None else pesos
+    if indices is None:
+        indices = construir_indices(df)
+    asignacion = asignacion.astype(bool)
+    n_filas, franjas_totales = asignacion.shape
+    n_dias = franjas_totales // franjas_dia
+    por_dia = asignacion.reshape(n_filas, n_dias, franjas_dia)
+    necesarias = df["Franjas_necesarias"].to_numpy(dtype=int)
+    cantidades = {}
+
+    for id_, tipo, filas, dato, peso in reglas.blandas:
+        if tipo in ("disponibilidad", "prohibido"):
+            cantidad = asignacion[filas][:, ~dato].sum()
+        elif tipo == "minimo_diario":
+            cantidad = np.clip(dato - por_dia[filas].sum(axis=(0, 2)), 0, None).sum()
+        else:
+            cantidad = np.clip(asignacion[filas].sum(axis=0) - 1, 0, None).sum()
+        cantidades[f"regla:{id_}"] = (int(cantidad), peso)
+
+    if pesos.get("huecos", 0) > 0:
+        profesores = [filas for filas in indices["Profesor"].values() if necesarias[filas].sum() >= 2]
+        ocupacion = np.array([por_dia[filas].any(axis=0) for filas in profesores], dtype=bool)
+        ocupacion = ocupacion.reshape(-1, n_dias, franjas_dia)
+        antes = np.maximum.accumulate(ocupacion, axis=2)
+        despues = np.maximum.accumulate(ocupacion[:, :, ::-1], axis=2)[:, :, ::-1]
+        libre = ~ocupacion & ~reglas.recreo.reshape(n_dias, franjas_dia)
+        cantidades["huecos"] = (int((antes & despues & libre).sum()), pesos["huecos"])
+
+    if pesos.get("bloques", 0) > 0 and penaliza_sueltas(rejilla):
+        anterior = np.zeros_like(por_dia)
+        anterior[:, :, 1:] = por_dia[:, :, :-1]
+        siguiente = np.zeros_like(por_dia)
+        siguiente[:, :, :-1] = por_dia[:, :, 1:]
+        sueltas = por_dia & ~anterior & ~siguiente
+        cantidades["bloques"] = (int(sueltas[necesarias >= 2].sum()), pesos["bloques"])
+
+    if pesos.get("reparto", 0) > 0:
+        exceso = por_dia.sum(axis=2) - tope_diario(necesarias, n_dias, rejilla)[:, None]
+        cantidades["reparto"] = (int(np.clip(exceso, 0, None).sum()), pesos["reparto"])
+
+    if previa is not None:
+        cantidades["cambios"] = (int((previa.astype(bool) & ~asignacion).sum()), PESO_CAMBIO)
+
+    return {
+        termino: {"cantidad": cantidad, "peso": peso, "penalizacion": cantidad * peso}
+        for termino, (cantidad, peso) in cantidades.items()
+    }
@@ -0,0 +1,272 @@
+"""Línea de comandos: genera horarios por lotes sin abrir la aplicación.
+
+Ejemplo::
+
+    python -m horarios datos.xlsx otro.csv -f Moderado -f Flexible -o salida/ --procesos 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from horarios.alternativas import DIFERENCIA_MINIMA, MAX_ALTERNATIVAS
+from horarios.cache import CacheSoluciones
+from horarios.calidad import NOMBRES_TERMINOS, PESOS_CALIDAD
+from horarios.datos import MOTOR_EXCEL, MOTORES_EXCEL
+from horarios.diagnostico import texto_grupo
+from horarios.medicion import ETAPAS
+from horarios.pipeline import procesar_archivo, restricciones_por_defecto
+from horarios.reglas import cargar_reglas
+from horarios.rejilla import cargar_rejilla
+from horarios.resolucion import TIEMPO_MAXIMO
+from horarios.sesiones import DURACIONES_POR_DEFECTO
+
+NIVELES = list(TIEMPO_MAXIMO)
+
+
+def _peso(texto):
+    """``CLAVE=N`` → ``(CLAVE, N)`` para las opciones de pesos."""
+    clave, _, valor = texto.partition("=")
+    if not clave or not valor.isdigit():
+        raise argparse.ArgumentTypeError(f"'{texto}' no tiene la forma CLAVE=ENTERO")
+    return clave, int(valor)
+
+
+def _sesiones(texto):
+    """``60,90`` → ``(60, 90)`` (minutos; se redondean a las franjas de la rejilla)."""
+    try:
+        minutos = [int(valor) for valor in texto.split(",")]
+    except ValueError:
+        minutos = []
+    if not minutos:
+        raise argparse.ArgumentTypeError(f"'{texto}' debe ser una lista de minutos, p. ej. 60,90")
+    return tuple(minutos)
+
+
+def texto_penalizaciones(penalizaciones, reglas=None):
+    """Una línea con el total y los términos que penalizan, de mayor a menor."""
+    descripciones = {regla["id"]: regla.get("descripcion", regla["id"]) for regla in reglas or []}
+    terminos = sorted(
+        ((termino, valor) for termino, valor in penalizaciones.items() if valor["penalizacion"]),
+        key=lambda par: -par[1]["penalizacion"],
+    )
+    partes = [
+        f"{descripciones.get(termino[6:], termino) if termino.startswith('regla:') else NOMBRES_TERMINOS[termino]} "
+        f"{valor['cantidad']}×{valor['peso']}"
+        for termino, valor in terminos
+    ]
+    total = sum(valor["penalizacion"] for valor in penalizaciones.values())
+    return f"Penalización {total}" + (f": {', '.join(partes)}" if partes else "")
+
+
+def _alternativas(texto):
+    if not texto.isdigit() or not 1 <= int(texto) <= MAX_ALTERNATIVAS:
+        raise argparse.ArgumentTypeError(f"'{texto}' debe ser un entero entre 1 y {MAX_ALTERNATIVAS}")
+    return int(texto)
+
+
+def _porcentaje(texto):
+    """``10`` → ``0.1``."""
+    try:
+        valor = float(texto)
+    except ValueError:
+        valor = -1
+    if not 0 < valor < 100:
+        raise argparse.ArgumentTypeError(f"'{texto}' debe ser un porcentaje entre 0 y 100")
+    return valor / 100
+
+
+def texto_tiempos(estadisticas):
+    """Una línea con los segundos de cada etapa medida y los contadores principales del solver."""
+    tiempos = estadisticas.get("tiempos") or {}
+    partes = [f"{ETAPAS[etapa]} {tiempos[etapa]:.2f} s" for etapa in ETAPAS if etapa in tiempos]
+    solver = estadisticas.get("solver")
+    if solver:
+        partes.append(f"{solver['conflictos']} conflictos, {solver['ramas']} ramas")
+    return "Tiempos: " + " · ".join(partes)
+
+
+def nombres_salida(entradas):
+    """Nombre base del Excel de cada entrada: su nombre sin extensión y, si otra lo comparte, algo más.
+
+    Las entradas con el mismo nombre (``p.xlsx`` y ``p.csv``, o
+    ``campusA/datos.xlsx`` y ``campusB/datos.xlsx``) añaden, por este orden, la
+    extensión, la carpeta o ambas hasta distinguirse. Lanza ``ValueError`` si
+    aun así dos entradas escribirían el mismo archivo (p. ej. el mismo archivo
+    repetido).
+    """
+    formas = (
+        lambda ruta: ruta.stem,
+        lambda ruta: f"{ruta.stem}_{ruta.suffix.lstrip('.')}",
+        lambda ruta: f"{ruta.resolve().parent.name}_{ruta.stem}",
+        lambda ruta: f"{ruta.resolve().parent.name}_{ruta.stem}_{ruta.suffix.lstrip('.')}",
+    )
+    por_nombre = {}
+    for entrada in entradas:
+        por_nombre.setdefault(entrada.stem, []).append(entrada)
+    nombres = {}
+    for grupo in por_nombre.values():
+        forma = next((forma for forma in formas if len({forma(ruta) for ruta in grupo}) == len(grupo)), formas[-1])
+        nombres.update({ruta: forma(ruta) for ruta in grupo})
+    repetidos = sorted(nombre for nombre, veces in Counter(nombres[ruta] for ruta in entradas).items() if veces > 1)
+    if repetidos:
+        raise ValueError(f"Varias entradas escribirían el mismo archivo: {', '.join(repetidos)}")
+    return nombres
+
+
+def _escenario(entrada, salida, reglas, flexibilidad, activar, desactivar, sin_restricciones, opciones, usar_cache):
+    """Un archivo con un nivel de flexibilidad (se ejecuta en el proceso principal o en uno hijo)."""
+    if sin_restricciones:
+        restricciones = {}
+    else:
+        restricciones = restricciones_por_defecto(reglas, flexibilidad)
+    restricciones.update({id_: True for id_ in activar})
+    restricciones.update({id_: False for id_ in desactivar})
+    try:
+        return procesar_archivo(
+            entrada, salida, reglas, restricciones, flexibilidad,
+            cache=CacheSoluciones() if usar_cache else None, copia_parquet=usar_cache, **opciones
+        )
+    except Exception as error:
+        return {"entrada": str(entrada), "salida": None, "flexibilidad": flexibilidad,
+                "status": "ERROR", "error": str(error)}
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m horarios",
+        description="Genera horarios escolares a partir de archivos Excel/CSV "
+                    "(Profesor, Asignatura, Curso, Horas por semana).",
+    )
+    parser.add_argument("entradas", nargs="+", type=Path, help="archivos de datos (.xlsx o .csv)")
+    parser.add_argument("-o", "--salida-dir", type=Path, default=Path("horarios_generados"),
+                        help="carpeta donde se escriben los Excel (por defecto: horarios_generados)")
+    parser.add_argument("-f", "--flexibilidad", action="append", choices=NIVELES,
+                        help="nivel de flexibilidad; repetir para generar varios escenarios (por defecto: Moderado)")
+    parser.add_argument("--reglas", type=Path, help="archivo de reglas JSON, YAML o Excel")
+    parser.add_argument("--rejilla", type=Path,
+                        help="rejilla semanal en JSON o YAML: días, franjas, recreos y jornadas por curso "
+                             "(por defecto: lunes a viernes de 9:00 a 14:00 en medias horas)")
+    parser.add_argument("--activar", action="append", default=[], metavar="ID",
+                        help="activa una regla aunque no esté marcada por defecto")
+    parser.add_argument("--desactivar", action="append", default=[], metavar="ID",
+                        help="desactiva una regla")
+    parser.add_argument("--sin-restricciones", action="store_true",
+                        help="solo recreo, choques y horas (ninguna regla activa salvo --activar)")
+    parser.add_argument("--peso", action="append", default=[], type=_peso, metavar="ID=N",
+                        help="convierte la regla en blanda con ese peso por franja incumplida (0: obligatoria)")
+    parser.add_argument("--calidad", action="append", default=[], type=_peso, metavar="TERMINO=N",
+                        help=f"peso de un término de calidad ({', '.join(f'{t}={p}' for t, p in PESOS_CALIDAD.items())}; "
+                             "0 lo desactiva)")
+    parser.add_argument("--sesiones", type=_sesiones, metavar="MIN,MIN",
+                        help="duraciones en minutos de las sesiones seguidas en que se divide cada clase, "
+                             "redondeadas a las franjas de la rejilla (por defecto: "
+                             f"{','.join(map(str, DURACIONES_POR_DEFECTO))})")
+    parser.add_argument("--sin-sesiones", action="store_true",
+                        help="coloca las clases franja a franja, sin agruparlas en sesiones")
+    parser.add_argument("--componentes", action="store_true",
+                        help="resuelve por componentes independientes en paralelo")
+    parser.add_argument("--alternativas", type=_alternativas, default=1, metavar="K",
+                        help=f"genera K horarios distintos ordenados por penalización (hasta {MAX_ALTERNATIVAS}); "
+                             "el segundo y siguientes se escriben con el sufijo _alt2, _alt3...")
+    parser.add_argument("--diferencia", type=_porcentaje, default=DIFERENCIA_MINIMA, metavar="PCT",
+                        help="porcentaje mínimo de franjas en que cada alternativa difiere de las demás "
+                             f"(por defecto: {DIFERENCIA_MINIMA:.0%})")
+    parser.add_argument("--semilla", type=int, help="semilla del solver (desactiva la caché)")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="escenarios que se resuelven a la vez (por defecto: 1)")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="no consulta ni guarda la caché de soluciones ni la copia Parquet de los datos")
+    parser.add_argument("--motor-excel", choices=MOTORES_EXCEL, default=MOTOR_EXCEL,
+                        help="motor para leer los .xlsx (por defecto: calamine si está instalado)")
+    parser.add_argument("--resumen", type=Path, help="escribe el resumen de todos los escenarios en JSON")
+    parser.add_argument("--log-metricas", type=Path, metavar="ARCHIVO",
+                        help="añade a ese archivo una línea JSON por escenario con tiempos por etapa "
+                             "(presolve y búsqueda por separado), tamaño del modelo y estadísticas del solver")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    reglas = cargar_reglas(args.reglas)
+    conocidas = {regla["id"] for regla in reglas}
+    desconocidas = sorted(set(args.activar + args.desactivar + [id_ for id_, _ in args.peso]) - conocidas)
+    if desconocidas:
+        print(f"❌ Reglas desconocidas: {', '.join(desconocidas)}", file=sys.stderr)
+        return 2
+    terminos = sorted({termino for termino, _ in args.calidad} - set(PESOS_CALIDAD))
+    if terminos:
+        print(f"❌ Términos de calidad desconocidos: {', '.join(terminos)}", file=sys.stderr)
+        return 2
+
+    try:
+        rejilla = cargar_rejilla(args.rejilla)
+        duraciones = args.sesiones or DURACIONES_POR_DEFECTO
+        rejilla.duraciones_en_franjas(duraciones)
+        nombres = nombres_salida(args.entradas)
+    except (OSError, ValueError) as error:
+        print(f"❌ {error}", file=sys.stderr)
+        return 2
+
+    niveles = args.flexibilidad or ["Moderado"]
+    opciones = {
+        "por_componentes": args.componentes,
+        "semilla": args.semilla,
+        "motor": args.motor_excel,
+        "pesos_reglas": dict(args.peso),
+        "pesos_calidad": {**PESOS_CALIDAD, **dict(args.calidad)},
+        "rejilla": rejilla,
+        "duraciones": None if args.sin_sesiones else duraciones,
+        "log_metricas": args.log_metricas,
+        "alternativas": args.alternativas,
+        "diferencia": args.diferencia,
+    }
+    escenarios = []
+    for entrada in args.entradas:
+        for flexibilidad in niveles:
+            sufijo = flexibilidad.lower().replace(" ", "_")
+            salida = args.salida_dir / f"{nombres[entrada]}_{sufijo}.xlsx"
+            escenarios.append((entrada, salida, reglas, flexibilidad, args.activar, args.desactivar,
+                               args.sin_restricciones, opciones, not args.sin_cache))
+
+    if args.procesos > 1 and len(escenarios) > 1:
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(min(args.procesos, len(escenarios)), mp_context=contexto) as pool:
+            resumenes = list(pool.map(_escenario, *zip(*escenarios)))
+    else:
+        resumenes = [_escenario(*escenario) for escenario in escenarios]
+
+    for resumen in resumenes:
+        icono = "✅" if resumen["salida"] else "❌"
+        detalle = resumen["salida"] or resumen.get("error", "sin solución")
+        print(f"{icono} {resumen['entrada']} [{resumen['flexibilidad']}] {resumen['status']}: {detalle}")
+        estadisticas = resumen.get("estadisticas", {})
+        conflicto = estadisticas.get("conflicto")
+        if estadisticas.get("tiempos"):
+            print(f"   {texto_tiempos(estadisticas)}")
+        if estadisticas.get("penalizaciones") is not None:
+            print(f"   {texto_penalizaciones(estadisticas['penalizaciones'], reglas)}")
+        rutas = [resumen["salida"], *resumen.get("alternativas", [])]
+        for n, (ruta, alternativa) in enumerate(zip(rutas, estadisticas.get("alternativas", [])), start=1):
+            print(f"   Alternativa {n}: penalización {alternativa['penalizacion']}, "
+                  f"{alternativa['distinta_de_la_mejor']} franjas distintas de la mejor → {ruta}")
+        if estadisticas.get("viabilidad"):
+            print("   Imposible sin lanzar el solver:")
+            for problema in estadisticas["viabilidad"]:
+                print(f"     {texto_grupo(problema, reglas)}")
+        elif conflicto and conflicto["grupos"]:
+            print("   Conflicto entre:")
+            for grupo in conflicto["grupos"]:
+                print(f"     {texto_grupo(grupo, reglas)}")
+
+    if args.resumen:
+        args.resumen.write_text(json.dumps(resumenes, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+    return 0 if all(resumen["salida"] for resumen in resumenes) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Carga y limpieza de la tabla de asignaciones (Profesor, Asignatura, Curso, Horas por semana).
+
+Las columnas ``Aula`` y ``Capacidad aula`` son opcionales (ver ``horarios.aulas``).
+
+Profesor, Asignatura y Curso se repiten mucho, así que se guardan como
+``category`` y la limpieza se hace una vez por valor distinto. La tabla
+normalizada se copia en Parquet, con el hash del archivo original como nombre,
+para que volver a cargar el mismo archivo no tenga que analizar el Excel.
+"""
+
+import hashlib
+import importlib.util
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from horarios.aulas import CAPACIDAD_POR_DEFECTO, COLUMNA_AULA, COLUMNA_CAPACIDAD
+from horarios.cache import DIRECTORIO_POR_DEFECTO
+
+COLUMNAS_REQUERIDAS = ["Profesor", "Asignatura", "Curso", "Horas por semana"]
+COLUMNAS_TEXTO = ["Profesor", "Asignatura", "Curso"]
+
+# calamine (Rust) lee los .xlsx varias veces más rápido que openpyxl
+MOTOR_EXCEL = "calamine" if importlib.util.find_spec("python_calamine") else None
+MOTORES_EXCEL = ("openpyxl", "calamine")
+
+COPIA_PARQUET_DISPONIBLE = importlib.util.find_spec("pyarrow") is not None
+MAX_COPIAS = 20
+# Cambiar al modificar la normalización para no reutilizar copias antiguas
+VERSION_NORMALIZACION = 2
+# Franjas de media hora: cada hora por semana son dos
+FRANJAS_POR_HORA = 2
+
+
+def huella_archivo(contenido):
+    """Hash SHA-256 del contenido (``bytes``) de un archivo de datos."""
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def _categoria_limpia(serie):
+    """Texto sin espacios sobrantes como ``category``, limpiando cada valor distinto una sola vez."""
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    limpios = pd.Index(unicos).astype(str).str.strip()
+    categorias, nuevos = np.unique(limpios.to_numpy(dtype=object), return_inverse=True)
+    return pd.Categorical.from_codes(nuevos[codigos], categories=categorias)
+
+
+def franjas_necesarias(df, franjas_por_hora=FRANJAS_POR_HORA):
+    """Rellena ``Franjas_necesarias`` con las horas por semana pasadas a franjas de la rejilla.
+
+    ``franjas_por_hora`` es ``Rejilla.franjas_por_hora`` (2 con medias horas).
+    Lanza ``ValueError`` si alguna clase no ocupa un número entero de franjas.
+    """
+    franjas = df["Horas por semana"] * franjas_por_hora
+    if (franjas % 1 != 0).any():
+        raise ValueError(
+            f"Las horas por semana deben ser múltiplos de {1 / franjas_por_hora:g} con esta rejilla"
+        )
+    df["Franjas_necesarias"] = franjas.astype(int)
+    return df
+
+
+def cargar_datos(origen, nombre=None, motor=MOTOR_EXCEL, franjas_por_hora=FRANJAS_POR_HORA):
+    """Lee un Excel o CSV y lo normaliza; ``origen`` es una ruta o un archivo abierto.
+
+    ``motor`` es el motor de ``pd.read_excel`` (``None`` usa el de pandas).
+    Lanza ``ValueError`` si faltan columnas requeridas, si alguna capacidad
+    de aula no es un entero positivo o si unas horas no caben en franjas enteras.
+    """
+    nombre = str(nombre or getattr(origen, "name", origen))
+    df = pd.read_excel(origen, engine=motor) if nombre.endswith(".xlsx") else pd.read_csv(origen)
+
+    # Validar columnas
+    columnas_faltantes = [col for col in COLUMNAS_REQUERIDAS if col not in df.columns]
+    if columnas_faltantes:
+        raise ValueError(f"Faltan las siguientes columnas: {', '.join(columnas_faltantes)}")
+
+    # Limpiar datos
+    for columna in COLUMNAS_TEXTO:
+        df[columna] = _categoria_limpia(df[columna])
+
+    # Aula opcional: vacía si la clase no necesita un espacio concreto
+    if COLUMNA_AULA in df.columns:
+        df[COLUMNA_AULA] = _categoria_limpia(df[COLUMNA_AULA].fillna(""))
+        if COLUMNA_CAPACIDAD in df.columns:
+            capacidad = pd.to_numeric(df[COLUMNA_CAPACIDAD], errors="coerce").fillna(CAPACIDAD_POR_DEFECTO)
+        else:
+            capacidad = pd.Series(CAPACIDAD_POR_DEFECTO, index=df.index)
+        if ((capacidad < 1) | (capacidad % 1 != 0)).any():
+            raise ValueError(f"La columna '{COLUMNA_CAPACIDAD}' debe tener enteros mayores o iguales que 1")
+        df[COLUMNA_CAPACIDAD] = capacidad.astype(int)
+
+    # Convertir comas a puntos en horas
+    if not pd.api.types.is_numeric_dtype(df["Horas por semana"]):
+        df["Horas por semana"] = df["Horas por semana"].astype(str).str.replace(",", ".").astype(float)
+
+    # Convertir a franjas de la rejilla
+    return franjas_necesarias(df, franjas_por_hora)
+
+
+def cargar_datos_en_cache(contenido, nombre, motor=MOTOR_EXCEL, directorio=None, huella=None,
+                          franjas_por_hora=FRANJAS_POR_HORA):
+    """Como ``cargar_datos`` para el contenido de un archivo, reutilizando su copia Parquet.
+
+    La copia sirve para cualquier rejilla: las franjas se recalculan de las
+    horas. Si no hay ``pyarrow`` se analiza el archivo siempre.
+    """
+    if not COPIA_PARQUET_DISPONIBLE:
+        return cargar_datos(io.BytesIO(contenido), nombre, motor, franjas_por_hora)
+
+    carpeta = Path(directorio or DIRECTORIO_POR_DEFECTO) / "datos"
+    copia = carpeta / f"{huella or huella_archivo(contenido)}_v{VERSION_NORMALIZACION}.parquet"
+    if copia.exists():
+        try:
+            df = pd.read_parquet(copia)
+            copia.touch()
+        except Exception:
+            copia.unlink(missing_ok=True)  # copia dañada: se vuelve a generar
+        else:
+            return franjas_necesarias(df, franjas_por_hora)
+
+    df = cargar_datos(io.BytesIO(contenido), nombre, motor, franjas_por_hora)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    # Escribir en un temporal y renombrar: otra sesión puede estar leyendo la misma copia
+    with tempfile.NamedTemporaryFile(dir=carpeta, suffix=".tmp", delete=False) as temporal:
+        df.to_parquet(temporal, index=False)
+    Path(temporal.name).replace(copia)
+
+    # Conservar solo las copias usadas más recientemente
+    copias = sorted(carpeta.glob("*.parquet"), key=lambda ruta: ruta.stat().st_mtime, reverse=True)
+    for antigua in copias[MAX_COPIAS:]:
+        antigua.unlink(missing_ok=True)
+    return df
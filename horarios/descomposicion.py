@@ -0,0 +1,221 @@
+"""Resolución por componentes independientes en paralelo.
+
+Profesores y cursos forman un grafo bipartito a través de las filas de la
+tabla; las aulas compartidas y las reglas de exclusión y de mínimo diario,
+obligatorias o blandas, unen además las filas que agrupan. Cada componente
+conexa no comparte ninguna restricción con las demás, así que se resuelve con
+su propio modelo en un proceso aparte y los resultados se combinan en una sola
+matriz de asignación.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from horarios.aulas import COLUMNAS_AULA, aulas_compartidas
+from horarios.indices import construir_indices
+from horarios.medicion import combinar_estadisticas, cronometrar, estadisticas_solver
+from horarios.modelo import construir_modelo, tamano_modelo
+from horarios.rejilla import REJILLA_POR_DEFECTO
+from horarios.resolucion import TIEMPO_SIN_MEJORA, SeguimientoSoluciones, configurar_solver, extraer_asignacion
+
+COLUMNAS_MODELO = ["Profesor", "Asignatura", "Curso", "Franjas_necesarias"]
+
+# Evento compartido con los procesos hijos para detener todas las búsquedas
+_detener = None
+
+
+def etiquetar_componentes(df, reglas, indices=None):
+    """Número de componente (0, 1, ...) de cada fila, mediante union-find."""
+    if indices is None:
+        indices = construir_indices(df)
+    padre = np.arange(len(df))
+
+    def raiz(i):
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    grupos = [*indices["Profesor"].values(), *indices["Curso"].values()]
+    grupos += [filas for _, filas, _ in aulas_compartidas(df, indices)]
+    grupos += [filas for _, filas, _ in reglas.minimos_diarios]
+    grupos += [filas for _, filas in reglas.exclusiones]
+    grupos += [filas for _, tipo, filas, _, _ in reglas.blandas if tipo in ("minimo_diario", "exclusion")]
+    for filas in grupos:
+        primera = raiz(filas[0]) if len(filas) else None
+        for i in filas[1:]:
+            otra = raiz(i)
+            if otra != primera:
+                padre[otra] = primera
+
+    raices = np.array([raiz(i) for i in range(len(df))])
+    return np.unique(raices, return_inverse=True)[1]
+
+
+def _iniciar_proceso(evento):
+    global _detener
+    _detener = evento
+
+
+def _resolver_componente(sub_df, reglas, dias, franjas_por_dia, flexibilidad, semilla, num_workers, pesos,
+                         duraciones, rejilla, registro_busqueda):
+    """Construye y resuelve el modelo de una componente (se ejecuta en un proceso hijo).
+
+    Devuelve ``(estado, asignacion, tamano, tiempos, estadisticas del solver)``.
+    """
+    tiempos = {}
+    with cronometrar(tiempos, "construccion"):
+        model, variables, _ = construir_modelo(
+            sub_df, dias, franjas_por_dia, reglas, pesos=pesos, duraciones=duraciones, rejilla=rejilla
+        )
+    tamano = tamano_modelo(model)
+    solver = configurar_solver(flexibilidad, semilla, num_workers, registro_busqueda)
+    seguimiento = SeguimientoSoluciones()
+
+    terminado = threading.Event()
+
+    def vigilar():
+        while not terminado.wait(0.2):
+            if (_detener is not None and _detener.is_set()) or seguimiento.estancada(TIEMPO_SIN_MEJORA):
+                solver.StopSearch()
+                return
+
+    threading.Thread(target=vigilar, daemon=True).start()
+    try:
+        estado = solver.StatusName(solver.Solve(model, seguimiento))
+    finally:
+        terminado.set()
+
+    estadisticas = estadisticas_solver(solver.ResponseProto(), model.HasObjective())
+    asignacion = None
+    if estado in ("OPTIMAL", "FEASIBLE"):
+        with cronometrar(tiempos, "extraccion"):
+            asignacion = extraer_asignacion(solver, variables, len(sub_df), len(dias) * len(franjas_por_dia))
+    return estado, asignacion, tamano, tiempos, estadisticas
+
+
+def combinar_estados(estados):
+    """Estado global: cualquier componente imposible hace imposible el conjunto."""
+    if "INFEASIBLE" in estados or "MODEL_INVALID" in estados:
+        return "INFEASIBLE" if "INFEASIBLE" in estados else "MODEL_INVALID"
+    if "UNKNOWN" in estados:
+        return "UNKNOWN"
+    return "OPTIMAL" if all(e == "OPTIMAL" for e in estados) else "FEASIBLE"
+
+
+class SeguimientoComponentes:
+    """Progreso de una resolución por componentes (mismos campos que ``SeguimientoSoluciones``)."""
+
+    def __init__(self, total):
+        self.inicio = time.perf_counter()
+        self.total = total
+        self.soluciones = 0
+        self.objetivo = None
+        self.cota = None
+        self.tiempo_primera = None
+
+    @property
+    def tiempo(self):
+        return time.perf_counter() - self.inicio
+
+
+class ResolucionPorComponentes:
+    """Resuelve cada componente en un ``ProcessPoolExecutor`` y combina los resultados.
+
+    Ofrece la misma interfaz que ``ResolucionEnCurso`` (``terminada``,
+    ``esperar``, ``detener``, ``estado``, ``asignacion``...). En ``tiempos``
+    quedan la construcción y la extracción sumadas de todas las componentes.
+    ``registro_busqueda`` se pasa a ``configurar_solver`` en cada proceso.
+    """
+
+    def __init__(self, df, dias, franjas_por_dia, reglas, flexibilidad, semilla=None,
+                 max_procesos=None, indices=None, pesos=None, duraciones=None, rejilla=REJILLA_POR_DEFECTO,
+                 registro_busqueda=False):
+        self.etiquetas = etiquetar_componentes(df, reglas, indices)
+        self.componentes = int(self.etiquetas.max()) + 1 if len(df) else 0
+        self.procesos = max(1, min(self.componentes, max_procesos or os.cpu_count() or 1))
+        self._hilos_por_proceso = max(1, (os.cpu_count() or 1) // self.procesos)
+        self.forma = (len(df), len(dias) * len(franjas_por_dia))
+        self.seguimiento = SeguimientoComponentes(self.componentes)
+        self.limite = configurar_solver(flexibilidad).parameters.max_time_in_seconds
+        self.estado = None
+        self.asignacion = None
+        self.estados = []
+        self.tamano = {"variables": 0, "restricciones": 0, "terminos_objetivo": 0}
+        self.tiempos = {}
+        self.estadisticas_solver = None
+        self.tiempo_resolucion = None
+        self.detenida = False
+        self.error = None
+
+        contexto = multiprocessing.get_context("spawn")
+        self._evento = contexto.Event()
+        self._pool = ProcessPoolExecutor(
+            self.procesos, mp_context=contexto, initializer=_iniciar_proceso, initargs=(self._evento,)
+        )
+        datos = df[COLUMNAS_MODELO + [c for c in COLUMNAS_AULA if c in df.columns]].reset_index(drop=True)
+        self._futuros = {}
+        for c in range(self.componentes):
+            filas = np.flatnonzero(self.etiquetas == c)
+            futuro = self._pool.submit(
+                _resolver_componente, datos.iloc[filas].reset_index(drop=True), reglas.subconjunto(filas),
+                dias, franjas_por_dia, flexibilidad, semilla, self._hilos_por_proceso, pesos, duraciones,
+                rejilla, registro_busqueda
+            )
+            self._futuros[futuro] = filas
+        self._hilo = threading.Thread(target=self._combinar, daemon=True)
+        self._hilo.start()
+
+    @property
+    def hilos(self):
+        return self.procesos * self._hilos_por_proceso
+
+    def _combinar(self):
+        asignacion = np.zeros(self.forma, dtype=np.uint8)
+        estadisticas = []
+        try:
+            for futuro in as_completed(self._futuros):
+                try:
+                    estado, parcial, tamano, tiempos, estadisticas_componente = futuro.result()
+                except Exception as error:  # fallo en el proceso hijo
+                    self.error = error
+                    estado, parcial, tamano, tiempos, estadisticas_componente = "MODEL_INVALID", None, {}, {}, None
+                self.estados.append(estado)
+                for clave, valor in tamano.items():
+                    self.tamano[clave] += valor
+                for etapa, segundos in tiempos.items():
+                    self.tiempos[etapa] = self.tiempos.get(etapa, 0.0) + segundos
+                if estadisticas_componente is not None:
+                    estadisticas.append(estadisticas_componente)
+                if parcial is not None:
+                    asignacion[self._futuros[futuro]] = parcial
+                self.seguimiento.soluciones += 1
+                if self.seguimiento.tiempo_primera is None:
+                    self.seguimiento.tiempo_primera = self.seguimiento.tiempo
+                # Una componente imposible hace imposible el horario: no esperar al resto
+                if estado == "INFEASIBLE":
+                    self._evento.set()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self.estado = combinar_estados(self.estados) if self.estados else "UNKNOWN"
+        self.estadisticas_solver = combinar_estadisticas(estadisticas) if estadisticas else None
+        if self.estado in ("OPTIMAL", "FEASIBLE"):
+            self.asignacion = asignacion
+        self.tiempo_resolucion = self.seguimiento.tiempo
+
+    @property
+    def terminada(self):
+        return not self._hilo.is_alive()
+
+    def esperar(self, timeout=None):
+        self._hilo.join(timeout)
+        return self.terminada
+
+    def detener(self):
+        self.detenida = True
+        self._evento.set()
@@ -0,0 +1,237 @@
+"""Diagnóstico de viabilidad previo a la generación del horario."""
+
+import numpy as np
+import pandas as pd
+
+from horarios.aulas import aulas_compartidas, capacidades_aulas
+from horarios.indices import construir_indices
+from horarios.rejilla import REJILLA_POR_DEFECTO, duracion_franjas
+from horarios.sesiones import inicios_posibles, sesiones_por_fila, sesiones_que_caben
+
+HORAS_MAXIMAS_PROFESOR = 25
+OCUPACION_MAXIMA = 80  # % de ocupación a partir del cual se considera sobrecarga
+
+ICONOS = {"regla": "📋", "profesor": "👨‍🏫", "curso": "🎓", "aula": "🏫", "fila": "📚"}
+
+
+def diagnosticar(df, rejilla=REJILLA_POR_DEFECTO):
+    """Métricas de carga y capacidad de la tabla (descontando el recreo).
+
+    La capacidad de cada curso son las franjas de su jornada en la rejilla
+    (``franjas_curso``); ``franjas_por_curso`` es la de la jornada más larga.
+    ``ocupacion_aulas`` es el porcentaje de plazas-franja de cada aula que
+    piden sus clases, sobre las franjas en que alguno de sus cursos tiene
+    jornada, de la más llena a la menos (vacío si no hay aulas).
+    """
+    mascaras = {curso: rejilla.mascara_curso(curso) for curso in df["Curso"].unique()}
+    franjas_curso = pd.Series({curso: int(mascara.sum()) for curso, mascara in mascaras.items()}, dtype=int)
+    franjas_por_curso = int(franjas_curso.max()) if len(franjas_curso) else rejilla.franjas_utiles
+    capacidad_total = int(franjas_curso.sum())
+    franjas_necesarias = int(df["Franjas_necesarias"].sum())
+    porcentaje_uso = (franjas_necesarias / capacidad_total) * 100 if capacidad_total else 0.0
+
+    carga_profesor = df.groupby("Profesor")["Horas por semana"].sum().sort_values(ascending=False)
+    indices = construir_indices(df)
+    necesarias = df["Franjas_necesarias"].to_numpy(dtype=int)
+    cursos = df["Curso"].to_numpy()
+
+    def franjas_aula(filas):
+        """Franjas en que puede usarse el aula: la unión de las jornadas de sus cursos."""
+        return int(np.logical_or.reduce([mascaras[curso] for curso in set(cursos[filas])]).sum())
+
+    ocupacion_aulas = pd.Series({
+        aula: 100 * necesarias[indices["Aula"][aula]].sum() / max(1, capacidad * franjas_aula(indices["Aula"][aula]))
+        for aula, capacidad in capacidades_aulas(df, indices).items()
+    }, dtype=float).sort_values(ascending=False)
+    return {
+        "profesores": df["Profesor"].nunique(),
+        "cursos": df["Curso"].nunique(),
+        "asignaturas": df["Asignatura"].nunique(),
+        "aulas": len(ocupacion_aulas),
+        "franjas_necesarias": franjas_necesarias,
+        "franjas_por_curso": franjas_por_curso,
+        "franjas_curso": franjas_curso,
+        "capacidad_total": capacidad_total,
+        "porcentaje_uso": porcentaje_uso,
+        "profesores_sobrecargados": carga_profesor[carga_profesor > HORAS_MAXIMAS_PROFESOR],
+        "ocupacion_aulas": ocupacion_aulas,
+        "viable": porcentaje_uso <= OCUPACION_MAXIMA and not (ocupacion_aulas > 100).any(),
+    }
+
+
+def _hall(permitidas, necesarias, capacidad=1):
+    """Peor violación de la condición de Hall entre los patrones de franjas de un grupo.
+
+    Las clases de un grupo (un profesor o un curso) no pueden coincidir, así
+    que todas las filas cuyas franjas permitidas caben dentro de las de otra
+    fila deben repartirse en esas franjas; en un aula caben ``capacidad``
+    clases por franja. Devuelve ``(franjas, disponibles, filas)`` del patrón
+    con más déficit o ``None``.
+    """
+    patrones, inversa = np.unique(permitidas, axis=0, return_inverse=True)
+    inversa = inversa.ravel()
+    demanda = np.bincount(inversa, weights=necesarias, minlength=len(patrones))
+    filas = np.bincount(inversa, minlength=len(patrones))
+    # contenido[a, b]: el patrón a está dentro del patrón b
+    contenido = (patrones.astype(np.int32) @ (~patrones).T.astype(np.int32)) == 0
+    demanda_dentro = demanda @ contenido
+    capacidad = patrones.sum(axis=1) * capacidad
+    deficit = demanda_dentro - capacidad
+    peor = int(np.argmax(deficit))
+    if deficit[peor] <= 0:
+        return None
+    return int(demanda_dentro[peor]), int(capacidad[peor]), int(filas @ contenido[:, peor])
+
+
+def _sesiones_imposibles(df, reglas, franjas_por_dia, n_dias, duraciones):
+    """Filas cuyas sesiones no caben seguidas en sus franjas permitidas o en días distintos."""
+    permitidas = reglas.permitidas
+    franjas_dia = len(franjas_por_dia)
+    minutos = duracion_franjas(franjas_por_dia)
+    sesiones = sesiones_por_fila(df["Franjas_necesarias"].astype(int), duraciones, reglas)
+    en_sesiones = np.array([duraciones_fila is not None for duraciones_fila in sesiones])
+    numero = np.array([len(duraciones_fila or ()) for duraciones_fila in sesiones])
+    dias_con_inicio = np.zeros((len(df), n_dias), dtype=bool)
+    sin_sitio = np.zeros(len(df), dtype=bool)
+    problemas = []
+
+    def nombre(i):
+        return f"{df['Profesor'].iloc[i]} · {df['Asignatura'].iloc[i]} · {df['Curso'].iloc[i]}"
+
+    for duracion in sorted({d for duraciones_fila in sesiones if duraciones_fila for d in duraciones_fila}):
+        cuantas = np.array([(duraciones_fila or ()).count(duracion) for duraciones_fila in sesiones])
+        caben = sesiones_que_caben(permitidas, duracion, franjas_dia)
+        sin_sitio |= cuantas > caben
+        for i in np.flatnonzero(cuantas > caben):
+            problemas.append({
+                "tipo": "fila", "nombre": nombre(i),
+                "franjas": int(cuantas[i] * duracion), "disponibles": int(caben[i] * duracion),
+                "detalle": f"{cuantas[i]} sesiones de {duracion * minutos} min y solo caben {caben[i]} seguidas",
+            })
+        inicios = inicios_posibles(permitidas, duracion, franjas_dia).reshape(len(df), n_dias, franjas_dia)
+        dias_con_inicio |= inicios.any(axis=2) & (cuantas > 0)[:, None]
+
+    # Con una sesión por día como mucho, cada sesión necesita un día distinto
+    pocos_dias = en_sesiones & ~sin_sitio & (numero <= n_dias) & (dias_con_inicio.sum(axis=1) < numero)
+    for i in np.flatnonzero(pocos_dias):
+        problemas.append({
+            "tipo": "fila", "nombre": nombre(i), "deficit": int(numero[i] - dias_con_inicio[i].sum()),
+            "detalle": f"{numero[i]} sesiones en días distintos y solo {dias_con_inicio[i].sum()} días con sitio",
+        })
+    return problemas
+
+
+def comprobar_viabilidad(df, reglas, dias, franjas_por_dia, indices=None, duraciones=None):
+    """Imposibilidades evidentes, sin llamar al solver.
+
+    ``reglas`` es un ``ReglasCompiladas``. Se comprueba, con las franjas que
+    dejan libres la jornada de cada curso, el recreo y las ventanas de las reglas:
+
+    - que cada fila quepa en sus franjas permitidas;
+    - que las clases de cada profesor y de cada curso quepan sin solaparse, y
+      las de cada aula sin pasar de su capacidad, tanto en total como en cada
+      subconjunto de filas con franjas anidadas (condición de Hall);
+    - que las reglas de mínimo diario tengan horas y franjas suficientes cada día;
+    - con ``duraciones`` (en franjas), que las sesiones de cada fila quepan
+      seguidas y, si son pocas, en días distintos.
+
+    Devuelve una lista de problemas (diccionarios con ``tipo``, ``nombre``,
+    ``detalle``, ``deficit`` y, salvo en las reglas, ``franjas`` y
+    ``disponibles``), del más grave al más leve; vacía si no se detecta ninguno.
+    """
+    if indices is None:
+        indices = construir_indices(df)
+    permitidas = reglas.permitidas
+    necesarias = df["Franjas_necesarias"].to_numpy(dtype=int)
+    libres = permitidas.sum(axis=1)
+    problemas = []
+
+    for i in np.flatnonzero(necesarias > libres):
+        problemas.append({
+            "tipo": "fila",
+            "nombre": f"{df['Profesor'].iloc[i]} · {df['Asignatura'].iloc[i]} · {df['Curso'].iloc[i]}",
+            "franjas": int(necesarias[i]),
+            "disponibles": int(libres[i]),
+            "detalle": "la clase no cabe en sus franjas permitidas",
+        })
+
+    compartidas = aulas_compartidas(df, indices)
+    agrupaciones = [
+        ("profesor", indices["Profesor"], np.ones(len(indices["Profesor"]), dtype=int)),
+        ("curso", indices["Curso"], np.ones(len(indices["Curso"]), dtype=int)),
+        ("aula", {aula: filas for aula, filas, _ in compartidas},
+         np.array([capacidad for _, _, capacidad in compartidas], dtype=int)),
+    ]
+    for tipo, por_valor, capacidades in agrupaciones:
+        if not por_valor:
+            continue
+        nombres = list(por_valor)
+        grupos = list(por_valor.values())
+        orden = np.concatenate(grupos)
+        inicios = np.cumsum([0] + [len(filas) for filas in grupos[:-1]])
+        # Totales de todos los grupos a la vez: franjas necesarias y unión de franjas permitidas
+        demanda = np.add.reduceat(necesarias[orden], inicios)
+        union = np.logical_or.reduceat(permitidas[orden], inicios, axis=0)
+        disponibles = union.sum(axis=1) * capacidades
+        # Solo hace falta Hall en los grupos con alguna fila más restringida que la unión
+        grupo_de = np.repeat(np.arange(len(grupos)), [len(filas) for filas in grupos])
+        restringidos = np.zeros(len(grupos), dtype=bool)
+        restringidos[grupo_de[(permitidas[orden] != union[grupo_de]).any(axis=1)]] = True
+
+        for g in np.flatnonzero(demanda > disponibles):
+            problemas.append({
+                "tipo": tipo, "nombre": str(nombres[g]),
+                "franjas": int(demanda[g]), "disponibles": int(disponibles[g]),
+                "detalle": "más clases que franjas libres" if tipo != "aula"
+                           else f"más clases que plazas libres con capacidad {capacidades[g]}",
+            })
+        for g in np.flatnonzero(restringidos & (demanda <= disponibles)):
+            filas = grupos[g]
+            violacion = _hall(permitidas[filas], necesarias[filas], capacidades[g])
+            if violacion is not None:
+                franjas, libres_patron, n_filas = violacion
+                problemas.append({
+                    "tipo": tipo, "nombre": str(nombres[g]), "franjas": franjas, "disponibles": libres_patron,
+                    "detalle": f"{n_filas} clases solo pueden ir en las mismas {libres_patron // capacidades[g]} franjas"
+                               + (f" con capacidad {capacidades[g]}" if tipo == "aula" else ""),
+                })
+
+    franjas_dia = len(franjas_por_dia)
+    if duraciones:
+        problemas += _sesiones_imposibles(df, reglas, franjas_por_dia, len(dias), duraciones)
+
+    for id_, filas, minimo in reglas.minimos_diarios:
+        demanda = int(necesarias[filas].sum())
+        if demanda < minimo * len(dias):
+            problemas.append({
+                "tipo": "regla", "nombre": id_, "deficit": minimo * len(dias) - demanda,
+                "detalle": f"pide {minimo} franja(s) cada día y solo hay {demanda} en la semana",
+            })
+            continue
+        # Cada fila aporta como mucho sus franjas necesarias o las que tiene libres ese día
+        por_dia = permitidas[filas].reshape(len(filas), len(dias), franjas_dia).sum(axis=2)
+        capacidad = np.minimum(por_dia, necesarias[filas, None]).sum(axis=0)
+        for d in np.flatnonzero(capacidad < minimo):
+            problemas.append({
+                "tipo": "regla", "nombre": id_, "deficit": int(minimo - capacidad[d]),
+                "detalle": f"el {dias[d].lower()} solo caben {int(capacidad[d])} de las {minimo} franjas diarias",
+            })
+
+    for problema in problemas:
+        if "deficit" not in problema:
+            problema["deficit"] = problema["franjas"] - problema["disponibles"]
+    return sorted(problemas, key=lambda p: -p["deficit"])
+
+
+def texto_grupo(grupo, reglas=None):
+    """Línea legible para un problema o grupo en conflicto; ``reglas`` aporta la descripción de cada regla."""
+    nombre = grupo["nombre"]
+    if grupo["tipo"] == "regla":
+        descripciones = {regla["id"]: regla.get("descripcion") for regla in reglas or []}
+        nombre = descripciones.get(nombre) or nombre
+    texto = f"{ICONOS.get(grupo['tipo'], '•')} {nombre}"
+    if "franjas" in grupo:
+        texto += f": {grupo['franjas']} franjas para {grupo['disponibles']} disponibles"
+    if grupo.get("detalle"):
+        texto += f" ({grupo['detalle']})"
+    return texto
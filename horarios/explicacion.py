@@ -0,0 +1,251 @@
+"""Explicación de un horario imposible: qué reglas, profesores y cursos chocan.
+
+Se construye una variante del modelo en la que cada regla activa y cada grupo
+de choques (las clases de un profesor o de un curso no pueden solaparse, ni
+las de un aula pasar de su capacidad) está condicionado por un literal propio.
+Con todos los literales como suposiciones, CP-SAT devuelve un subconjunto
+suficiente para la inviabilidad (``SufficientAssumptionsForInfeasibility``),
+que después se reduce quitando suposiciones una a una mientras el resto siga
+siendo imposible.
+"""
+
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from horarios.aulas import aulas_compartidas
+from horarios.indices import construir_indices
+
+# Presupuesto total (segundos) para la búsqueda y la reducción del conflicto
+TIEMPO_EXPLICACION = 30.0
+# Tope para cada resolución, para que una sola prueba difícil no agote el presupuesto
+TIEMPO_POR_PRUEBA = 10.0
+
+
+def _solver(segundos):
+    solver = cp_model.CpSolver()
+    # Las suposiciones de inviabilidad solo se rellenan con un único hilo de búsqueda
+    solver.parameters.num_search_workers = 1
+    solver.parameters.max_time_in_seconds = max(segundos, 0.1)
+    return solver
+
+
+def _jornada(reglas, franjas_recreo):
+    """Franjas de cada fila sin reglas: su jornada sin el recreo (solo el recreo si no hay jornada)."""
+    if reglas.jornada is not None:
+        return reglas.jornada
+    base = np.ones(reglas.permitidas.shape, dtype=bool)
+    base[:, list(franjas_recreo)] = False
+    return base
+
+
+def _modelo_con_literales(df, dias, franjas_por_dia, franjas_recreo, reglas, indices):
+    """Modelo con las restricciones configurables condicionadas a literales.
+
+    Devuelve ``(model, grupos)`` con ``grupos = {índice del literal: (tipo, nombre, filas, literal)}``.
+    """
+    model = cp_model.CpModel()
+    franjas_dia = len(franjas_por_dia)
+    franjas_totales = len(dias) * franjas_dia
+
+    # Solo la jornada (con el recreo) y las horas de cada fila son fijas; las ventanas de las reglas van aparte
+    base = _jornada(reglas, franjas_recreo)
+    variables = {
+        (int(i), int(f)): model.NewBoolVar(f"clase_{i}_franja_{f}") for i, f in zip(*np.nonzero(base))
+    }
+    for i, franjas_requeridas in enumerate(df["Franjas_necesarias"].astype(int)):
+        model.Add(
+            cp_model.LinearExpr.Sum([variables[(i, int(f))] for f in np.flatnonzero(base[i])])
+            == franjas_requeridas
+        )
+
+    grupos = {}
+
+    def literal(tipo, nombre, filas):
+        variable = model.NewBoolVar(f"{tipo}:{nombre}")
+        grupos[variable.Index()] = (tipo, nombre, filas, variable)
+        return variable
+
+    def por_franja(filas):
+        clases = [[] for _ in range(franjas_totales)]
+        for i in filas:
+            for f in np.flatnonzero(base[i]):
+                clases[f].append(variables[(i, int(f))])
+        return clases
+
+    for id_, filas, ventana in reglas.ventanas:
+        fuera = [
+            variables[(int(i), int(f))].Not()
+            for i in filas for f in np.flatnonzero(~ventana) if (int(i), int(f)) in variables
+        ]
+        if fuera:
+            model.AddBoolAnd(fuera).OnlyEnforceIf(literal("regla", id_, filas))
+
+    agrupaciones = [
+        (tipo, nombre, filas, 1)
+        for tipo, columna in (("profesor", "Profesor"), ("curso", "Curso"))
+        for nombre, filas in indices[columna].items()
+    ] + [("aula", nombre, filas, capacidad) for nombre, filas, capacidad in aulas_compartidas(df, indices)]
+    for tipo, nombre, filas, capacidad in agrupaciones:
+        if len(filas) <= capacidad:
+            continue
+        activo = literal(tipo, str(nombre), filas)
+        clases_grupo = por_franja(filas.tolist())
+        for clases in clases_grupo:
+            if len(clases) > capacidad:
+                model.Add(cp_model.LinearExpr.Sum(clases) <= capacidad).OnlyEnforceIf(activo)
+        # Redundante: acelera la prueba de que las clases del grupo no caben
+        model.Add(
+            cp_model.LinearExpr.Sum([v for clases in clases_grupo for v in clases])
+            <= capacidad * sum(1 for clases in clases_grupo if clases)
+        ).OnlyEnforceIf(activo)
+
+    for id_, filas, minimo in reglas.minimos_diarios:
+        activo = literal("regla", id_, filas)
+        clases = por_franja(filas.tolist())
+        for d in range(len(dias)):
+            clases_dia = [v for f in range(d * franjas_dia, (d + 1) * franjas_dia) for v in clases[f]]
+            model.Add(cp_model.LinearExpr.Sum(clases_dia) >= minimo).OnlyEnforceIf(activo)
+
+    for id_, filas in reglas.exclusiones:
+        activo = literal("regla", id_, filas)
+        for clases in por_franja(filas.tolist()):
+            if len(clases) > 1:
+                model.Add(cp_model.LinearExpr.Sum(clases) <= 1).OnlyEnforceIf(activo)
+
+    return model, grupos
+
+
+def _conflicto_de_capacidad(jornada, reglas, indices, necesarias, aulas=()):
+    """Profesor, curso o aula cuyas clases no caben en sus franjas disponibles, con las reglas que lo causan.
+
+    Se calcula sin solver; ``aulas`` son las de ``aulas_compartidas``, cuyas
+    franjas valen tantas clases como su capacidad. Entre todos los grupos se
+    elige el de mayor déficit; las reglas se reducen a las imprescindibles
+    quitándolas una a una.
+    """
+    def disponibles(filas, ventanas):
+        libres = jornada[filas]
+        posicion = {int(fila): k for k, fila in enumerate(filas)}
+        for _, filas_regla, ventana in ventanas:
+            afectadas = [posicion[int(i)] for i in filas_regla if int(i) in posicion]
+            libres[afectadas] &= ventana
+        return int(libres.any(axis=0).sum())
+
+    agrupaciones = [
+        (tipo, nombre, filas, 1)
+        for tipo, columna in (("profesor", "Profesor"), ("curso", "Curso"))
+        for nombre, filas in indices[columna].items()
+    ] + [("aula", nombre, filas, capacidad) for nombre, filas, capacidad in aulas]
+    peor = None
+    for tipo, nombre, filas, capacidad in agrupaciones:
+        deficit = int(necesarias[filas].sum()) - capacidad * int(reglas.permitidas[filas].any(axis=0).sum())
+        if deficit > 0 and (peor is None or deficit > peor[0]):
+            peor = (deficit, tipo, str(nombre), filas, capacidad)
+    if peor is None:
+        return None
+
+    _, tipo, nombre, filas, capacidad = peor
+    demanda = int(necesarias[filas].sum())
+    miembros = set(int(i) for i in filas)
+    ventanas = [v for v in reglas.ventanas if miembros.intersection(int(i) for i in v[1])]
+    for ventana in list(ventanas):
+        resto = [v for v in ventanas if v is not ventana]
+        if demanda > capacidad * disponibles(filas, resto):
+            ventanas = resto
+    return [{"tipo": "regla", "nombre": id_} for id_, _, _ in ventanas] + [
+        {"tipo": tipo, "nombre": nombre, "franjas": demanda, "disponibles": capacidad * disponibles(filas, ventanas)}
+    ]
+
+
+def _resolver_con(model, grupos, suposiciones, segundos):
+    """Estado y núcleo (índices de literales) resolviendo con esas suposiciones."""
+    model.ClearAssumptions()
+    model.AddAssumptions([grupos[indice][3] for indice in suposiciones])
+    solver = _solver(min(segundos, TIEMPO_POR_PRUEBA))
+    estado = solver.StatusName(solver.Solve(model))
+    nucleo = list(solver.SufficientAssumptionsForInfeasibility()) if estado == "INFEASIBLE" else []
+    return estado, nucleo
+
+
+def explicar_inviabilidad(df, dias, franjas_por_dia, franjas_recreo, reglas, indices=None,
+                          tiempo_maximo=TIEMPO_EXPLICACION):
+    """Conjunto pequeño de reglas, profesores y cursos que hacen imposible el horario.
+
+    Devuelve ``{"estado", "grupos", "minimo"}``: ``estado`` es ``INFEASIBLE``
+    si se encontró el conflicto, ``FEASIBLE`` si el modelo básico sí tiene
+    solución (el problema venía de otra parte, p. ej. filas fijadas) o
+    ``UNKNOWN`` si se agotó el tiempo. Cada grupo es un diccionario con
+    ``tipo`` (``regla``, ``profesor``, ``curso``, ``aula`` o ``fila``),
+    ``nombre`` y, salvo en las reglas, las franjas que necesitan frente a las
+    disponibles (en un aula, multiplicadas por su capacidad). ``minimo``
+    indica si se comprobó que no sobra ningún grupo.
+    """
+    inicio = time.perf_counter()
+    if indices is None:
+        indices = construir_indices(df)
+    necesarias = df["Franjas_necesarias"].to_numpy(dtype=int)
+    permitidas = reglas.permitidas
+    aulas = aulas_compartidas(df, indices)
+    capacidades = {str(nombre): capacidad for nombre, _, capacidad in aulas}
+
+    def restante():
+        return tiempo_maximo - (time.perf_counter() - inicio)
+
+    def describir(indice):
+        tipo, nombre, filas, _ = grupos[indice]
+        grupo = {"tipo": tipo, "nombre": nombre}
+        if tipo != "regla":
+            grupo["franjas"] = int(necesarias[filas].sum())
+            capacidad = capacidades[nombre] if tipo == "aula" else 1
+            grupo["disponibles"] = capacidad * int(permitidas[filas].any(axis=0).sum())
+        return grupo
+
+    # Filas que, aun solas, no caben en las franjas de su jornada sin el recreo
+    jornada = _jornada(reglas, franjas_recreo)
+    franjas_utiles = jornada.sum(axis=1)
+    imposibles = np.flatnonzero(necesarias > franjas_utiles)
+    if len(imposibles):
+        return {
+            "estado": "INFEASIBLE",
+            "minimo": True,
+            "grupos": [
+                {"tipo": "fila", "nombre": f"{df['Profesor'].iloc[i]} · {df['Asignatura'].iloc[i]} · "
+                                          f"{df['Curso'].iloc[i]}",
+                 "franjas": int(necesarias[i]), "disponibles": int(franjas_utiles[i])}
+                for i in imposibles
+            ],
+        }
+
+    conflicto = _conflicto_de_capacidad(jornada, reglas, indices, necesarias, aulas)
+    if conflicto is not None:
+        return {"estado": "INFEASIBLE", "grupos": conflicto, "minimo": True}
+
+    model, grupos = _modelo_con_literales(df, dias, franjas_por_dia, franjas_recreo, reglas, indices)
+    estado, nucleo = _resolver_con(model, grupos, list(grupos), restante())
+    if estado != "INFEASIBLE":
+        return {"estado": estado, "grupos": [], "minimo": False}
+
+    # Reducción: se descarta cada suposición cuyo resto siga siendo imposible
+    necesarios = []
+    pendientes = list(nucleo)
+    minimo = True
+    while pendientes:
+        if restante() <= 0:
+            necesarios += pendientes
+            minimo = False
+            break
+        candidato = pendientes.pop(0)
+        estado, nuevo = _resolver_con(model, grupos, necesarios + pendientes, restante())
+        if estado == "INFEASIBLE":
+            # El núcleo devuelto puede ser aún más pequeño que el resto probado
+            pendientes = [indice for indice in pendientes if indice in nuevo]
+        else:
+            necesarios.append(candidato)
+            minimo = minimo and estado in ("OPTIMAL", "FEASIBLE")
+
+    orden = {"regla": 0, "profesor": 1, "curso": 2, "aula": 3}
+    grupos_conflicto = sorted((describir(i) for i in necesarios), key=lambda g: (orden[g["tipo"]], g["nombre"]))
+    return {"estado": "INFEASIBLE", "grupos": grupos_conflicto, "minimo": minimo}
+
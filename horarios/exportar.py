@@ -0,0 +1,90 @@
+"""Exportación del horario a Excel, CSV y Parquet."""
+
+import hashlib
+import importlib.util
+import io
+from collections import defaultdict
+
+import numpy as np
+
+from horarios.tablas import RECREO, tabla_larga
+
+MIME_EXCEL = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+PARQUET_DISPONIBLE = importlib.util.find_spec("pyarrow") is not None
+
+
+def huella_solucion(df, asignacion):
+    """Hash de los datos y la asignación; identifica un horario para cachear su exportación."""
+    h = hashlib.sha256()
+    for columna in ("Profesor", "Asignatura", "Curso", "Aula"):
+        if columna not in df.columns:
+            continue
+        h.update("\x1f".join(df[columna].astype(str)).encode("utf-8"))
+    h.update(np.ascontiguousarray(asignacion, dtype=np.uint8).tobytes())
+    h.update(str(asignacion.shape).encode())
+    return h.hexdigest()
+
+
+def _celdas(df, asignacion, por, detalle):
+    """``{(valor, franja): [textos]}`` recorriendo una sola vez las clases asignadas."""
+    valores = df[por].astype(str).to_numpy()
+    etiquetas = (df["Asignatura"].astype(str) + " (" + df[detalle].astype(str) + ")").to_numpy()
+    celdas = defaultdict(list)
+    for i, f in zip(*np.nonzero(asignacion)):
+        celdas[(valores[i], int(f))].append(etiquetas[i])
+    return celdas
+
+
+def escribir_excel(destino, df, asignacion, dias, franjas_por_dia, franjas_recreo):
+    """Escribe una hoja por curso, por profesor y, si hay aulas, por aula.
+
+    Usa xlsxwriter en modo ``constant_memory``: las celdas se generan
+    directamente desde la matriz de asignación, fila a fila, sin construir un
+    DataFrame por hoja.
+    """
+    import xlsxwriter  # diferido: solo se necesita al descargar
+
+    n = len(franjas_por_dia)
+    recreo = set(franjas_recreo)
+    libro = xlsxwriter.Workbook(destino, {"constant_memory": True})
+    negrita = libro.add_format({"bold": True, "border": 1})
+
+    hojas = [
+        ("Curso", "Profesor", lambda curso: f"Curso_{curso.replace('º', 'o')}"),
+        ("Profesor", "Curso", lambda profesor: f"Prof_{profesor.replace(' ', '_')[:25]}"),
+    ]
+    if "Aula" in df.columns:
+        hojas.append(("Aula", "Curso", lambda aula: f"Aula_{aula.replace(' ', '_')[:25]}"))
+    for por, detalle, nombre_hoja in hojas:
+        celdas = _celdas(df, asignacion, por, detalle)
+        for valor in sorted(set(df[por].astype(str).unique()) - {""}):
+            hoja = libro.add_worksheet(nombre_hoja(valor))
+            hoja.write_row(0, 0, ["Franja", *dias], negrita)
+            for h, franja in enumerate(franjas_por_dia):
+                hoja.write_string(h + 1, 0, franja, negrita)
+                for d in range(len(dias)):
+                    f = d * n + h
+                    texto = RECREO if f in recreo else " | ".join(celdas.get((valor, f), ()))
+                    if texto:
+                        hoja.write_string(h + 1, d + 1, texto)
+    libro.close()
+
+
+def generar_excel(df, asignacion, dias, franjas_por_dia, franjas_recreo):
+    """Libro Excel completo en memoria (``bytes``)."""
+    buffer = io.BytesIO()
+    escribir_excel(buffer, df, asignacion, dias, franjas_por_dia, franjas_recreo)
+    return buffer.getvalue()
+
+
+def generar_csv(df, asignacion, dias, franjas_por_dia):
+    """Horario en formato largo (una fila por clase y franja) como CSV UTF-8."""
+    return tabla_larga(df, asignacion, dias, franjas_por_dia).to_csv(index=False).encode("utf-8")
+
+
+def generar_parquet(df, asignacion, dias, franjas_por_dia):
+    """Horario en formato largo como Parquet (requiere ``pyarrow``)."""
+    buffer = io.BytesIO()
+    tabla_larga(df, asignacion, dias, franjas_por_dia).to_parquet(buffer, index=False)
+    return buffer.getvalue()
@@ -0,0 +1,124 @@
+"""Re-optimización incremental a partir de un horario ya publicado.
+
+Se emparejan las filas nuevas con las del horario anterior, se usa la
+asignación previa como pista (``AddHint``) y, opcionalmente, se fijan las filas
+cuyo profesor y curso no se ven afectados por los cambios, de modo que solo se
+vuelve a resolver el vecindario modificado.
+"""
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from horarios.aulas import COLUMNAS_AULA
+from horarios.calidad import PESO_CAMBIO
+
+COLUMNAS_FILA = ["Profesor", "Asignatura", "Curso"]
+
+
+def emparejar_filas(df_anterior, df_nuevo):
+    """Para cada fila nueva, la posición de la misma fila en ``df_anterior`` o ``-1``.
+
+    Las filas se identifican por profesor, asignatura y curso; las repetidas se
+    emparejan por orden de aparición.
+    """
+    def claves(df):
+        base = df[COLUMNAS_FILA].astype(str)
+        return base.assign(_n=base.groupby(COLUMNAS_FILA, sort=False).cumcount())
+
+    anterior = claves(df_anterior).assign(_pos=np.arange(len(df_anterior)))
+    cruce = claves(df_nuevo).merge(anterior, on=COLUMNAS_FILA + ["_n"], how="left")
+    return cruce["_pos"].fillna(-1).astype(int).to_numpy()
+
+
+def alinear_asignacion(df_anterior, asignacion_anterior, df_nuevo):
+    """Asignación anterior reordenada según las filas de ``df_nuevo``.
+
+    Devuelve ``(previa, emparejadas, anterior_de)``: ``previa`` tiene ceros en
+    las filas nuevas y ``emparejadas`` marca las filas con correspondencia.
+    """
+    anterior_de = emparejar_filas(df_anterior, df_nuevo)
+    emparejadas = anterior_de >= 0
+    previa = np.zeros((len(df_nuevo), asignacion_anterior.shape[1]), dtype=np.uint8)
+    previa[emparejadas] = asignacion_anterior[anterior_de[emparejadas]]
+    return previa, emparejadas, anterior_de
+
+
+def filas_afectadas(df_anterior, df_nuevo, previa, emparejadas, anterior_de, permitidas, compatibles=None):
+    """Máscara de filas nuevas que deben volver a colocarse.
+
+    Una fila cambia si es nueva, si cambian sus franjas necesarias, si alguna
+    de sus franjas anteriores ya no está permitida o si su colocación anterior
+    no es ``compatible`` (p. ej. no forma las sesiones que ahora se piden).
+    Quedan afectadas también todas las filas que comparten profesor, curso o
+    aula con una fila cambiada o con una fila eliminada del horario anterior;
+    cambiar de aula o de capacidad también cuenta como cambio.
+    """
+    franjas_antes = np.full(len(df_nuevo), -1)
+    franjas_antes[emparejadas] = df_anterior["Franjas_necesarias"].to_numpy()[anterior_de[emparejadas]]
+    cambiadas = (
+        ~emparejadas
+        | (franjas_antes != df_nuevo["Franjas_necesarias"].to_numpy())
+        | (previa.astype(bool) & ~permitidas).any(axis=1)
+    )
+    if compatibles is not None:
+        cambiadas |= ~compatibles
+    columnas = ["Profesor", "Curso"]
+    if "Aula" in df_nuevo.columns:
+        columnas.append("Aula")
+        for columna in COLUMNAS_AULA:
+            antes = np.full(len(df_nuevo), "", dtype=object)
+            if columna in df_anterior.columns:
+                antes[emparejadas] = df_anterior[columna].astype(str).to_numpy()[anterior_de[emparejadas]]
+            cambiadas |= antes != df_nuevo[columna].astype(str).to_numpy()
+
+    eliminadas = np.ones(len(df_anterior), dtype=bool)
+    eliminadas[anterior_de[emparejadas]] = False
+
+    afectadas = cambiadas.copy()
+    for columna in columnas:
+        tocados = set(df_nuevo[columna][cambiadas].astype(str))
+        if columna in df_anterior.columns:
+            tocados |= set(df_anterior[columna][eliminadas].astype(str))
+        # Las filas sin aula no comparten ningún espacio
+        tocados.discard("")
+        afectadas |= df_nuevo[columna].astype(str).isin(tocados).to_numpy()
+    return afectadas
+
+
+def preparar_incremental(model, variables, previa, afectadas, fijar=True, objetivo=None):
+    """Añade pistas, fija las filas no afectadas y minimiza los cambios.
+
+    Con ``objetivo`` (el ``Objetivo`` de ``construir_modelo``) cada franja
+    anterior que se mueve, también las que ya no están permitidas, se suma a
+    las demás penalizaciones con peso ``PESO_CAMBIO``, igual que en
+    ``evaluar_calidad``; sin él solo se maximizan las franjas conservadas.
+    Devuelve el número de filas fijadas.
+    """
+    for (i, f), variable in variables.items():
+        model.AddHint(variable, int(previa[i, f]))
+
+    filas_fijadas = 0
+    if fijar:
+        for i in np.flatnonzero(~afectadas):
+            filas_fijadas += 1
+            for f in np.flatnonzero(previa[i]):
+                model.Add(variables[(int(i), int(f))] == 1)
+
+    if objetivo is not None:
+        anteriores = [variable for (i, f), variable in variables.items() if previa[i, f]]
+        # Las franjas anteriores que ya no están permitidas se mueven seguro: cuentan como constante
+        perdidas = int(previa.sum()) - len(anteriores)
+        movidas = [1 - variable for variable in anteriores]
+        if perdidas:
+            movidas.append(perdidas)
+        objetivo.anadir("cambios", PESO_CAMBIO, movidas)
+        objetivo.aplicar(model)
+        return filas_fijadas
+
+    # Conservar el máximo de franjas del horario anterior en las filas que se mueven
+    conservadas = [
+        variable for (i, f), variable in variables.items() if previa[i, f] and afectadas[i]
+    ]
+    if conservadas:
+        model.Maximize(cp_model.LinearExpr.Sum(conservadas))
+    return filas_fijadas
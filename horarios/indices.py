@@ -0,0 +1,38 @@
+"""Índices de filas por profesor, curso y asignatura.
+
+Sin dependencias del solver, para que compilar reglas o diagnosticar no
+obligue a cargar OR-Tools.
+"""
+
+import numpy as np
+
+
+def construir_indices(df):
+    """Agrupa una sola vez las filas por profesor, curso, asignatura y, si la hay, aula.
+
+    Devuelve un diccionario ``{columna: {valor: array de posiciones}}`` que se
+    reutiliza en todas las restricciones en lugar de filtrar el DataFrame. Las
+    filas sin aula no entran en el grupo ``Aula``.
+    """
+    indices = {
+        columna: df.groupby(columna, sort=False).indices
+        for columna in ("Profesor", "Curso", "Asignatura")
+    }
+    if "Aula" in df.columns:
+        indices["Aula"] = {
+            aula: filas for aula, filas in df.groupby("Aula", sort=False).indices.items() if aula != ""
+        }
+    return indices
+
+
+def filas_que_contienen(indices, columna, texto):
+    """Posiciones de las filas cuyo valor en ``columna`` contiene ``texto`` (sin distinguir mayúsculas)."""
+    texto = texto.lower()
+    grupos = [filas for valor, filas in indices[columna].items() if texto in str(valor).lower()]
+    return np.concatenate(grupos) if grupos else np.array([], dtype=int)
+
+
+def filas_en(indices, columna, valores):
+    """Posiciones de las filas cuyo valor en ``columna`` está en ``valores``."""
+    grupos = [indices[columna][valor] for valor in valores if valor in indices[columna]]
+    return np.concatenate(grupos) if grupos else np.array([], dtype=int)
@@ -0,0 +1,129 @@
+"""Instrumentación: tiempos por etapa, estadísticas de CP-SAT y registro en JSON Lines.
+
+Sirve para distinguir si una ejecución lenta se va en construir el modelo en
+Python o en la búsqueda del solver. Las estadísticas del solver son las de
+``ResponseStats()`` leídas de la respuesta (``CpSolverResponse``). El presolve
+se separa de la búsqueda con el registro que ``configurar_solver`` deja en la
+respuesta con ``registro_busqueda``, que solo se activa al medir. Con la
+variable de entorno ``HORARIOS_LOG_METRICAS`` (o la opción ``--log-metricas``
+de la línea de comandos) cada resolución añade una línea JSON a ese archivo.
+"""
+
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+ETAPAS = {
+    "carga": "Carga de datos",
+    "construccion": "Construcción del modelo",
+    "presolve": "Presolve de CP-SAT",
+    "busqueda": "Búsqueda",
+    "extraccion": "Extracción de la solución",
+    "visualizacion": "Tablas de visualización",
+    "exportacion": "Exportación a Excel",
+}
+
+NOMBRES_SOLVER = {
+    "conflictos": "Conflictos",
+    "ramas": "Ramas",
+    "propagaciones": "Propagaciones booleanas",
+    "propagaciones_enteras": "Propagaciones enteras",
+    "reinicios": "Reinicios",
+    "tiempo_pared": "Tiempo real (s)",
+    "tiempo_usuario": "Tiempo de CPU (s)",
+    "tiempo_determinista": "Tiempo determinista",
+    "objetivo": "Objetivo",
+    "cota": "Mejor cota",
+}
+
+RUTA_LOG = os.environ.get("HORARIOS_LOG_METRICAS")
+
+_INICIO_BUSQUEDA = re.compile(r"^Starting search at ([\d.]+)s", re.MULTILINE)
+
+# Al combinar componentes en paralelo, los tiempos reales no se suman
+_MAXIMOS = ("tiempo_pared", "presolve", "busqueda")
+
+
+@contextmanager
+def cronometrar(tiempos, etapa):
+    """Suma a ``tiempos[etapa]`` los segundos que tarda el bloque ``with``."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+def estadisticas_solver(respuesta, con_objetivo=True):
+    """Contadores de un ``CpSolverResponse``: conflictos, ramas, tiempos y, con objetivo, valor y cota.
+
+    ``presolve`` y ``busqueda`` solo aparecen si la respuesta trae el registro de la búsqueda.
+    """
+    estadisticas = {
+        "conflictos": respuesta.num_conflicts,
+        "ramas": respuesta.num_branches,
+        "propagaciones": respuesta.num_binary_propagations,
+        "propagaciones_enteras": respuesta.num_integer_propagations,
+        "reinicios": respuesta.num_restarts,
+        "tiempo_pared": respuesta.wall_time,
+        "tiempo_usuario": respuesta.user_time,
+        "tiempo_determinista": respuesta.deterministic_time,
+    }
+    if con_objetivo:
+        estadisticas.update(objetivo=respuesta.objective_value, cota=respuesta.best_objective_bound)
+    inicio_busqueda = _INICIO_BUSQUEDA.search(respuesta.solve_log)
+    if inicio_busqueda:
+        presolve = min(float(inicio_busqueda.group(1)), respuesta.wall_time)
+        estadisticas.update(presolve=presolve, busqueda=respuesta.wall_time - presolve)
+    return estadisticas
+
+
+def combinar_estadisticas(lista, en_paralelo=True):
+    """Estadísticas de varias resoluciones en paralelo: contadores sumados y tiempos reales, el mayor.
+
+    El objetivo y la cota también se suman, porque las componentes no comparten
+    términos. Con ``en_paralelo=False`` (resoluciones una tras otra) también se
+    suman los tiempos reales.
+    """
+    combinadas = {}
+    for estadisticas in lista:
+        for clave, valor in estadisticas.items():
+            if clave not in combinadas:
+                combinadas[clave] = valor
+            elif en_paralelo and clave in _MAXIMOS:
+                combinadas[clave] = max(combinadas[clave], valor)
+            else:
+                combinadas[clave] += valor
+    return combinadas
+
+
+def tiempos_resolucion(ejecucion, construccion=0.0):
+    """Tiempos por etapa de una resolución terminada (``ResolucionEnCurso`` o por componentes).
+
+    ``construccion`` son los segundos del proceso principal; por componentes se
+    suman a los de construir cada modelo en su proceso.
+    """
+    tiempos = {"construccion": construccion}
+    for etapa, segundos in ejecucion.tiempos.items():
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + segundos
+    estadisticas = ejecucion.estadisticas_solver or {}
+    tiempos.update({etapa: estadisticas[etapa] for etapa in ("presolve", "busqueda") if etapa in estadisticas})
+    return tiempos
+
+
+def registrar_metricas(registro, ruta=None):
+    """Añade ``registro`` con la fecha como una línea JSON a ``ruta`` (por defecto, ``RUTA_LOG``).
+
+    Sin ruta no hace nada.
+    """
+    ruta = ruta or RUTA_LOG
+    if not ruta:
+        return
+    linea = json.dumps({"fecha": datetime.now().isoformat(timespec="seconds"), **registro},
+                       ensure_ascii=False, default=str)
+    with Path(ruta).open("a", encoding="utf-8") as archivo:
+        archivo.write(linea + "\n")
@@ -0,0 +1,282 @@
+"""Construcción del modelo CP-SAT a partir de la tabla de asignaciones, con su objetivo."""
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from horarios.aulas import aulas_compartidas
+from horarios.calidad import PESOS_CALIDAD, penaliza_sueltas, tope_diario
+from horarios.indices import construir_indices
+from horarios.rejilla import REJILLA_POR_DEFECTO
+from horarios.sesiones import inicios_posibles, sesiones_por_fila
+
+
+def tamano_modelo(model):
+    """Número de variables, restricciones y términos del objetivo del modelo."""
+    proto = model.Proto()
+    return {
+        "variables": len(proto.variables),
+        "restricciones": len(proto.constraints),
+        "terminos_objetivo": len(proto.objective.vars),
+    }
+
+
+class Objetivo:
+    """Términos ponderados que se suman en el objetivo del modelo."""
+
+    def __init__(self):
+        self.terminos = {}
+
+    def anadir(self, termino, peso, expresiones):
+        if peso > 0 and expresiones:
+            self.terminos.setdefault(termino, (peso, []))[1].extend(expresiones)
+
+    def aplicar(self, model):
+        """Minimiza la suma ponderada; sin términos el modelo se queda sin objetivo."""
+        if self.terminos:
+            model.Minimize(cp_model.LinearExpr.Sum(
+                [peso * cp_model.LinearExpr.Sum(expresiones) for peso, expresiones in self.terminos.values()]
+            ))
+
+
+def anadir_penalizaciones(model, variables, df, franjas_dia, reglas, indices=None, pesos=None,
+                          rejilla=REJILLA_POR_DEFECTO):
+    """Crea los términos de las reglas blandas y de calidad y devuelve el ``Objetivo``.
+
+    ``pesos`` sustituye a ``PESOS_CALIDAD``; el objetivo aún no se fija en el modelo.
+    Cada término cuenta lo mismo que ``horarios.calidad.evaluar_calidad`` con
+    la misma ``rejilla``.
+    """
+    pesos = PESOS_CALIDAD if pesos is None else pesos
+    if indices is None:
+        indices = construir_indices(df)
+    objetivo = Objetivo()
+    franjas_totales = reglas.permitidas.shape[1]
+    n_dias = franjas_totales // franjas_dia
+    necesarias = df["Franjas_necesarias"].to_numpy(dtype=int)
+
+    def dia(f):
+        return range(f // franjas_dia * franjas_dia, (f // franjas_dia + 1) * franjas_dia)
+
+    def en_franja(filas, f):
+        return [variables[(i, f)] for i in filas if (i, f) in variables]
+
+    # REGLAS BLANDAS
+    for id_, tipo, filas, dato, peso in reglas.blandas:
+        filas = filas.tolist()
+        if tipo in ("disponibilidad", "prohibido"):
+            fuera = [v for f in np.flatnonzero(~dato) for v in en_franja(filas, int(f))]
+            objetivo.anadir(f"regla:{id_}", peso, fuera)
+        elif tipo == "minimo_diario":
+            faltas = []
+            for d in range(n_dias):
+                falta = model.NewIntVar(0, dato, f"falta_{id_}_{d}")
+                clases_dia = [v for f in range(d * franjas_dia, (d + 1) * franjas_dia) for v in en_franja(filas, f)]
+                model.Add(cp_model.LinearExpr.Sum(clases_dia) + falta >= dato)
+                faltas.append(falta)
+            objetivo.anadir(f"regla:{id_}", peso, faltas)
+        else:
+            coincidencias = []
+            for f in range(franjas_totales):
+                clases = en_franja(filas, f)
+                if len(clases) > 1:
+                    exceso = model.NewIntVar(0, len(clases) - 1, f"coincide_{id_}_{f}")
+                    model.Add(cp_model.LinearExpr.Sum(clases) - exceso <= 1)
+                    coincidencias.append(exceso)
+            objetivo.anadir(f"regla:{id_}", peso, coincidencias)
+
+    # HUECOS: hay clase antes y después de una franja libre (que no sea recreo). Solo hay
+    # variables en las franjas en que el profesor puede tener clase; las que no puede usar
+    # entre dos de ellas cuentan todas juntas, con un único indicador por tramo
+    if pesos.get("huecos", 0) > 0:
+        huecos = []
+        for p, filas in enumerate(indices["Profesor"].values()):
+            if necesarias[filas].sum() < 2:
+                continue
+            posibles = reglas.permitidas[filas].any(axis=0)
+            filas = filas.tolist()
+            for d in range(n_dias):
+                primera = d * franjas_dia
+                franjas = [primera + int(f) for f in np.flatnonzero(posibles[primera:primera + franjas_dia])]
+                if len(franjas) < 2:
+                    continue
+                ocupada = {f: cp_model.LinearExpr.Sum(en_franja(filas, f)) for f in franjas}
+                antes = {f: model.NewBoolVar(f"antes_{p}_{f}") for f in franjas}
+                despues = {f: model.NewBoolVar(f"despues_{p}_{f}") for f in franjas}
+                for anterior, f in zip([None] + franjas, franjas):
+                    model.Add(antes[f] >= ocupada[f])
+                    model.Add(despues[f] >= ocupada[f])
+                    if anterior is not None:
+                        model.Add(antes[f] >= antes[anterior])
+                        model.Add(despues[anterior] >= despues[f])
+                for anterior, f, siguiente in zip(franjas, franjas[1:], franjas[2:]):
+                    hueco = model.NewBoolVar(f"hueco_{p}_{f}")
+                    model.Add(hueco >= antes[anterior] + despues[siguiente] - 1 - ocupada[f])
+                    huecos.append(hueco)
+                for anterior, siguiente in zip(franjas, franjas[1:]):
+                    entre = int((~reglas.recreo[anterior + 1:siguiente]).sum())
+                    if entre:
+                        hueco = model.NewBoolVar(f"hueco_{p}_{anterior}_{siguiente}")
+                        model.Add(hueco >= antes[anterior] + despues[siguiente] - 1)
+                        huecos.append(entre * hueco if entre > 1 else hueco)
+        objetivo.anadir("huecos", pesos["huecos"], huecos)
+
+    # BLOQUES: franja sin otra de la misma fila al lado (el recreo corta el bloque),
+    # solo si una franja es menos que una clase
+    if pesos.get("bloques", 0) > 0 and penaliza_sueltas(rejilla):
+        sueltas = []
+        for (i, f), variable in variables.items():
+            if necesarias[i] < 2:
+                continue
+            vecinas = [variables[(i, g)] for g in (f - 1, f + 1) if g in dia(f) and (i, g) in variables]
+            suelta = model.NewBoolVar(f"suelta_{i}_{f}")
+            model.Add(suelta >= variable - cp_model.LinearExpr.Sum(vecinas))
+            sueltas.append(suelta)
+        objetivo.anadir("bloques", pesos["bloques"], sueltas)
+
+    # REPARTO: franjas de una fila por encima de su tope diario
+    if pesos.get("reparto", 0) > 0:
+        excesos = []
+        topes = tope_diario(necesarias, n_dias, rejilla)
+        for i in np.flatnonzero(necesarias > topes):
+            for d in range(n_dias):
+                clases_dia = [variables[(int(i), f)] for f in range(d * franjas_dia, (d + 1) * franjas_dia)
+                              if (int(i), f) in variables]
+                if len(clases_dia) > topes[i]:
+                    exceso = model.NewIntVar(0, len(clases_dia) - int(topes[i]), f"exceso_{i}_{d}")
+                    model.Add(cp_model.LinearExpr.Sum(clases_dia) - exceso <= int(topes[i]))
+                    excesos.append(exceso)
+        objetivo.anadir("reparto", pesos["reparto"], excesos)
+
+    return objetivo
+
+
+def anadir_sesiones(model, variables, sesiones, permitidas, franjas_dia):
+    """Cada fila como sesiones de franjas seguidas, decididas por su franja de inicio.
+
+    ``sesiones`` tiene, por fila, las duraciones de sus sesiones (las filas
+    con ``None`` se dejan como están). Cada franja de la fila queda ocupada si
+    y solo si la cubre una de sus sesiones. Si la fila tiene como mucho una
+    sesión por día, sus sesiones van en días distintos.
+    """
+    n_dias = permitidas.shape[1] // franjas_dia
+    posibles = {
+        duracion: inicios_posibles(permitidas, duracion, franjas_dia)
+        for duracion in {d for duraciones in sesiones if duraciones for d in duraciones}
+    }
+    for i, duraciones in enumerate(sesiones):
+        if duraciones is None:
+            continue
+        cobertura = {int(f): [] for f in np.flatnonzero(permitidas[i])}
+        anterior = None
+        por_dia = [[] for _ in range(n_dias)]
+        for s, duracion in enumerate(duraciones):
+            inicios = np.flatnonzero(posibles[duracion][i])
+            empieza = [model.NewBoolVar(f"sesion_{i}_{s}_inicio_{t}") for t in inicios]
+            model.AddExactlyOne(empieza)
+            for t, variable in zip(inicios.tolist(), empieza):
+                for f in range(t, t + duracion):
+                    cobertura[f].append(variable)
+                por_dia[t // franjas_dia].append(variable)
+            # Sesiones iguales de una fila son intercambiables: se ordenan por su inicio
+            inicio = cp_model.LinearExpr.WeightedSum(empieza, inicios.tolist())
+            if anterior is not None and duraciones[s - 1] == duracion:
+                model.Add(inicio > anterior)
+            anterior = inicio
+        if len(duraciones) <= n_dias:
+            for empiezan in por_dia:
+                if len(empiezan) > 1:
+                    model.AddAtMostOne(empiezan)
+        for f, cubren in cobertura.items():
+            model.Add(variables[(i, f)] == cp_model.LinearExpr.Sum(cubren))
+
+
+def construir_modelo(df, dias, franjas_por_dia, reglas, indices=None, pesos=None, duraciones=None,
+                     rejilla=REJILLA_POR_DEFECTO):
+    """Crea el modelo con las restricciones básicas, las reglas ya compiladas y el objetivo.
+
+    ``reglas`` es un ``ReglasCompiladas``: solo se crean variables para sus
+    franjas permitidas, de modo que el recreo, las franjas fuera de la jornada
+    de cada curso y las ventanas horarias no generan ni variables ni
+    igualdades. Además de los choques de profesor y curso, cada aula
+    compartida admite en cada franja como mucho su capacidad de clases. Las
+    reglas blandas y los términos de calidad (``pesos``, por defecto
+    ``PESOS_CALIDAD``, medidos con la duración de franja de ``rejilla``) forman
+    el objetivo que se minimiza. Con ``duraciones`` (en franjas, p. ej.
+    ``(2, 3)``) cada fila se coloca en sesiones seguidas de esas duraciones en
+    lugar de franja a franja. Devuelve ``(model, variables, objetivo)``.
+    """
+    model = cp_model.CpModel()
+    variables = {}
+    if indices is None:
+        indices = construir_indices(df)
+    franjas_dia = len(franjas_por_dia)
+    franjas_totales = len(dias) * franjas_dia
+    permitidas = reglas.permitidas
+
+    # Variables binarias, solo en franjas permitidas
+    for i, f in zip(*np.nonzero(permitidas)):
+        variables[(int(i), int(f))] = model.NewBoolVar(f"clase_{i}_franja_{f}")
+
+    # Variables disponibles en cada franja para un grupo de filas, recorriendo solo sus franjas permitidas
+    def por_franja(filas):
+        clases = [[] for _ in range(franjas_totales)]
+        for i in filas:
+            for f in np.flatnonzero(permitidas[i]):
+                clases[f].append(variables[(i, int(f))])
+        return clases
+
+    # RESTRICCIONES BÁSICAS (siempre activas)
+
+    # Cada clase debe tener exactamente sus franjas necesarias, en sesiones o franja a franja
+    necesarias = df["Franjas_necesarias"].astype(int)
+    sesiones = sesiones_por_fila(necesarias, duraciones, reglas) if duraciones else [None] * len(df)
+    anadir_sesiones(model, variables, sesiones, permitidas, franjas_dia)
+    for i, franjas_requeridas in enumerate(necesarias):
+        if sesiones[i] is None:
+            model.Add(
+                cp_model.LinearExpr.Sum([variables[(i, int(f))] for f in np.flatnonzero(permitidas[i])])
+                == franjas_requeridas
+            )
+
+    # Un profesor no puede estar en dos sitios a la vez
+    # Un curso no puede tener dos clases simultáneas
+    for columna in ("Profesor", "Curso"):
+        for filas in indices[columna].values():
+            if len(filas) < 2:
+                continue
+            for clases in por_franja(filas.tolist()):
+                if len(clases) > 1:
+                    model.AddAtMostOne(clases)
+
+    # Un aula no puede acoger más clases a la vez que su capacidad
+    for _, filas, capacidad in aulas_compartidas(df, indices):
+        for clases in por_franja(filas.tolist()):
+            if len(clases) > capacidad:
+                if capacidad == 1:
+                    model.AddAtMostOne(clases)
+                else:
+                    model.Add(cp_model.LinearExpr.Sum(clases) <= capacidad)
+
+    # REGLAS que no se reducen a una máscara de franjas
+
+    # Mínimo de clases cada día entre las filas de la regla
+    for _, filas, minimo in reglas.minimos_diarios:
+        clases = por_franja(filas.tolist())
+        for d in range(len(dias)):
+            clases_dia = [v for f in range(d * franjas_dia, (d + 1) * franjas_dia) for v in clases[f]]
+            if minimo == 1:
+                model.AddBoolOr(clases_dia)
+            else:
+                model.Add(cp_model.LinearExpr.Sum(clases_dia) >= minimo)
+
+    # Grupos de filas que nunca pueden coincidir en una franja
+    for _, filas in reglas.exclusiones:
+        for clases in por_franja(filas.tolist()):
+            if len(clases) > 1:
+                model.AddAtMostOne(clases)
+
+    # OBJETIVO: reglas blandas y calidad del horario
+    objetivo = anadir_penalizaciones(model, variables, df, franjas_dia, reglas, indices, pesos, rejilla)
+    objetivo.aplicar(model)
+
+    return model, variables, objetivo
@@ -0,0 +1,240 @@
+"""Flujo completo sin interfaz: cargar, compilar reglas, resolver y exportar.
+
+Es el mismo recorrido que hacen las pestañas de la aplicación, pero síncrono,
+para poder ejecutarlo por lotes desde la línea de comandos o en CI.
+"""
+
+import time
+from pathlib import Path
+
+from horarios.alternativas import DIFERENCIA_MINIMA, ResolucionAlternativas, comparar_alternativas
+from horarios.cache import clave_solucion
+from horarios.calidad import PESOS_CALIDAD, evaluar_calidad
+from horarios.datos import MOTOR_EXCEL, cargar_datos, cargar_datos_en_cache
+from horarios.descomposicion import ResolucionPorComponentes
+from horarios.diagnostico import comprobar_viabilidad, diagnosticar
+from horarios.explicacion import explicar_inviabilidad
+from horarios.exportar import escribir_excel
+from horarios.indices import construir_indices
+from horarios.medicion import RUTA_LOG, cronometrar, registrar_metricas, tiempos_resolucion
+from horarios.modelo import construir_modelo, tamano_modelo
+from horarios.reglas import activa_por_defecto, cargar_reglas, compilar_reglas
+from horarios.rejilla import REJILLA_POR_DEFECTO
+from horarios.sesiones import DURACIONES_POR_DEFECTO
+from horarios.resolucion import ResolucionEnCurso, configurar_solver
+
+
+# Estadísticas que se copian al registro de métricas
+CLAVES_METRICAS = (
+    "tiempos", "solver", "variables", "restricciones", "terminos_objetivo", "hilos", "componentes",
+    "desde_cache", "tiempo_primera",
+)
+
+
+def restricciones_por_defecto(reglas, flexibilidad):
+    """``{id: bool}`` con las casillas que la pestaña de configuración marcaría por defecto."""
+    return {regla["id"]: activa_por_defecto(regla, flexibilidad) for regla in reglas}
+
+
+def generar_horario(df, reglas=None, restricciones=None, flexibilidad="Moderado",
+                    rejilla=REJILLA_POR_DEFECTO, por_componentes=False, semilla=None,
+                    max_procesos=None, cache=None, explicar=True, pesos_reglas=None, pesos_calidad=None,
+                    duraciones=DURACIONES_POR_DEFECTO, alternativas=1, diferencia=DIFERENCIA_MINIMA,
+                    registro_busqueda=False):
+    """Resuelve el horario de ``df`` y devuelve ``{status, asignacion, estadisticas}``.
+
+    Sin ``restricciones`` se activan las reglas marcadas por defecto para la
+    flexibilidad elegida. ``rejilla`` fija días, franjas, recreo y jornadas;
+    las ``Franjas_necesarias`` de ``df`` deben estar en sus franjas
+    (``cargar_datos(..., franjas_por_hora=rejilla.franjas_por_hora)``).
+    ``pesos_reglas`` (``{id: peso}``) vuelve blandas esas reglas y
+    ``pesos_calidad`` sustituye a ``PESOS_CALIDAD``; el desglose de
+    penalizaciones queda en ``penalizaciones``. ``duraciones`` (en minutos,
+    redondeadas a las franjas de ``rejilla``) son las sesiones seguidas en que
+    se divide cada fila; vacío o ``None`` coloca las clases franja a franja.
+    Con ``cache`` (un ``CacheSoluciones``) se reutiliza y guarda el resultado
+    igual que en la aplicación. Si la comprobación previa detecta
+    imposibilidades, se devuelve ``INFEASIBLE`` con ellas en ``viabilidad``
+    sin lanzar el solver. Con ``explicar``, un horario imposible añade a las
+    estadísticas el ``conflicto`` que lo causa. ``tiempos`` desglosa la
+    construcción y la extracción (con ``registro_busqueda``, también el
+    presolve y la búsqueda), y ``solver`` guarda los contadores de CP-SAT
+    (conflictos, ramas, cota...). Con
+    ``alternativas`` mayor que 1 se buscan ese número de horarios que difieren
+    al menos en la fracción ``diferencia`` de sus franjas (siempre con un solo
+    modelo y sin caché): quedan ordenados por penalización en ``alternativas``
+    y ``asignacion`` es el mejor.
+    """
+    if reglas is None:
+        reglas = cargar_reglas()
+    if restricciones is None:
+        restricciones = restricciones_por_defecto(reglas, flexibilidad)
+    dias = list(rejilla.dias)
+    franjas_por_dia = list(rejilla.franjas_por_dia)
+    franjas_recreo = list(rejilla.franjas_recreo)
+    pesos_reglas = pesos_reglas or {}
+    duraciones = rejilla.duraciones_en_franjas(duraciones) if duraciones else ()
+    if pesos_calidad is None:
+        pesos_calidad = PESOS_CALIDAD
+
+    clave = None
+    if cache is not None and semilla is None and alternativas <= 1:
+        clave = clave_solucion(
+            df,
+            flexibilidad=flexibilidad,
+            reglas=[r for r in reglas if restricciones.get(r["id"], False)],
+            **rejilla.configuracion(),
+            pesos_reglas=pesos_reglas,
+            pesos_calidad=pesos_calidad,
+            duraciones=duraciones,
+        )
+        resultado = cache.obtener(clave)
+        if resultado is not None:
+            resultado["estadisticas"]["desde_cache"] = True
+            return resultado
+
+    inicio_construccion = time.perf_counter()
+    indices = construir_indices(df)
+    compiladas = compilar_reglas(
+        reglas, df, dias, franjas_por_dia, franjas_recreo, restricciones, flexibilidad, indices, pesos_reglas,
+        rejilla.jornadas
+    )
+    estadisticas = {
+        "flexibilidad": flexibilidad,
+        "restricciones_aplicadas": len(compiladas.aplicadas),
+        "sesiones": [duracion * rejilla.minutos_franja for duracion in duraciones or ()],
+    }
+    problemas = comprobar_viabilidad(df, compiladas, dias, franjas_por_dia, indices, duraciones)
+    if problemas:
+        estadisticas["viabilidad"] = problemas
+        return {"status": "INFEASIBLE", "asignacion": None, "estadisticas": estadisticas}
+
+    if por_componentes and alternativas <= 1:
+        ejecucion = ResolucionPorComponentes(
+            df, dias, franjas_por_dia, compiladas, flexibilidad, semilla, max_procesos, indices, pesos_calidad,
+            duraciones, rejilla, registro_busqueda
+        )
+        estadisticas["componentes"] = ejecucion.componentes
+    else:
+        model, variables, _ = construir_modelo(
+            df, dias, franjas_por_dia, compiladas, indices, pesos_calidad, duraciones, rejilla
+        )
+        estadisticas.update(tamano_modelo(model))
+        forma = (len(df), rejilla.franjas_totales)
+        if alternativas > 1:
+            ejecucion = ResolucionAlternativas(
+                model, variables, forma, flexibilidad, alternativas, semilla, diferencia=diferencia,
+                registro_busqueda=registro_busqueda
+            )
+        else:
+            solver = configurar_solver(flexibilidad, semilla, registro_busqueda=registro_busqueda)
+            ejecucion = ResolucionEnCurso(model, solver, variables, forma)
+    estadisticas["tiempo_construccion"] = time.perf_counter() - inicio_construccion
+
+    ejecucion.esperar()
+    estadisticas.update(
+        tiempo_resolucion=ejecucion.tiempo_resolucion,
+        tiempo_primera=ejecucion.seguimiento.tiempo_primera,
+        hilos=ejecucion.hilos,
+        detenida=ejecucion.detenida,
+        tiempos=tiempos_resolucion(ejecucion, estadisticas["tiempo_construccion"]),
+        solver=ejecucion.estadisticas_solver,
+    )
+    if isinstance(ejecucion, ResolucionPorComponentes):
+        estadisticas.update(ejecucion.tamano)
+    asignacion = ejecucion.asignacion
+    ranking = None
+    if alternativas > 1 and ejecucion.asignaciones:
+        ranking = comparar_alternativas(
+            ejecucion.asignaciones, df, len(franjas_por_dia), compiladas, indices, pesos_calidad, rejilla
+        )
+        asignacion = ranking[0]["asignacion"]
+        estadisticas["penalizaciones"] = ranking[0]["penalizaciones"]
+        estadisticas["alternativas"] = [
+            {campo: alternativa[campo] for campo in ("penalizacion", "distinta_de_la_mejor", "distinta_minima")}
+            for alternativa in ranking
+        ]
+    elif asignacion is not None:
+        estadisticas["penalizaciones"] = evaluar_calidad(
+            asignacion, df, len(franjas_por_dia), compiladas, indices, pesos_calidad, rejilla=rejilla
+        )
+    if explicar and ejecucion.estado == "INFEASIBLE":
+        estadisticas["conflicto"] = explicar_inviabilidad(
+            df, dias, franjas_por_dia, franjas_recreo, compiladas, indices
+        )
+    resultado = {"status": ejecucion.estado, "asignacion": asignacion, "estadisticas": estadisticas}
+    if ranking is not None:
+        resultado["alternativas"] = ranking
+
+    if clave is not None:
+        cache.guardar(clave, resultado["status"], resultado["asignacion"], estadisticas)
+    return resultado
+
+
+def procesar_archivo(entrada, salida, reglas=None, restricciones=None, flexibilidad="Moderado",
+                     rejilla=REJILLA_POR_DEFECTO, motor=MOTOR_EXCEL, copia_parquet=True, log_metricas=None,
+                     **opciones):
+    """Genera el horario de un archivo de datos y, si hay solución, lo escribe en ``salida`` (.xlsx).
+
+    Con ``copia_parquet`` la tabla normalizada se reutiliza entre ejecuciones.
+    Devuelve un resumen serializable: archivo, estado, diagnóstico y estadísticas,
+    con la carga y la exportación añadidas a ``tiempos``. Con ``log_metricas``
+    (o ``HORARIOS_LOG_METRICAS``) el resumen se añade además a ese archivo JSON
+    Lines, con el presolve y la búsqueda separados.
+    Con varias ``alternativas``, la segunda y siguientes se escriben junto a
+    ``salida`` con el sufijo ``_alt2``, ``_alt3``... y se listan en ``alternativas``.
+    """
+    tiempos = {}
+    with cronometrar(tiempos, "carga"):
+        if copia_parquet:
+            df = cargar_datos_en_cache(
+                Path(entrada).read_bytes(), str(entrada), motor, franjas_por_hora=rejilla.franjas_por_hora
+            )
+        else:
+            df = cargar_datos(entrada, motor=motor, franjas_por_hora=rejilla.franjas_por_hora)
+    diagnostico = diagnosticar(df, rejilla)
+    resultado = generar_horario(
+        df, reglas, restricciones, flexibilidad, rejilla, registro_busqueda=bool(log_metricas or RUTA_LOG), **opciones
+    )
+
+    escrito = None
+    if resultado["status"] in ("OPTIMAL", "FEASIBLE"):
+        Path(salida).parent.mkdir(parents=True, exist_ok=True)
+        with cronometrar(tiempos, "exportacion"):
+            escribir_excel(
+                str(salida), df, resultado["asignacion"],
+                rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo
+            )
+        escrito = str(salida)
+
+    escritas = []
+    for n, alternativa in enumerate(resultado.get("alternativas", [])[1:], start=2):
+        ruta = Path(salida).with_name(f"{Path(salida).stem}_alt{n}{Path(salida).suffix}")
+        with cronometrar(tiempos, "exportacion"):
+            escribir_excel(
+                str(ruta), df, alternativa["asignacion"],
+                rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo
+            )
+        escritas.append(str(ruta))
+
+    estadisticas = resultado["estadisticas"]
+    estadisticas["tiempos"] = {**estadisticas.get("tiempos", {}), **tiempos}
+    diagnostico["profesores_sobrecargados"] = diagnostico["profesores_sobrecargados"].to_dict()
+    diagnostico["ocupacion_aulas"] = diagnostico["ocupacion_aulas"].to_dict()
+    diagnostico["franjas_curso"] = diagnostico["franjas_curso"].to_dict()
+    resumen = {
+        "entrada": str(entrada),
+        "salida": escrito,
+        "flexibilidad": flexibilidad,
+        "status": resultado["status"],
+        "diagnostico": diagnostico,
+        "estadisticas": estadisticas,
+    }
+    if escritas:
+        resumen["alternativas"] = escritas
+    registrar_metricas(
+        {"origen": "cli", "entrada": str(entrada), "flexibilidad": flexibilidad, "status": resultado["status"],
+         "filas": len(df), **{clave: estadisticas.get(clave) for clave in CLAVES_METRICAS}},
+        log_metricas,
+    )
+    return resumen
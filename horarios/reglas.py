@@ -0,0 +1,274 @@
+"""Motor declarativo de restricciones: reglas cargadas desde JSON, YAML o Excel.
+
+Cada regla selecciona filas de la tabla de asignaciones y se compila una sola
+vez en máscaras de franjas por fila, que después se aplican en bloque al
+construir el modelo. Tipos admitidos:
+
+- ``disponibilidad``: las filas solo pueden ir en la ventana indicada.
+- ``prohibido``: las filas no pueden ir en la ventana indicada.
+- ``minimo_diario``: entre todas las filas, al menos ``minimo`` franjas cada día.
+- ``exclusion``: las filas de ``filas`` y de ``con`` nunca coinciden en una franja.
+
+Una regla con ``peso`` mayor que cero es blanda: en lugar de prohibir, el
+modelo paga ``peso`` por cada franja que la incumple (fuera de la ventana, que
+falta para el mínimo o en la que coinciden filas excluidas).
+
+Los selectores (``filas`` y ``con``) admiten las claves ``profesor``,
+``asignatura`` y ``curso``: un texto se busca como subcadena sin distinguir
+mayúsculas y una lista exige coincidencia exacta con alguno de sus valores.
+Las ventanas se expresan con ``dias`` (todos si se omite) y ``desde``/``hasta``
+en formato ``HH:MM``.
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from horarios.indices import construir_indices, filas_en, filas_que_contienen
+from horarios.rejilla import mascara_jornada, ventana as ventana_horaria
+
+RUTA_REGLAS_POR_DEFECTO = Path(__file__).resolve().parent.parent / "reglas_restricciones.json"
+
+TIPOS = ("disponibilidad", "prohibido", "minimo_diario", "exclusion")
+COLUMNAS_SELECTOR = {"profesor": "Profesor", "asignatura": "Asignatura", "curso": "Curso"}
+
+
+@dataclass
+class ReglasCompiladas:
+    """Resultado de compilar las reglas activas contra una tabla concreta.
+
+    ``ventanas`` conserva, regla a regla, las franjas que cada ventana permite
+    (ya incluidas en ``permitidas``) para poder explicar una inviabilidad.
+    ``blandas`` guarda las reglas con peso como ``(id, tipo, filas, dato, peso)``,
+    donde ``dato`` es la ventana permitida, el mínimo diario o ``None`` en una
+    exclusión; ``recreo`` marca las franjas de recreo y ``jornada``, por fila,
+    las de la jornada de su curso sin el recreo (lo que permiten sin reglas).
+    """
+
+    permitidas: np.ndarray
+    minimos_diarios: list = field(default_factory=list)
+    exclusiones: list = field(default_factory=list)
+    aplicadas: list = field(default_factory=list)
+    ventanas: list = field(default_factory=list)
+    blandas: list = field(default_factory=list)
+    recreo: np.ndarray = None
+    jornada: np.ndarray = None
+
+    def subconjunto(self, filas):
+        """Reglas restringidas a ``filas`` (posiciones ordenadas), renumeradas desde 0.
+
+        Los grupos de filas que no caen en el subconjunto se descartan.
+        """
+        posicion = {int(fila): nueva for nueva, fila in enumerate(filas)}
+
+        def renumerar(grupo):
+            return np.array([posicion[int(i)] for i in grupo if int(i) in posicion], dtype=int)
+
+        return ReglasCompiladas(
+            self.permitidas[filas],
+            [(id_, renumerar(g), minimo) for id_, g, minimo in self.minimos_diarios if len(renumerar(g))],
+            [(id_, renumerar(g)) for id_, g in self.exclusiones if len(renumerar(g))],
+            list(self.aplicadas),
+            [(id_, renumerar(g), ventana) for id_, g, ventana in self.ventanas if len(renumerar(g))],
+            [(id_, tipo, renumerar(g), dato, peso) for id_, tipo, g, dato, peso in self.blandas
+             if len(renumerar(g))],
+            self.recreo,
+            self.jornada[filas] if self.jornada is not None else None,
+        )
+
+
+def _lista(valor):
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        return [v.strip() for v in valor.split(";") if v.strip()]
+    return list(valor)
+
+
+def _validar(regla):
+    if not regla.get("id"):
+        raise ValueError(f"Regla sin 'id': {regla}")
+    if regla.get("tipo") not in TIPOS:
+        raise ValueError(f"Regla '{regla['id']}': tipo '{regla.get('tipo')}' no válido ({', '.join(TIPOS)})")
+    if not regla.get("filas"):
+        raise ValueError(f"Regla '{regla['id']}': falta el selector 'filas'")
+    if regla["tipo"] == "exclusion" and not regla.get("con"):
+        raise ValueError(f"Regla '{regla['id']}': una exclusión necesita el selector 'con'")
+    peso = regla.get("peso", 0)
+    if isinstance(peso, bool) or not isinstance(peso, int) or peso < 0:
+        raise ValueError(f"Regla '{regla['id']}': el peso debe ser un entero mayor o igual que 0")
+    for selector in (regla.get("filas"), regla.get("con")):
+        for clave in selector or {}:
+            if clave not in COLUMNAS_SELECTOR:
+                raise ValueError(f"Regla '{regla['id']}': selector '{clave}' desconocido")
+    return regla
+
+
+def _regla_desde_fila(fila):
+    """Convierte una fila de la hoja Excel de reglas al formato de diccionario.
+
+    En la hoja, los valores múltiples se separan con ``;`` y, en los selectores,
+    indican coincidencia exacta; un único valor se busca como subcadena.
+    """
+    fila = {k: v for k, v in fila.items() if not (isinstance(v, float) and np.isnan(v)) and v != ""}
+
+    def selector(prefijo):
+        resultado = {}
+        for clave in COLUMNAS_SELECTOR:
+            valor = fila.get(prefijo + clave)
+            if valor is not None:
+                valores = _lista(str(valor))
+                resultado[clave] = valores[0] if len(valores) == 1 else valores
+        return resultado
+
+    regla = {
+        "id": str(fila.get("id", "")).strip(),
+        "tipo": str(fila.get("tipo", "")).strip(),
+        "descripcion": fila.get("descripcion", ""),
+        "grupo": fila.get("grupo", "Profesores"),
+        "filas": selector(""),
+        "con": selector("con_"),
+        "dias": _lista(fila.get("dias")),
+        "por_defecto": _lista(fila.get("por_defecto")),
+        "solo_en": _lista(fila.get("solo_en")),
+    }
+    for clave in ("desde", "hasta"):
+        if clave in fila:
+            regla[clave] = str(fila[clave])[:5]
+    if "minimo" in fila:
+        regla["minimo"] = int(fila["minimo"])
+    if "peso" in fila:
+        regla["peso"] = int(fila["peso"])
+    return {k: v for k, v in regla.items() if k == "filas" or v not in ([], {}, "")}
+
+
+def cargar_reglas(origen=None, nombre=None):
+    """Lee las reglas de un fichero JSON, YAML o Excel (ruta o archivo subido).
+
+    Sin ``origen`` se usa ``reglas_restricciones.json`` del proyecto.
+    """
+    if origen is None:
+        origen = RUTA_REGLAS_POR_DEFECTO
+    nombre = (nombre or getattr(origen, "name", None) or str(origen)).lower()
+
+    if nombre.endswith((".xlsx", ".xls")):
+        hoja = pd.read_excel(origen, dtype=object)
+        reglas = [_regla_desde_fila(fila) for fila in hoja.to_dict("records")]
+    else:
+        if isinstance(origen, (str, Path)):
+            texto = Path(origen).read_text(encoding="utf-8")
+        else:
+            texto = origen.read()
+            texto = texto.decode("utf-8") if isinstance(texto, bytes) else texto
+        if nombre.endswith((".yaml", ".yml")):
+            import yaml  # dependencia opcional, solo para reglas en YAML
+
+            datos = yaml.safe_load(texto)
+        else:
+            datos = json.loads(texto)
+        reglas = datos["reglas"] if isinstance(datos, dict) else datos
+
+    return [_validar(regla) for regla in reglas]
+
+
+def activa_por_defecto(regla, flexibilidad):
+    """Si la regla viene marcada por defecto para el nivel de flexibilidad."""
+    por_defecto = regla.get("por_defecto")
+    return True if por_defecto is None else flexibilidad in por_defecto
+
+
+def _seleccionar(indices, selector):
+    """Posiciones de las filas que cumplen todas las condiciones del selector."""
+    filas = None
+    for clave, valor in selector.items():
+        columna = COLUMNAS_SELECTOR[clave]
+        if isinstance(valor, str):
+            encontradas = filas_que_contienen(indices, columna, valor)
+        else:
+            encontradas = filas_en(indices, columna, valor)
+        filas = encontradas if filas is None else np.intersect1d(filas, encontradas)
+    return np.unique(filas) if filas is not None else np.array([], dtype=int)
+
+
+def _ventana(regla, dias, franjas_por_dia):
+    """Máscara de franjas (longitud ``dias × franjas_por_dia``) que cubre la ventana de la regla."""
+    try:
+        return ventana_horaria(dias, franjas_por_dia, regla.get("desde"), regla.get("hasta"), regla.get("dias"))
+    except ValueError as error:
+        raise ValueError(f"Regla '{regla['id']}': {error}") from None
+
+
+def peso_regla(regla, pesos=None):
+    """Peso de incumplimiento de la regla (0 si es obligatoria); ``pesos`` sustituye al del archivo."""
+    return int((pesos or {}).get(regla["id"], regla.get("peso", 0)) or 0)
+
+
+def compilar_reglas(reglas, df, dias, franjas_por_dia, franjas_recreo, activas, flexibilidad, indices=None,
+                    pesos=None, jornadas=()):
+    """Compila las reglas activas en máscaras y grupos de filas para ``df``.
+
+    ``activas`` es el diccionario ``{id: bool}`` de la pestaña de configuración;
+    las reglas con ``solo_en`` solo se aplican en esos niveles de flexibilidad.
+    ``pesos`` (``{id: peso}``) convierte en blandas las reglas con peso mayor que cero.
+    ``jornadas`` son las de la rejilla (``Rejilla.jornadas``): cada curso solo
+    tiene franjas permitidas dentro de la suya.
+    """
+    if indices is None:
+        indices = construir_indices(df)
+    franjas_totales = len(dias) * len(franjas_por_dia)
+    permitidas = np.ones((len(df), franjas_totales), dtype=bool)
+
+    # 🗓️ JORNADA: cada curso, solo dentro de la suya
+    if jornadas:
+        for curso, filas in indices["Curso"].items():
+            permitidas[filas] = mascara_jornada(curso, jornadas, dias, franjas_por_dia)
+
+    # 🔔 RECREO: nunca hay clase
+    permitidas[:, franjas_recreo] = False
+    recreo = np.zeros(franjas_totales, dtype=bool)
+    recreo[list(franjas_recreo)] = True
+    compiladas = ReglasCompiladas(permitidas, recreo=recreo, jornada=permitidas.copy())
+
+    for regla in reglas:
+        if not activas.get(regla["id"], False):
+            continue
+        if regla.get("solo_en") and flexibilidad not in regla["solo_en"]:
+            continue
+
+        filas = _seleccionar(indices, regla["filas"])
+        tipo = regla["tipo"]
+        peso = peso_regla(regla, pesos)
+
+        if peso > 0:
+            if tipo in ("disponibilidad", "prohibido"):
+                ventana = _ventana(regla, dias, franjas_por_dia)
+                dato = ~ventana if tipo == "prohibido" else ventana
+            elif tipo == "minimo_diario":
+                dato = int(regla.get("minimo", 1))
+            else:
+                con = _seleccionar(indices, regla["con"])
+                filas = np.union1d(filas, con) if len(filas) and len(con) else con[:0]
+                dato = None
+            if len(filas):
+                compiladas.blandas.append((regla["id"], tipo, filas, dato, peso))
+        elif tipo in ("disponibilidad", "prohibido"):
+            ventana = _ventana(regla, dias, franjas_por_dia)
+            if tipo == "prohibido":
+                ventana = ~ventana
+            permitidas[filas] &= ventana
+            if len(filas):
+                compiladas.ventanas.append((regla["id"], filas, ventana))
+        elif tipo == "minimo_diario":
+            if len(filas):
+                compiladas.minimos_diarios.append((regla["id"], filas, int(regla.get("minimo", 1))))
+        elif tipo == "exclusion":
+            con = _seleccionar(indices, regla["con"])
+            if len(filas) and len(con):
+                compiladas.exclusiones.append((regla["id"], np.union1d(filas, con)))
+
+        compiladas.aplicadas.append(regla["id"])
+
+    return compiladas
@@ -0,0 +1,287 @@
+"""Rejilla semanal de franjas horarias, definida como datos.
+
+Una rejilla tiene los días, las franjas de cada día (etiquetas ``HH:MM-HH:MM``
+seguidas y de la misma duración, salvo las de recreo), las franjas de recreo
+y, opcionalmente, la jornada de cada curso. Se lee de un JSON o YAML::
+
+    {
+      "dias": ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes"],
+      "inicio": "15:00", "fin": "20:50", "minutos": 55,
+      "recreos": ["16:50-17:15"],
+      "jornadas": [{"cursos": "ESO", "hasta": "19:55"}]
+    }
+
+En lugar de ``inicio``, ``fin`` y ``minutos`` pueden darse las etiquetas en
+``franjas``. Un recreo es ``"HH:MM-HH:MM"`` o ``{desde, hasta, dias}`` y, al
+generar las franjas, ocupa una propia. Cada jornada limita los cursos que
+selecciona (``cursos``: un texto se busca como subcadena sin distinguir
+mayúsculas, una lista exige el nombre exacto y sin ella vale para todos) a su
+ventana ``desde``/``hasta`` en sus ``dias``; un curso con varias jornadas
+puede usar cualquiera y uno sin ninguna, el día completo. Fuera de su jornada
+un curso no tiene variables en el modelo, así que alargar la rejilla solo
+añade variables a los cursos que usan las franjas nuevas.
+"""
+
+import json
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+DIAS = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes")
+CLAVES_JORNADA = ("cursos", "desde", "hasta", "dias")
+# Duración mínima de una clase: con franjas más cortas, una franja suelta no es una clase
+MINUTOS_CLASE_MINIMA = 45
+
+
+def a_minutos(hora):
+    """``"09:30"`` → ``570``."""
+    horas, minutos = str(hora).strip().split(":")[:2]
+    return int(horas) * 60 + int(minutos)
+
+
+def _hora(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def limites(etiqueta):
+    """``"09:00-09:30"`` → ``(540, 570)``."""
+    inicio, _, fin = str(etiqueta).partition("-")
+    return a_minutos(inicio), a_minutos(fin)
+
+
+def duracion_franjas(franjas_por_dia):
+    """Duración en minutos más habitual entre las franjas del día."""
+    return Counter(fin - inicio for inicio, fin in map(limites, franjas_por_dia)).most_common(1)[0][0]
+
+
+def ventana(dias, franjas_por_dia, desde=None, hasta=None, dias_ventana=None):
+    """Máscara de franjas (longitud ``dias × franjas_por_dia``) entre ``desde`` y ``hasta`` en ``dias_ventana``.
+
+    Sin horas cubre el día entero y sin ``dias_ventana``, todos los días.
+    Lanza ``ValueError`` si algún día no está en ``dias``.
+    """
+    inicios, finales = np.array([limites(f) for f in franjas_por_dia]).T
+    en_hora = (inicios >= a_minutos(desde or "00:00")) & (finales <= a_minutos(hasta or "24:00"))
+
+    dias_ventana = dias_ventana or dias
+    desconocidos = set(dias_ventana) - set(dias)
+    if desconocidos:
+        raise ValueError(f"días desconocidos {sorted(desconocidos)}")
+    return np.outer(np.isin(dias, dias_ventana), en_hora).ravel()
+
+
+def _del_curso(jornada, curso):
+    cursos = jornada.get("cursos")
+    if cursos is None:
+        return True
+    if isinstance(cursos, str):
+        return cursos.lower() in str(curso).lower()
+    return str(curso) in [str(c) for c in cursos]
+
+
+def mascara_jornada(curso, jornadas, dias, franjas_por_dia):
+    """Franjas de la semana dentro de las jornadas de ``curso`` (todas si ninguna lo selecciona)."""
+    suyas = [jornada for jornada in jornadas if _del_curso(jornada, curso)]
+    if not suyas:
+        return np.ones(len(dias) * len(franjas_por_dia), dtype=bool)
+    return np.logical_or.reduce([
+        ventana(dias, franjas_por_dia, j.get("desde"), j.get("hasta"), j.get("dias")) for j in suyas
+    ])
+
+
+@dataclass(frozen=True)
+class Rejilla:
+    """Días, franjas de cada día, franjas de recreo (índices globales ``día × franja``) y jornadas por curso."""
+
+    dias: tuple = DIAS
+    franjas_por_dia: tuple = (
+        "09:00-09:30", "09:30-10:00", "10:00-10:30", "10:30-11:00", "11:00-11:30",
+        "11:30-12:00", "12:00-12:30", "12:30-13:00", "13:00-13:30", "13:30-14:00",
+    )
+    # 🔔 RECREO: 12:00-12:30 todos los días (franja 6 de cada día)
+    franjas_recreo: tuple = field(default=(6, 16, 26, 36, 46))
+    # Jornadas ({cursos, desde, hasta, dias}); sin ninguna, todos los cursos usan el día completo
+    jornadas: tuple = field(default=(), hash=False)
+
+    @property
+    def franjas_totales(self):
+        return len(self.dias) * len(self.franjas_por_dia)
+
+    @property
+    def franjas_utiles(self):
+        """Franjas lectivas por semana (sin recreo)."""
+        return self.franjas_totales - len(self.franjas_recreo)
+
+    @property
+    def horas_recreo(self):
+        """Etiquetas de las franjas de recreo, sin repetir (p. ej. ``["12:00-12:30"]``)."""
+        n = len(self.franjas_por_dia)
+        return sorted({self.franjas_por_dia[f % n] for f in self.franjas_recreo})
+
+    @property
+    def recreo(self):
+        """Máscara de las franjas de recreo."""
+        recreo = np.zeros(self.franjas_totales, dtype=bool)
+        recreo[list(self.franjas_recreo)] = True
+        return recreo
+
+    @property
+    def minutos_franja(self):
+        """Duración en minutos de las franjas lectivas (las de recreo pueden durar otra cosa)."""
+        lectivas = ~self.recreo.reshape(len(self.dias), -1).all(axis=0)
+        return duracion_franjas(np.asarray(self.franjas_por_dia)[lectivas])
+
+    @property
+    def franjas_por_hora(self):
+        """Franjas que cuenta cada hora de ``Horas por semana``: 2 con medias horas, 1 con periodos de 45-60 min."""
+        return max(1, round(60 / self.minutos_franja))
+
+    def mascara_curso(self, curso):
+        """Franjas en que puede haber clase de ``curso``: las de su jornada, sin el recreo."""
+        mascara = mascara_jornada(curso, self.jornadas, self.dias, self.franjas_por_dia)
+        mascara[list(self.franjas_recreo)] = False
+        return mascara
+
+    def franjas_de_curso(self, curso):
+        return int(self.mascara_curso(curso).sum())
+
+    @property
+    def franjas_clase_minima(self):
+        """Franjas seguidas de la clase más corta: 2 con medias horas, 1 con periodos de 45 min o más."""
+        return math.ceil(MINUTOS_CLASE_MINIMA / self.minutos_franja)
+
+    def franjas_en(self, minutos):
+        """Número entero de franjas más cercano a ``minutos`` (al menos una)."""
+        return max(1, int(minutos / self.minutos_franja + 0.5))
+
+    def duraciones_en_franjas(self, minutos):
+        """Duraciones de sesión en minutos → en franjas, sin repetir y ordenadas.
+
+        Cada duración se redondea a las franjas más cercanas: 60 y 90 minutos
+        son ``(2, 3)`` con medias horas y ``(1, 2)`` con periodos de 55 minutos.
+        Lanza ``ValueError`` si alguna queda por debajo de la clase más corta.
+        """
+        franjas = tuple(sorted({self.franjas_en(m) for m in minutos}))
+        if not franjas or min(minutos) <= 0 or franjas[0] < self.franjas_clase_minima:
+            minimo = self.franjas_clase_minima * self.minutos_franja
+            raise ValueError(f"Las sesiones deben durar al menos {minimo} minutos con esta rejilla")
+        return franjas
+
+    def configuracion(self):
+        """Lo que entra en la clave de caché; las jornadas, solo si las hay."""
+        configuracion = {
+            "dias": list(self.dias),
+            "franjas_por_dia": list(self.franjas_por_dia),
+            "franjas_recreo": list(self.franjas_recreo),
+        }
+        if self.jornadas:
+            configuracion["jornadas"] = list(self.jornadas)
+        return configuracion
+
+
+REJILLA_POR_DEFECTO = Rejilla()
+
+
+def _recreos(datos):
+    """``[(desde, hasta, dias)]`` de la lista ``recreos``."""
+    recreos = []
+    for recreo in datos.get("recreos") or []:
+        if isinstance(recreo, str):
+            desde, _, hasta = recreo.partition("-")
+            recreo = {"desde": desde, "hasta": hasta}
+        if not recreo.get("desde") or not recreo.get("hasta"):
+            raise ValueError(f"Recreo sin 'desde' y 'hasta': {recreo}")
+        recreos.append((str(recreo["desde"]).strip(), str(recreo["hasta"]).strip(), recreo.get("dias")))
+    return recreos
+
+
+def _generar_franjas(inicio, fin, minutos, recreos):
+    """Etiquetas cada ``minutos`` desde ``inicio`` hasta ``fin``; cada recreo ocupa su propia franja."""
+    pausas = {a_minutos(desde): a_minutos(hasta) for desde, hasta, _ in recreos}
+    etiquetas = []
+    actual, fin = a_minutos(inicio), a_minutos(fin)
+    while actual < fin:
+        if actual in pausas:
+            etiquetas.append(f"{_hora(actual)}-{_hora(pausas[actual])}")
+            actual = pausas[actual]
+            continue
+        siguiente = actual + minutos
+        if siguiente > fin:
+            break
+        cortada = [desde for desde in pausas if actual < desde < siguiente]
+        if cortada:
+            raise ValueError(f"El recreo de las {_hora(cortada[0])} no empieza al acabar una franja")
+        etiquetas.append(f"{_hora(actual)}-{_hora(siguiente)}")
+        actual = siguiente
+    return etiquetas
+
+
+def rejilla_desde_datos(datos):
+    """Valida un diccionario con el formato del archivo y construye la ``Rejilla``."""
+    dias = tuple(str(dia) for dia in datos.get("dias") or DIAS)
+    if len(set(dias)) != len(dias):
+        raise ValueError("La rejilla repite días")
+    recreos = _recreos(datos)
+    if datos.get("franjas"):
+        franjas = [str(franja).strip() for franja in datos["franjas"]]
+    elif all(datos.get(clave) for clave in ("inicio", "fin", "minutos")):
+        franjas = _generar_franjas(datos["inicio"], datos["fin"], int(datos["minutos"]), recreos)
+    else:
+        raise ValueError("La rejilla necesita 'franjas' o bien 'inicio', 'fin' y 'minutos'")
+    if not franjas:
+        raise ValueError("La rejilla no tiene ninguna franja")
+
+    tramos = [limites(franja) for franja in franjas]
+    for (inicio, fin), franja in zip(tramos, franjas):
+        if fin <= inicio:
+            raise ValueError(f"La franja {franja} termina antes de empezar")
+    for (_, fin), (inicio, _), anterior, siguiente in zip(tramos, tramos[1:], franjas, franjas[1:]):
+        if fin != inicio:
+            # Las franjas seguidas forman sesiones: una pausa sin franja las uniría
+            raise ValueError(f"Entre {anterior} y {siguiente} no hay franja; declara la pausa como recreo")
+
+    recreo = np.zeros(len(dias) * len(franjas), dtype=bool)
+    for desde, hasta, dias_recreo in recreos:
+        mascara = ventana(dias, franjas, desde, hasta, dias_recreo)
+        if not mascara.any():
+            raise ValueError(f"El recreo {desde}-{hasta} no coincide con ninguna franja")
+        recreo |= mascara
+
+    lectivas = ~recreo.reshape(len(dias), -1).all(axis=0)
+    duraciones = sorted({fin - inicio for (inicio, fin), lectiva in zip(tramos, lectivas) if lectiva})
+    if len(duraciones) > 1:
+        raise ValueError(f"Las franjas lectivas deben durar lo mismo (hay de {duraciones} minutos)")
+
+    jornadas = []
+    for jornada in datos.get("jornadas") or []:
+        desconocidas = set(jornada) - set(CLAVES_JORNADA)
+        if desconocidas:
+            raise ValueError(f"Jornada con claves desconocidas {sorted(desconocidas)}: {jornada}")
+        jornada = {clave: valor for clave, valor in jornada.items() if valor not in (None, "", [])}
+        if not (ventana(dias, franjas, jornada.get("desde"), jornada.get("hasta"), jornada.get("dias"))
+                & ~recreo).any():
+            raise ValueError(f"La jornada {jornada} no tiene ninguna franja lectiva")
+        jornadas.append(jornada)
+    return Rejilla(dias, tuple(franjas), tuple(int(f) for f in np.flatnonzero(recreo)), tuple(jornadas))
+
+
+def cargar_rejilla(origen=None, nombre=None):
+    """Lee la rejilla de un JSON o YAML (ruta o archivo subido); sin ``origen``, la de siempre."""
+    if origen is None:
+        return REJILLA_POR_DEFECTO
+    nombre = (nombre or getattr(origen, "name", None) or str(origen)).lower()
+    if isinstance(origen, (str, Path)):
+        texto = Path(origen).read_text(encoding="utf-8")
+    else:
+        texto = origen.read()
+        texto = texto.decode("utf-8") if isinstance(texto, bytes) else texto
+    if nombre.endswith((".yaml", ".yml")):
+        import yaml  # dependencia opcional, solo para rejillas en YAML
+
+        datos = yaml.safe_load(texto)
+    else:
+        datos = json.loads(texto)
+    return rejilla_desde_datos(datos)
@@ -0,0 +1,173 @@
+"""Configuración del solver y resolución en segundo plano con seguimiento del progreso."""
+
+import os
+import threading
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from horarios.medicion import cronometrar, estadisticas_solver
+
+# Tiempo máximo de búsqueda (segundos) según el nivel de flexibilidad
+TIEMPO_MAXIMO = {
+    "Muy Flexible": 300.0,
+    "Flexible": 300.0,
+    "Moderado": 180.0,
+    "Estricto": 120.0,
+    "Muy Estricto": 120.0,
+}
+
+# Segundos sin mejorar el objetivo tras los que se da por buena la mejor solución
+TIEMPO_SIN_MEJORA = 30.0
+
+
+def configurar_solver(flexibilidad, semilla=None, num_workers=None, registro_busqueda=False):
+    """Crea un ``CpSolver`` que usa todos los núcleos y el tiempo del nivel elegido.
+
+    Con ``registro_busqueda`` el registro de la búsqueda va a la respuesta (no
+    a la consola) para poder separar el presolve de la búsqueda en las
+    estadísticas. Frena algo la búsqueda y agranda la respuesta, así que solo
+    se activa al medir: en ``horarios.banco`` o con un archivo de métricas.
+    """
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = num_workers or os.cpu_count() or 1
+    solver.parameters.max_time_in_seconds = TIEMPO_MAXIMO.get(flexibilidad, 180.0)
+    if registro_busqueda:
+        solver.parameters.log_search_progress = True
+        solver.parameters.log_to_stdout = False
+        solver.parameters.log_to_response = True
+    if semilla is not None:
+        solver.parameters.random_seed = semilla
+    return solver
+
+
+class SeguimientoSoluciones(cp_model.CpSolverSolutionCallback):
+    """Registra cada solución intermedia para poder mostrar el progreso.
+
+    Con ``detener`` (un ``threading.Event``) la búsqueda se corta en la
+    primera solución que llegue después de activarlo.
+    """
+
+    def __init__(self, detener=None):
+        super().__init__()
+        self.detener = detener
+        self.inicio = time.perf_counter()
+        self.soluciones = 0
+        self.objetivo = None
+        self.cota = None
+        self.tiempo_primera = None
+        self.tiempo_mejora = None
+
+    def on_solution_callback(self):
+        self.soluciones += 1
+        self.objetivo = self.ObjectiveValue()
+        self.cota = self.BestObjectiveBound()
+        self.tiempo_mejora = time.perf_counter() - self.inicio
+        if self.tiempo_primera is None:
+            self.tiempo_primera = self.tiempo_mejora
+        if self.detener is not None and self.detener.is_set():
+            self.StopSearch()
+
+    def estancada(self, segundos):
+        """Si hay solución y el objetivo lleva ``segundos`` sin mejorar."""
+        return self.tiempo_mejora is not None and self.tiempo - self.tiempo_mejora > segundos
+
+    @property
+    def tiempo(self):
+        return time.perf_counter() - self.inicio
+
+
+class ResolucionEnCurso:
+    """Ejecuta ``solver.Solve`` en un hilo para que la interfaz pueda consultar el progreso.
+
+    Al terminar deja ``estado`` (nombre del status) y, si hay solución,
+    ``asignacion``, además de ``estadisticas_solver`` (conflictos, ramas,
+    presolve, búsqueda...) y ``tiempos`` (extracción de la solución).
+    ``detener()`` interrumpe la búsqueda y conserva la mejor solución
+    encontrada; si llega antes de que empiece ``Solve``, no se resuelve y el
+    estado queda ``UNKNOWN``. Si el modelo tiene objetivo, la búsqueda también
+    se corta cuando lleva ``sin_mejora`` segundos sin mejorarlo (``estancada``).
+    """
+
+    def __init__(self, model, solver, variables, forma, sin_mejora=TIEMPO_SIN_MEJORA):
+        self.model = model
+        self.solver = solver
+        self.variables = variables
+        self.forma = forma
+        self._detener = threading.Event()
+        self.seguimiento = SeguimientoSoluciones(self._detener)
+        self.status = None
+        self.estado = None
+        self.asignacion = None
+        self.tiempo_resolucion = None
+        self.tiempos = {}
+        self.estadisticas_solver = None
+        self.detenida = False
+        self.sin_mejora = sin_mejora
+        self.estancada = False
+        self._con_objetivo = model.HasObjective()
+        self._hilo = threading.Thread(target=self._resolver, daemon=True)
+        self._hilo.start()
+        threading.Thread(target=self._vigilar, daemon=True).start()
+
+    def _vigilar(self):
+        while not self.esperar(0.5):
+            if self._detener.is_set():
+                # Por si se pidió justo mientras arrancaba Solve, antes de que atendiera StopSearch
+                self.solver.StopSearch()
+            elif self._con_objetivo and self.seguimiento.estancada(self.sin_mejora):
+                self.estancada = True
+                self.solver.StopSearch()
+                return
+
+    def _resolver(self):
+        # Cancelada mientras esperaba en la cola o se construía el modelo: no se llega a resolver
+        if self._detener.is_set():
+            self.status = cp_model.UNKNOWN
+        else:
+            self.status = self.solver.Solve(self.model, self.seguimiento)
+        self.tiempo_resolucion = self.seguimiento.tiempo
+        self.estado = self.solver.StatusName(self.status)
+        self.estadisticas_solver = estadisticas_solver(self.solver.ResponseProto(), self.model.HasObjective())
+        if self.estado in ("OPTIMAL", "FEASIBLE"):
+            with cronometrar(self.tiempos, "extraccion"):
+                self.asignacion = extraer_asignacion(self.solver, self.variables, *self.forma)
+        # Liberar el modelo en cuanto la solución está materializada
+        self.model = self.variables = None
+
+    @property
+    def terminada(self):
+        return not self._hilo.is_alive()
+
+    @property
+    def limite(self):
+        return self.solver.parameters.max_time_in_seconds
+
+    @property
+    def hilos(self):
+        return self.solver.parameters.num_search_workers
+
+    def esperar(self, timeout=None):
+        self._hilo.join(timeout)
+        return self.terminada
+
+    def detener(self):
+        self.detenida = True
+        self._detener.set()
+        self.solver.StopSearch()
+
+
+def extraer_asignacion(solver, variables, n_filas, franjas_totales):
+    """Materializa la solución en una matriz ``uint8`` de forma ``(filas, franjas)``.
+
+    Se lee de una vez el vector de solución del solver, de modo que después se
+    pueden liberar el modelo, el solver y las variables.
+    """
+    asignacion = np.zeros((n_filas, franjas_totales), dtype=np.uint8)
+    if variables:
+        claves = np.array(list(variables.keys()), dtype=np.int64)
+        indices = np.fromiter((v.Index() for v in variables.values()), dtype=np.int64, count=len(variables))
+        solucion = np.asarray(solver.ResponseProto().solution, dtype=np.uint8)
+        asignacion[claves[:, 0], claves[:, 1]] = solucion[indices]
+    return asignacion
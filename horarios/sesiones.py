@@ -0,0 +1,88 @@
+"""Clases en sesiones de duración fija (p. ej. 60 y 90 minutos) en lugar de franjas sueltas.
+
+Cada fila se divide en sesiones con las duraciones elegidas, en franjas de la
+rejilla. El modelo solo decide en qué franja empieza cada sesión, que ocupa
+franjas seguidas del mismo día sin cruzar el recreo, así que desaparecen las
+colocaciones fragmentadas (franjas sueltas repartidas por la semana).
+Las filas de una regla obligatoria de mínimo diario se siguen colocando franja
+a franja, porque necesitan repartirse en más días que sesiones tendrían.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+# En minutos; ``Rejilla.duraciones_en_franjas`` las pasa a franjas (2 y 3 medias horas)
+DURACIONES_POR_DEFECTO = (60, 90)
+
+
+@lru_cache(maxsize=None)
+def dividir_en_sesiones(franjas, duraciones):
+    """Duraciones (en franjas, de mayor a menor) de las sesiones de una fila de ``franjas`` franjas.
+
+    Se busca el mayor número de sesiones con las ``duraciones`` permitidas; si
+    no hay combinación exacta se admiten además sesiones de una franja.
+    """
+    for permitidas in (sorted(set(duraciones)), sorted(set(duraciones) | {1})):
+        # mejor[n]: reparto de n franjas con más sesiones
+        mejor = [()] + [None] * franjas
+        for n in range(1, franjas + 1):
+            candidatos = [mejor[n - d] + (d,) for d in permitidas if d <= n and mejor[n - d] is not None]
+            if candidatos:
+                mejor[n] = max(candidatos, key=len)
+        if mejor[franjas] is not None:
+            return tuple(sorted(mejor[franjas], reverse=True))
+
+
+def sesiones_por_fila(necesarias, duraciones, reglas=None):
+    """Lista con las duraciones de las sesiones de cada fila (``None`` si va franja a franja).
+
+    Con ``reglas`` (un ``ReglasCompiladas``) las filas de sus mínimos diarios quedan en ``None``.
+    """
+    duraciones = tuple(sorted(set(duraciones)))
+    sueltas = set()
+    for _, filas, _ in reglas.minimos_diarios if reglas is not None else []:
+        sueltas.update(int(i) for i in filas)
+    return [
+        None if i in sueltas else dividir_en_sesiones(int(n), duraciones)
+        for i, n in enumerate(necesarias)
+    ]
+
+
+def inicios_posibles(permitidas, duracion, franjas_dia):
+    """Máscara (filas × franjas) de las franjas en que puede empezar una sesión de ``duracion`` franjas."""
+    franjas_totales = permitidas.shape[1]
+    posibles = permitidas.copy()
+    for k in range(1, duracion):
+        posibles[:, : franjas_totales - k] &= permitidas[:, k:]
+        posibles[:, franjas_totales - k:] = False
+    # Una sesión no pasa de un día al siguiente
+    posibles &= np.arange(franjas_totales) % franjas_dia <= franjas_dia - duracion
+    return posibles
+
+
+def _tramos(ocupadas, franjas_dia):
+    """Longitud de cada tramo de franjas seguidas, en la franja donde termina (0 en el resto)."""
+    n_filas, franjas_totales = ocupadas.shape
+    # Una franja vacía al final de cada día separa los tramos de días distintos
+    separadas = np.zeros((n_filas, franjas_totales // franjas_dia, franjas_dia + 1), dtype=bool)
+    separadas[:, :, :franjas_dia] = ocupadas.reshape(n_filas, -1, franjas_dia)
+    separadas = separadas.reshape(n_filas, -1)
+    posicion = np.arange(separadas.shape[1])
+    ultimo_hueco = np.maximum.accumulate(np.where(separadas, -1, posicion), axis=1)
+    final = separadas & ~np.roll(separadas, -1, axis=1)
+    return np.where(final, posicion - ultimo_hueco, 0)
+
+
+def sesiones_que_caben(permitidas, duracion, franjas_dia):
+    """Número máximo de sesiones de ``duracion`` franjas que caben sin solaparse en cada fila."""
+    return (_tramos(permitidas, franjas_dia) // duracion).sum(axis=1)
+
+
+def filas_compatibles(asignacion, sesiones, franjas_dia):
+    """Filas cuyo horario ya está formado exactamente por sus sesiones, una por tramo seguido."""
+    tramos = _tramos(asignacion.astype(bool), franjas_dia)
+    return np.array([
+        duraciones is None or sorted(fila[fila > 0].tolist(), reverse=True) == list(duraciones)
+        for fila, duraciones in zip(tramos, sesiones)
+    ], dtype=bool)
@@ -0,0 +1,52 @@
+"""Tablas de horario (por curso, por profesor y por aula) a partir de la matriz de asignación."""
+
+import numpy as np
+import pandas as pd
+
+RECREO = "🔔 RECREO"
+
+
+def tabla_larga(df, asignacion, dias, franjas_por_dia):
+    """Una fila por clase asignada: ``Fila, Profesor, Asignatura, Curso, [Aula,] Dia, Franja, Indice_franja``."""
+    filas, franjas = np.nonzero(asignacion)
+    n = len(franjas_por_dia)
+    columnas = ["Profesor", "Asignatura", "Curso"] + (["Aula"] if "Aula" in df.columns else [])
+    larga = df.iloc[filas][columnas].reset_index(drop=True)
+    larga.insert(0, "Fila", filas)
+    larga["Dia"] = np.asarray(dias)[franjas // n]
+    larga["Franja"] = np.asarray(franjas_por_dia)[franjas % n]
+    larga["Indice_franja"] = franjas
+    return larga
+
+
+def rejillas(larga, por, detalle, valores, dias, franjas_por_dia, franjas_recreo, separador="\n"):
+    """Rejilla franja × día para cada valor de ``por`` (``"Curso"``, ``"Profesor"`` o ``"Aula"``).
+
+    Cada celda contiene ``"Asignatura (detalle)"`` de las clases de esa franja
+    unidas con ``separador``. Todas las rejillas salen de un único groupby.
+    Devuelve ``{valor: DataFrame}`` en el orden de ``valores``.
+    """
+    etiquetas = larga["Asignatura"].astype(str) + " (" + larga[detalle].astype(str) + ")"
+    celdas = (
+        etiquetas.groupby([larga[por].astype(str), larga["Franja"], larga["Dia"]], sort=False)
+        .agg(separador.join)
+        .unstack("Dia")
+    )
+
+    n = len(franjas_por_dia)
+    recreo = [(franjas_por_dia[f % n], dias[f // n]) for f in franjas_recreo]
+    bloques = {valor: bloque.droplevel(0) for valor, bloque in celdas.groupby(level=0, sort=False)}
+    indice = pd.Index(franjas_por_dia, name="Franja")
+
+    resultado = {}
+    for valor in valores:
+        bloque = bloques.get(valor)
+        if bloque is None:
+            tabla = pd.DataFrame("", index=indice, columns=dias)
+        else:
+            tabla = bloque.reindex(index=indice, columns=dias).fillna("")
+            tabla.columns.name = None
+        for franja, dia in recreo:
+            tabla.at[franja, dia] = RECREO
+        resultado[valor] = tabla
+    return resultado
@@ -0,0 +1,133 @@
+"""Cola de resoluciones en segundo plano, compartida por todas las sesiones del servidor.
+
+Cada resolución se envía como un ``Trabajo`` con un identificador propio y
+se ejecuta en un ``ThreadPoolExecutor`` con un máximo de resoluciones a la vez
+(``HORARIOS_MAX_RESOLUCIONES``, 2 por defecto); el resto espera en cola. La
+interfaz solo consulta el estado del trabajo, así que puede volver a
+ejecutarse, recargarse o abrirse en otra pestaña sin interrumpir la búsqueda,
+y el resultado sigue disponible durante ``RETENCION`` segundos.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_RESOLUCIONES = int(os.environ.get("HORARIOS_MAX_RESOLUCIONES", 2))
+# Segundos que se conserva un trabajo terminado
+RETENCION = 3600.0
+
+ESTADOS_FINALES = ("terminado", "cancelado", "error")
+
+
+class Trabajo:
+    """Una resolución enviada a la cola.
+
+    ``estado`` pasa de ``en_cola`` a ``en_curso`` y termina en ``terminado``,
+    ``cancelado`` o ``error``. Mientras se busca, ``ejecucion`` es la
+    ``ResolucionEnCurso`` (o por componentes) para consultar el progreso;
+    al terminar queda ``resultado``. ``datos`` guarda lo que la interfaz
+    necesite para recuperar el trabajo tras una recarga.
+    """
+
+    def __init__(self, id_, descripcion="", datos=None):
+        self.id = id_
+        self.descripcion = descripcion
+        self.datos = datos or {}
+        self.estado = "en_cola"
+        self.creado = time.time()
+        self.inicio = None
+        self.fin = None
+        self.ejecucion = None
+        self.resultado = None
+        self.error = None
+        self._cancelado = threading.Event()
+        self._futuro = None
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_FINALES
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    def asignar_ejecucion(self, ejecucion):
+        """Registra la búsqueda en marcha; si ya se pidió cancelar, la detiene en el acto."""
+        self.ejecucion = ejecucion
+        if self.cancelado:
+            ejecucion.detener()
+
+    def cancelar(self):
+        """Un trabajo en cola no llega a empezar; uno en curso conserva la mejor solución encontrada."""
+        self._cancelado.set()
+        if self._futuro is not None and self._futuro.cancel():
+            self.estado = "cancelado"
+            self.fin = time.time()
+        elif self.ejecucion is not None:
+            self.ejecucion.detener()
+
+
+class ColaTrabajos:
+    """Ejecuta como mucho ``max_simultaneos`` trabajos a la vez; los demás esperan su turno."""
+
+    def __init__(self, max_simultaneos=MAX_RESOLUCIONES, retencion=RETENCION):
+        self.max_simultaneos = max(1, max_simultaneos)
+        self.retencion = retencion
+        self._pool = ThreadPoolExecutor(self.max_simultaneos, thread_name_prefix="resolucion")
+        self._trabajos = {}
+        self._bloqueo = threading.Lock()
+
+    @property
+    def hilos_por_resolucion(self):
+        """Núcleos para cada búsqueda, para que las resoluciones simultáneas no se los disputen."""
+        return max(1, (os.cpu_count() or 1) // self.max_simultaneos)
+
+    def enviar(self, funcion, *args, descripcion="", datos=None, **kwargs):
+        """Encola ``funcion(trabajo, *args, **kwargs)``; su valor de retorno será ``trabajo.resultado``."""
+        self._purgar()
+        trabajo = Trabajo(uuid.uuid4().hex[:12], descripcion, datos)
+        with self._bloqueo:
+            self._trabajos[trabajo.id] = trabajo
+        trabajo._futuro = self._pool.submit(self._ejecutar, trabajo, funcion, args, kwargs)
+        return trabajo
+
+    def _ejecutar(self, trabajo, funcion, args, kwargs):
+        if trabajo.cancelado:
+            trabajo.estado = "cancelado"
+            trabajo.fin = time.time()
+            return
+        trabajo.estado = "en_curso"
+        trabajo.inicio = time.time()
+        try:
+            trabajo.resultado = funcion(trabajo, *args, **kwargs)
+            trabajo.estado = "terminado"
+        except Exception as error:
+            trabajo.error = str(error)
+            trabajo.estado = "error"
+        finally:
+            # El resultado ya está materializado: se liberan el modelo y el solver
+            trabajo.ejecucion = None
+            trabajo.fin = time.time()
+
+    def obtener(self, id_):
+        with self._bloqueo:
+            return self._trabajos.get(id_)
+
+    def posicion(self, trabajo):
+        """Trabajos en cola enviados antes que ``trabajo``."""
+        with self._bloqueo:
+            return sum(
+                1 for otro in self._trabajos.values() if otro.estado == "en_cola" and otro.creado < trabajo.creado
+            )
+
+    def en_curso(self):
+        with self._bloqueo:
+            return sum(1 for trabajo in self._trabajos.values() if trabajo.estado == "en_curso")
+
+    def _purgar(self):
+        limite = time.time() - self.retencion
+        with self._bloqueo:
+            for id_ in [id_ for id_, t in self._trabajos.items() if t.terminado and t.fin < limite]:
+                del self._trabajos[id_]
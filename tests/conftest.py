@@ -0,0 +1,32 @@
+"""Utilidades comunes de las pruebas: tablas pequeñas normalizadas como las del Excel."""
+
+import io
+
+import pytest
+
+from horarios.datos import cargar_datos
+from horarios.reglas import compilar_reglas
+from horarios.rejilla import REJILLA_POR_DEFECTO
+
+
+def tabla(filas, franjas_por_hora=REJILLA_POR_DEFECTO.franjas_por_hora):
+    """Tabla normalizada a partir de tuplas ``(profesor, asignatura, curso, horas[, aula])``."""
+    cabecera = "Profesor,Asignatura,Curso,Horas por semana"
+    if any(len(fila) > 4 for fila in filas):
+        cabecera += ",Aula"
+    lineas = [cabecera] + [",".join(str(valor) for valor in fila) for fila in filas]
+    return cargar_datos(io.StringIO("\n".join(lineas) + "\n"), "datos.csv", franjas_por_hora=franjas_por_hora)
+
+
+def compilar(reglas, df, rejilla, flexibilidad="Moderado", pesos=None):
+    """``compilar_reglas`` con todas las reglas activas."""
+    activas = {regla["id"]: True for regla in reglas}
+    return compilar_reglas(
+        reglas, df, rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo, activas, flexibilidad,
+        pesos=pesos,
+    )
+
+
+@pytest.fixture
+def rejilla():
+    return REJILLA_POR_DEFECTO
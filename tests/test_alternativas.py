@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+import pytest
+
+cp_model = pytest.importorskip("ortools.sat.python.cp_model")
+
+from conftest import compilar, tabla
+from horarios.alternativas import ResolucionAlternativas, anadir_diversidad, franjas_distintas
+from horarios.modelo import construir_modelo
+from horarios.resolucion import extraer_asignacion
+
+
+@pytest.fixture
+def modelo(rejilla):
+    df = tabla([
+        ("Ana", "Lengua", "1ºA", 3),
+        ("Ana", "Lengua", "1ºB", 3),
+        ("Luis", "Inglés", "1ºA", 2),
+        ("Luis", "Inglés", "1ºB", 2),
+    ])
+    model, variables, _ = construir_modelo(df, rejilla.dias, rejilla.franjas_por_dia, compilar([], df, rejilla))
+    return model, variables, (len(df), rejilla.franjas_totales)
+
+
+def resolver(model, variables, forma):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 10
+    solver.parameters.num_workers = 1
+    estado = solver.Solve(model)
+    assert estado in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return extraer_asignacion(solver, variables, *forma)
+
+
+def test_franjas_distintas():
+    a = np.array([[1, 1, 0, 0]])
+    b = np.array([[0, 1, 1, 0]])
+    assert franjas_distintas(a, a) == 0
+    assert franjas_distintas(a, b) == franjas_distintas(b, a) == 1
+
+
+@pytest.mark.parametrize("diferencia", [1, 5, 20])
+def test_diversidad_obliga_a_mover_franjas(modelo, diferencia):
+    model, variables, forma = modelo
+    primera = resolver(model, variables, forma)
+    anadir_diversidad(model, variables, primera, diferencia)
+    segunda = resolver(model, variables, forma)
+    assert franjas_distintas(primera, segunda) >= diferencia
+    # Las horas de cada fila no cambian
+    assert (segunda.sum(axis=1) == primera.sum(axis=1)).all()
+
+
+def test_diversidad_imposible(modelo):
+    model, variables, forma = modelo
+    primera = resolver(model, variables, forma)
+    anadir_diversidad(model, variables, primera, int(primera.sum()) + 1)
+    assert cp_model.CpSolver().Solve(model) == cp_model.INFEASIBLE
+
+
+def test_alternativas_distintas_entre_si(modelo):
+    model, variables, forma = modelo
+    resolucion = ResolucionAlternativas(model, variables, forma, "Flexible", 3, semilla=1, num_workers=1,
+                                        diferencia=0.25, sin_mejora=1)
+    resolucion.esperar()
+    assert resolucion.alternativas == 3
+    franjas = int(resolucion.asignacion.sum())
+    minimo = math.ceil(0.25 * franjas)
+    for n, actual in enumerate(resolucion.asignaciones):
+        for anterior in resolucion.asignaciones[:n]:
+            assert franjas_distintas(anterior, actual) >= minimo
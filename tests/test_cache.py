@@ -0,0 +1,66 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from conftest import tabla
+from horarios import cache as modulo_cache
+from horarios.cache import CacheSoluciones, clave_solucion
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Cada llamada a ``time.time`` avanza un segundo: el orden de acceso no depende de la máquina."""
+    segundos = itertools.count(1)
+    monkeypatch.setattr(modulo_cache.time, "time", lambda: next(segundos))
+
+
+def asignacion(valor):
+    return np.full((2, 50), valor % 2, dtype=np.uint8)
+
+
+def test_guardar_y_obtener(tmp_path):
+    cache = CacheSoluciones(tmp_path)
+    horario = np.eye(3, 50, dtype=np.uint8)
+    cache.guardar("a", "OPTIMAL", horario, {"variables": 7})
+    resultado = cache.obtener("a")
+    assert resultado["status"] == "OPTIMAL"
+    assert np.array_equal(resultado["asignacion"], horario)
+    assert resultado["estadisticas"] == {"variables": 7}
+    assert cache.obtener("b") is None
+
+
+def test_no_guarda_estados_que_dependen_del_tiempo(tmp_path):
+    cache = CacheSoluciones(tmp_path)
+    cache.guardar("a", "UNKNOWN")
+    assert cache.obtener("a") is None
+
+
+def test_expulsa_la_menos_usada_al_llenarse(tmp_path, reloj):
+    cache = CacheSoluciones(tmp_path, max_entradas=3)
+    for clave in "abc":
+        cache.guardar(clave, "OPTIMAL", asignacion(ord(clave)))
+    # Leer "a" la convierte en la más reciente: la menos usada pasa a ser "b"
+    assert cache.obtener("a") is not None
+    cache.guardar("d", "OPTIMAL", asignacion(0))
+    assert cache.obtener("b") is None
+    assert all(cache.obtener(clave) is not None for clave in "acd")
+
+
+def test_expulsa_por_tamano(tmp_path, reloj):
+    cache = CacheSoluciones(tmp_path)
+    cache.guardar("a", "OPTIMAL", asignacion(0))
+    cache.guardar("b", "OPTIMAL", asignacion(1))
+    # Límite de bytes para una sola entrada: la nueva desplaza a las anteriores
+    cache.max_bytes = len(modulo_cache._comprimir(asignacion(0))) + len("{}")
+    cache.guardar("c", "OPTIMAL", asignacion(0))
+    assert cache.obtener("a") is None and cache.obtener("b") is None
+    assert cache.obtener("c") is not None
+
+
+def test_clave_depende_de_datos_y_configuracion():
+    df = tabla([("Ana", "Lengua", "1ºA", 2)])
+    otra = tabla([("Ana", "Lengua", "1ºA", 2.5)])
+    assert clave_solucion(df, flexibilidad="Moderado") == clave_solucion(df, flexibilidad="Moderado")
+    assert clave_solucion(df, flexibilidad="Moderado") != clave_solucion(df, flexibilidad="Flexible")
+    assert clave_solucion(df, flexibilidad="Moderado") != clave_solucion(otra, flexibilidad="Moderado")
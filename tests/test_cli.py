@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from horarios.cli import main, nombres_salida
+
+FILAS = {
+    "Profesor": ["Ana", "Luis"],
+    "Asignatura": ["Lengua", "Inglés"],
+    "Curso": ["1ºA", "1ºA"],
+    "Horas por semana": [2, 1],
+}
+
+
+def test_nombres_salida_sin_coincidencias():
+    entradas = [Path("datos_2025.xlsx"), Path("otros/datos_2026.csv")]
+    assert nombres_salida(entradas) == {entradas[0]: "datos_2025", entradas[1]: "datos_2026"}
+
+
+def test_nombres_salida_con_el_mismo_nombre(tmp_path):
+    por_extension = [tmp_path / "p.xlsx", tmp_path / "p.csv"]
+    assert list(nombres_salida(por_extension).values()) == ["p_xlsx", "p_csv"]
+    por_carpeta = [tmp_path / "campusA" / "datos.xlsx", tmp_path / "campusB" / "datos.xlsx"]
+    assert list(nombres_salida(por_carpeta).values()) == ["campusA_datos", "campusB_datos"]
+
+
+def test_nombres_salida_archivo_repetido():
+    with pytest.raises(ValueError, match="mismo archivo: p"):
+        nombres_salida([Path("p.xlsx"), Path("p.xlsx")])
+
+
+def test_entradas_con_el_mismo_nombre_no_se_sobrescriben(tmp_path, capsys):
+    datos = pd.DataFrame(FILAS)
+    datos.to_excel(tmp_path / "p.xlsx", index=False)
+    datos.to_csv(tmp_path / "p.csv", index=False)
+    salida = tmp_path / "salida"
+    resumen = tmp_path / "resumen.json"
+    codigo = main([str(tmp_path / "p.xlsx"), str(tmp_path / "p.csv"), "-o", str(salida), "--sin-cache",
+                   "--sin-sesiones", "--motor-excel", "openpyxl", "--resumen", str(resumen)])
+    assert codigo == 0
+    assert sorted(ruta.name for ruta in salida.iterdir()) == ["p_csv_moderado.xlsx", "p_xlsx_moderado.xlsx"]
+    escritos = {Path(r["entrada"]).suffix: Path(r["salida"]).name for r in json.loads(resumen.read_text("utf-8"))}
+    assert escritos == {".xlsx": "p_xlsx_moderado.xlsx", ".csv": "p_csv_moderado.xlsx"}
+
+
+def test_archivo_repetido_falla_antes_de_resolver(tmp_path, capsys):
+    pd.DataFrame(FILAS).to_csv(tmp_path / "p.csv", index=False)
+    salida = tmp_path / "salida"
+    assert main([str(tmp_path / "p.csv"), str(tmp_path / "p.csv"), "-o", str(salida)]) == 2
+    assert "mismo archivo" in capsys.readouterr().err
+    assert not salida.exists()
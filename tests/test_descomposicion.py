@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+cp_model = pytest.importorskip("ortools.sat.python.cp_model")
+
+from conftest import compilar, tabla
+from horarios.calidad import evaluar_calidad
+from horarios.descomposicion import ResolucionPorComponentes, combinar_estados, etiquetar_componentes
+from horarios.modelo import construir_modelo
+from horarios.resolucion import extraer_asignacion
+
+# Dos componentes: Ana y Luis con 1ºA y 1ºB; Marta y Pedro con 2ºA
+FILAS = [
+    ("Ana", "Lengua", "1ºA", 2),
+    ("Marta", "Matemáticas", "2ºA", 3),
+    ("Luis", "Inglés", "1ºB", 1.5),
+    ("Ana", "Lengua", "1ºB", 2),
+    ("Pedro", "Ciencias", "2ºA", 2),
+]
+
+
+def particion(etiquetas):
+    """Grupos de filas con la misma etiqueta, sin depender de la numeración."""
+    return sorted(np.flatnonzero(etiquetas == etiqueta).tolist() for etiqueta in np.unique(etiquetas))
+
+
+def test_componentes_por_profesor_y_curso(rejilla):
+    df = tabla(FILAS)
+    assert particion(etiquetar_componentes(df, compilar([], df, rejilla))) == [[0, 2, 3], [1, 4]]
+
+
+@pytest.mark.parametrize("regla", [
+    {"id": "r", "tipo": "exclusion", "filas": {"profesor": "Ana"}, "con": {"profesor": "Pedro"}},
+    {"id": "r", "tipo": "minimo_diario", "filas": {"asignatura": ["Inglés", "Ciencias"]}, "minimo": 1},
+])
+def test_reglas_que_unen_componentes(rejilla, regla):
+    df = tabla(FILAS)
+    assert etiquetar_componentes(df, compilar([regla], df, rejilla)).tolist() == [0] * len(df)
+
+
+def test_aula_compartida_une_componentes(rejilla):
+    df = tabla([fila + ("Laboratorio" if fila[0] in ("Luis", "Pedro") else "",) for fila in FILAS])
+    assert etiquetar_componentes(df, compilar([], df, rejilla)).tolist() == [0] * len(df)
+
+
+def test_combinar_estados():
+    assert combinar_estados(["OPTIMAL", "OPTIMAL"]) == "OPTIMAL"
+    assert combinar_estados(["OPTIMAL", "FEASIBLE"]) == "FEASIBLE"
+    assert combinar_estados(["OPTIMAL", "UNKNOWN"]) == "UNKNOWN"
+    assert combinar_estados(["UNKNOWN", "INFEASIBLE", "MODEL_INVALID"]) == "INFEASIBLE"
+
+
+def test_por_componentes_igual_que_de_una_vez(rejilla):
+    df = tabla(FILAS)
+    reglas = compilar([], df, rejilla)
+    franjas_dia = len(rejilla.franjas_por_dia)
+
+    model, variables, _ = construir_modelo(df, rejilla.dias, rejilla.franjas_por_dia, reglas)
+    solver = cp_model.CpSolver()
+    assert solver.Solve(model) == cp_model.OPTIMAL
+    unica = extraer_asignacion(solver, variables, len(df), rejilla.franjas_totales)
+
+    resolucion = ResolucionPorComponentes(
+        df, rejilla.dias, rejilla.franjas_por_dia, reglas, "Flexible", semilla=1, max_procesos=2,
+    )
+    assert resolucion.esperar(timeout=120)
+    assert (resolucion.componentes, resolucion.estado) == (2, "OPTIMAL")
+    combinada = resolucion.asignacion
+    assert combinada.shape == unica.shape and combinada.dtype == unica.dtype
+    # Cada fila vuelve a su posición con sus franjas, sin choques de profesor ni de curso
+    assert combinada.sum(axis=1).tolist() == df["Franjas_necesarias"].tolist()
+    for columna in ("Profesor", "Curso"):
+        for _, filas in df.groupby(columna, observed=True).indices.items():
+            assert combinada[filas].sum(axis=0).max() <= 1
+    # Las componentes no comparten términos: la suma de los óptimos es el óptimo conjunto
+    penalizacion = sum(t["penalizacion"] for t in evaluar_calidad(combinada, df, franjas_dia, reglas).values())
+    assert penalizacion == solver.ObjectiveValue()
+
+
+def test_componente_imposible(rejilla):
+    df = tabla(FILAS)
+    # Marta y Pedro solo pueden el lunes de 9:00 a 10:00: 2ºA no cabe
+    reglas = compilar([{"id": "r", "tipo": "disponibilidad", "filas": {"curso": "2ºA"}, "dias": ["Lunes"],
+                        "desde": "09:00", "hasta": "10:00"}], df, rejilla)
+    resolucion = ResolucionPorComponentes(df, rejilla.dias, rejilla.franjas_por_dia, reglas, "Flexible",
+                                          max_procesos=2)
+    assert resolucion.esperar(timeout=120)
+    assert resolucion.estado == "INFEASIBLE" and resolucion.asignacion is None
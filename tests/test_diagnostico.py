@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from conftest import compilar, tabla
+from horarios.diagnostico import _hall, comprobar_viabilidad, diagnosticar
+from horarios.rejilla import Rejilla
+
+
+def comprobar(df, rejilla, reglas=(), duraciones=None):
+    compiladas = compilar(list(reglas), df, rejilla)
+    return comprobar_viabilidad(df, compiladas, rejilla.dias, rejilla.franjas_por_dia, duraciones=duraciones)
+
+
+def test_carga_viable_sin_problemas(rejilla):
+    df = tabla([("Ana", "Lengua", "1ºA", 4), ("Luis", "Inglés", "1ºA", 3)])
+    assert comprobar(df, rejilla) == []
+
+
+def test_profesor_con_mas_clases_que_franjas(rejilla):
+    # 24 horas = 48 franjas de media hora; la semana solo tiene 45 útiles
+    df = tabla([("Ana", "Lengua", curso, 8) for curso in ("1ºA", "1ºB", "1ºC")])
+    [problema] = comprobar(df, rejilla)
+    assert (problema["tipo"], problema["nombre"]) == ("profesor", "Ana")
+    assert (problema["franjas"], problema["disponibles"], problema["deficit"]) == (48, 45, 3)
+
+
+def test_fila_que_no_cabe_en_su_ventana(rejilla):
+    df = tabla([("Ana", "Lengua", "1ºA", 2)])
+    reglas = [{"id": "ana", "tipo": "disponibilidad", "filas": {"profesor": "Ana"},
+               "dias": ["Lunes"], "desde": "09:00", "hasta": "10:00"}]
+    problemas = comprobar(df, rejilla, reglas)
+    assert {(p["tipo"], p["franjas"], p["disponibles"]) for p in problemas} >= {("fila", 4, 2)}
+
+
+def test_hall_con_ventanas_anidadas(rejilla):
+    # Cada fila cabe por separado y el total del profesor también, pero las dos
+    # filas comparten las mismas dos franjas del lunes y necesitan cuatro
+    df = tabla([
+        ("Ana", "Lengua", "1ºA", 1),
+        ("Ana", "Lengua", "1ºB", 1),
+        ("Ana", "Lengua", "1ºC", 4),
+    ])
+    reglas = [{"id": "lunes", "tipo": "disponibilidad", "filas": {"curso": ["1ºA", "1ºB"]},
+               "dias": ["Lunes"], "desde": "09:00", "hasta": "10:00"}]
+    [problema] = comprobar(df, rejilla, reglas)
+    assert (problema["tipo"], problema["nombre"]) == ("profesor", "Ana")
+    assert (problema["franjas"], problema["disponibles"]) == (4, 2)
+    assert problema["detalle"].startswith("2 clases")
+
+
+def test_hall_directo():
+    permitidas = np.array([
+        [1, 1, 0, 0],
+        [1, 1, 0, 0],
+        [1, 1, 1, 1],
+    ], dtype=bool)
+    assert _hall(permitidas, np.array([1, 1, 2])) is None
+    assert _hall(permitidas, np.array([2, 1, 1])) == (3, 2, 2)
+    # En un aula con dos plazas por franja el mismo reparto cabe
+    assert _hall(permitidas, np.array([2, 1, 1]), capacidad=2) is None
+
+
+def test_minimo_diario_sin_horas_suficientes(rejilla):
+    df = tabla([("Luis", "Inglés", "1ºA", 2)])
+    reglas = [{"id": "ingles_diario", "tipo": "minimo_diario", "filas": {"asignatura": "Inglés"}, "minimo": 1}]
+    [problema] = comprobar(df, rejilla, reglas)
+    assert (problema["tipo"], problema["nombre"], problema["deficit"]) == ("regla", "ingles_diario", 1)
+
+
+def test_sesiones_en_dias_distintos(rejilla):
+    # Tres sesiones de una hora con sitio solo el lunes y el martes
+    df = tabla([("Ana", "Lengua", "1ºA", 3)])
+    reglas = [{"id": "ana", "tipo": "disponibilidad", "filas": {"profesor": "Ana"}, "dias": ["Lunes", "Martes"]}]
+    assert comprobar(df, rejilla, reglas) == []
+    problemas = comprobar(df, rejilla, reglas, duraciones=(2,))
+    assert [(p["tipo"], p["deficit"]) for p in problemas] == [("fila", 1)]
+
+
+def test_aula_sin_columna_de_capacidad():
+    df = tabla([("Ana", "Ciencias", "1ºA", 1, "Laboratorio"), ("Ana", "Lengua", "1ºA", 2, "")])
+    assert df["Capacidad aula"].tolist() == [1, 1]
+
+
+def test_ocupacion_de_aula_sobre_la_jornada_de_sus_cursos(rejilla):
+    df = tabla([
+        ("Ana", "Ciencias", "1ºA", 1, "Laboratorio"),
+        ("Luis", "Ciencias", "1ºB", 1, "Laboratorio"),
+        ("Ana", "Lengua", "1ºC", 2, ""),
+    ])
+    con_jornadas = Rejilla(jornadas=(
+        {"cursos": ["1ºA"], "dias": ["Lunes"]},
+        {"cursos": ["1ºB"], "dias": ["Martes"]},
+    ))
+    # 4 franjas en las 9 + 9 del lunes y el martes, no en las 45 de la semana
+    assert diagnosticar(df, con_jornadas)["ocupacion_aulas"]["Laboratorio"] == pytest.approx(100 * 4 / 18)
+    assert diagnosticar(df, rejilla)["ocupacion_aulas"]["Laboratorio"] == pytest.approx(100 * 4 / 45)
@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip("ortools")
+
+from conftest import compilar, tabla
+from horarios.explicacion import _modelo_con_literales, _resolver_con, explicar_inviabilidad
+from horarios.indices import construir_indices
+
+
+@pytest.fixture
+def df():
+    return tabla([
+        ("Ana", "Lengua", "1ºA", 3),
+        ("Ana", "Lengua", "1ºB", 3),
+        ("Luis", "Inglés", "1ºA", 2.5),
+        ("Luis", "Inglés", "1ºB", 2.5),
+    ])
+
+
+def explicar(df, rejilla, reglas):
+    compiladas = compilar(reglas, df, rejilla)
+    return explicar_inviabilidad(
+        df, rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo, compiladas, tiempo_maximo=20,
+    )
+
+
+def test_nucleo_minimo(df, rejilla):
+    # Inglés todos los días y Luis solo lunes y martes: imposible sin que falten franjas
+    reglas = [
+        {"id": "ingles_diario", "tipo": "minimo_diario", "filas": {"asignatura": "Inglés"}, "minimo": 1},
+        {"id": "luis_lunes_martes", "tipo": "disponibilidad", "filas": {"profesor": "Luis"},
+         "dias": ["Lunes", "Martes"]},
+        {"id": "ana_mananas", "tipo": "prohibido", "filas": {"profesor": "Ana"}, "desde": "13:00", "hasta": "14:00"},
+    ]
+    resultado = explicar(df, rejilla, reglas)
+    assert resultado["estado"] == "INFEASIBLE" and resultado["minimo"]
+    assert {(g["tipo"], g["nombre"]) for g in resultado["grupos"]} == {
+        ("regla", "ingles_diario"), ("regla", "luis_lunes_martes"),
+    }
+
+    # Mínimo de verdad: sin cualquiera de sus grupos el resto tiene solución
+    compiladas = compilar(reglas, df, rejilla)
+    model, grupos = _modelo_con_literales(
+        df, rejilla.dias, rejilla.franjas_por_dia, rejilla.franjas_recreo, compiladas, construir_indices(df),
+    )
+    nucleo = [i for i, (tipo, nombre, _, _) in grupos.items()
+              if (tipo, nombre) in {(g["tipo"], g["nombre"]) for g in resultado["grupos"]}]
+    assert _resolver_con(model, grupos, list(grupos), 10)[0] == "INFEASIBLE"
+    assert _resolver_con(model, grupos, nucleo, 10)[0] == "INFEASIBLE"
+    for quitado in nucleo:
+        resto = [i for i in nucleo if i != quitado]
+        assert _resolver_con(model, grupos, resto, 10)[0] in ("OPTIMAL", "FEASIBLE")
+
+
+def test_conflicto_de_capacidad_con_sus_reglas(df, rejilla):
+    # Ana necesita 12 franjas y las reglas solo le dejan el lunes (9)
+    reglas = [
+        {"id": "ana_lunes", "tipo": "disponibilidad", "filas": {"profesor": "Ana"}, "dias": ["Lunes"]},
+        {"id": "luis_lunes", "tipo": "disponibilidad", "filas": {"profesor": "Luis"}, "dias": ["Lunes", "Martes"]},
+    ]
+    resultado = explicar(df, rejilla, reglas)
+    assert resultado["estado"] == "INFEASIBLE"
+    assert resultado["grupos"] == [
+        {"tipo": "regla", "nombre": "ana_lunes"},
+        {"tipo": "profesor", "nombre": "Ana", "franjas": 12, "disponibles": 9},
+    ]
+
+
+def test_horario_posible(df, rejilla):
+    assert explicar(df, rejilla, [])["estado"] in ("OPTIMAL", "FEASIBLE")
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+cp_model = pytest.importorskip("ortools.sat.python.cp_model")
+
+from conftest import compilar, tabla
+from horarios.calidad import PESO_CAMBIO, evaluar_calidad
+from horarios.incremental import alinear_asignacion, emparejar_filas, filas_afectadas, preparar_incremental
+from horarios.modelo import construir_modelo
+from horarios.resolucion import extraer_asignacion
+
+# Dos grupos sin profesores ni cursos en común: 1ºA/1ºB y 2ºA
+FILAS = [
+    ("Ana", "Lengua", "1ºA", 2),
+    ("Ana", "Lengua", "1ºB", 2),
+    ("Luis", "Inglés", "1ºA", 1.5),
+    ("Luis", "Inglés", "1ºB", 1.5),
+    ("Marta", "Matemáticas", "2ºA", 3),
+    ("Pedro", "Ciencias", "2ºA", 2),
+]
+
+
+def resolver(model, variables, forma):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 30
+    assert solver.Solve(model) == cp_model.OPTIMAL
+    return solver, extraer_asignacion(solver, variables, *forma)
+
+
+def reoptimizar(df_anterior, asignacion_anterior, df, rejilla, reglas=(), fijar=True):
+    compiladas = compilar(list(reglas), df, rejilla)
+    previa, emparejadas, anterior_de = alinear_asignacion(df_anterior, asignacion_anterior, df)
+    afectadas = filas_afectadas(df_anterior, df, previa, emparejadas, anterior_de, compiladas.permitidas)
+    model, variables, objetivo = construir_modelo(df, rejilla.dias, rejilla.franjas_por_dia, compiladas)
+    fijadas = preparar_incremental(model, variables, previa, afectadas, fijar, objetivo)
+    solver, asignacion = resolver(model, variables, (len(df), rejilla.franjas_totales))
+    desglose = evaluar_calidad(asignacion, df, len(rejilla.franjas_por_dia), compiladas, previa=previa)
+    return asignacion, previa, afectadas, fijadas, solver, desglose
+
+
+@pytest.fixture
+def anterior(rejilla):
+    df = tabla(FILAS)
+    model, variables, _ = construir_modelo(df, rejilla.dias, rejilla.franjas_por_dia, compilar([], df, rejilla))
+    return df, resolver(model, variables, (len(df), rejilla.franjas_totales))[1]
+
+
+def test_emparejar_filas():
+    antes = tabla([("Ana", "Lengua", "1ºA", 2), ("Luis", "Inglés", "1ºA", 1), ("Ana", "Lengua", "1ºA", 1)])
+    despues = tabla([("Luis", "Inglés", "1ºA", 1), ("Ana", "Lengua", "1ºA", 2), ("Marta", "Música", "1ºA", 1),
+                     ("Ana", "Lengua", "1ºA", 2)])
+    # Las filas repetidas se emparejan por orden de aparición
+    assert emparejar_filas(antes, despues).tolist() == [1, 0, -1, 2]
+
+
+def test_filas_fijadas_no_cambian(anterior, rejilla):
+    df_anterior, asignacion_anterior = anterior
+    # Luis gana media hora en 1ºB: se recolocan sus filas y las de 1ºB; Ana en 1ºA y 2ºA quedan fijas
+    df = tabla([fila if fila[:3] != ("Luis", "Inglés", "1ºB") else fila[:3] + (2,) for fila in FILAS])
+    asignacion, previa, afectadas, fijadas, solver, desglose = reoptimizar(
+        df_anterior, asignacion_anterior, df, rejilla,
+    )
+    assert afectadas.tolist() == [False, True, True, True, False, False]
+    assert fijadas == 3
+    assert np.array_equal(asignacion[~afectadas], asignacion_anterior[~afectadas])
+    assert asignacion[3].sum() == 4
+    assert solver.ObjectiveValue() == sum(termino["penalizacion"] for termino in desglose.values())
+
+
+def test_cambios_cuentan_franjas_movidas(anterior, rejilla):
+    df_anterior, asignacion_anterior = anterior
+    df = tabla(FILAS)
+    # Ana deja de poder dar clase en las franjas que ocupaba en 1ºA: todas tienen que moverse
+    ocupadas = np.flatnonzero(asignacion_anterior[0])
+    reglas = [
+        {"id": f"ana_{f}", "tipo": "prohibido", "filas": {"profesor": "Ana", "curso": ["1ºA"]},
+         "dias": [rejilla.dias[f // len(rejilla.franjas_por_dia)]],
+         "desde": rejilla.franjas_por_dia[f % len(rejilla.franjas_por_dia)][:5],
+         "hasta": rejilla.franjas_por_dia[f % len(rejilla.franjas_por_dia)][6:]}
+        for f in ocupadas
+    ]
+    asignacion, previa, afectadas, _, solver, desglose = reoptimizar(
+        df_anterior, asignacion_anterior, df, rejilla, reglas, fijar=False,
+    )
+    movidas = int((previa.astype(bool) & ~asignacion.astype(bool)).sum())
+    assert movidas >= len(ocupadas) and not asignacion[0, ocupadas].any()
+    assert desglose["cambios"] == {"cantidad": movidas, "peso": PESO_CAMBIO, "penalizacion": movidas * PESO_CAMBIO}
+    # Las franjas que ya no están permitidas cuentan también en el objetivo del modelo
+    assert solver.ObjectiveValue() == sum(termino["penalizacion"] for termino in desglose.values())
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+cp_model = pytest.importorskip("ortools.sat.python.cp_model")
+
+from conftest import compilar, tabla
+from horarios.calidad import evaluar_calidad
+from horarios.incremental import preparar_incremental
+from horarios.modelo import construir_modelo
+from horarios.rejilla import rejilla_desde_datos
+from horarios.resolucion import configurar_solver, extraer_asignacion
+
+FILAS = [
+    ("Ana", "Lengua", "1ºA", 3),
+    ("Ana", "Lengua", "1ºB", 2.5),
+    ("Luis", "Inglés", "1ºA", 2),
+    ("Luis", "Inglés", "1ºB", 1.5),
+    ("Marta", "Matemáticas", "1ºA", 2),
+]
+# Reglas obligatorias que fuerzan huecos (Luis), una franja suelta y un día cargado (Marta)
+# y dos reglas blandas que no pueden cumplirse del todo
+REGLAS = [
+    {"id": "ana", "tipo": "disponibilidad", "filas": {"profesor": "Ana"},
+     "dias": ["Lunes", "Martes"], "desde": "09:00", "hasta": "11:00"},
+    {"id": "ingles_diario", "tipo": "minimo_diario", "filas": {"asignatura": "Inglés"}, "minimo": 1},
+    {"id": "luis", "tipo": "disponibilidad", "filas": {"profesor": "Luis"}, "dias": ["Miércoles", "Jueves"]},
+    {"id": "luis_1a", "tipo": "disponibilidad", "filas": {"profesor": "Luis", "curso": "1ºA"},
+     "desde": "09:00", "hasta": "10:30"},
+    {"id": "luis_1b", "tipo": "disponibilidad", "filas": {"profesor": "Luis", "curso": "1ºB"},
+     "desde": "13:00", "hasta": "14:00"},
+    {"id": "marta", "tipo": "disponibilidad", "filas": {"profesor": "Marta"}, "dias": ["Viernes"]},
+    {"id": "marta_recreo", "tipo": "prohibido", "filas": {"profesor": "Marta"}, "desde": "10:00", "hasta": "11:30"},
+]
+PESOS_REGLAS = {"ana": 3, "ingles_diario": 2}
+
+
+def resolver(model, variables, forma):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 30
+    estado = solver.Solve(model)
+    # Solo en el óptimo las variables auxiliares de cada término valen exactamente lo que cuentan
+    assert estado == cp_model.OPTIMAL
+    return solver, extraer_asignacion(solver, variables, *forma)
+
+
+def total(desglose):
+    return sum(termino["penalizacion"] for termino in desglose.values())
+
+
+def test_objetivo_igual_a_evaluar_calidad(rejilla):
+    df = tabla(FILAS)
+    reglas = compilar(REGLAS, df, rejilla, pesos=PESOS_REGLAS)
+    model, variables, _ = construir_modelo(df, rejilla.dias, rejilla.franjas_por_dia, reglas, rejilla=rejilla)
+    solver, asignacion = resolver(model, variables, (len(df), rejilla.franjas_totales))
+    desglose = evaluar_calidad(asignacion, df, len(rejilla.franjas_por_dia), reglas, rejilla=rejilla)
+    assert solver.ObjectiveValue() == total(desglose)
+    # Todos los términos están presentes y penalizan algo en este horario
+    assert set(desglose) == {"regla:ana", "regla:ingles_diario", "huecos", "bloques", "reparto"}
+    assert all(termino["cantidad"] > 0 for termino in desglose.values())
+
+
+def test_objetivo_con_horario_previo(rejilla):
+    df = tabla(FILAS)
+    forma = (len(df), rejilla.franjas_totales)
+    # Horario anterior sin reglas: con ellas muchas de sus franjas tienen que moverse
+    sin_reglas = compilar([], df, rejilla)
+    model, variables, _ = construir_modelo(df, rejilla.dias, rejilla.franjas_por_dia, sin_reglas)
+    _, previa = resolver(model, variables, forma)
+
+    reglas = compilar(REGLAS, df, rejilla, pesos=PESOS_REGLAS)
+    model, variables, objetivo = construir_modelo(df, rejilla.dias, rejilla.franjas_por_dia, reglas)
+    preparar_incremental(model, variables, previa, np.ones(len(df), dtype=bool), fijar=False, objetivo=objetivo)
+    solver, asignacion = resolver(model, variables, forma)
+    desglose = evaluar_calidad(asignacion, df, len(rejilla.franjas_por_dia), reglas, previa=previa)
+    assert desglose["cambios"]["cantidad"] == int((previa.astype(bool) & ~asignacion.astype(bool)).sum()) > 0
+    assert solver.ObjectiveValue() == total(desglose)
+
+
+def test_objetivo_con_periodos_de_55_minutos():
+    tarde = rejilla_desde_datos({"inicio": "15:00", "fin": "20:50", "minutos": 55, "recreos": ["16:50-17:15"]})
+    # Con un periodo por hora las clases van en horas completas
+    df = tabla([
+        ("Ana", "Lengua", "1ºA", 3),
+        ("Ana", "Lengua", "1ºB", 3),
+        ("Luis", "Inglés", "1ºA", 2),
+        ("Luis", "Inglés", "1ºB", 2),
+        ("Marta", "Matemáticas", "1ºA", 2),
+    ], franjas_por_hora=tarde.franjas_por_hora)
+    reglas_tarde = [
+        {"id": "ana", "tipo": "disponibilidad", "filas": {"profesor": "Ana"}, "dias": ["Lunes"]},
+        {"id": "luis", "tipo": "prohibido", "filas": {"profesor": "Luis"}, "desde": "16:50", "hasta": "19:00"},
+    ]
+    reglas = compilar(reglas_tarde, df, tarde, pesos={"ana": 1})
+    duraciones = tarde.duraciones_en_franjas((60, 90))
+    model, variables, _ = construir_modelo(
+        df, tarde.dias, tarde.franjas_por_dia, reglas, duraciones=duraciones, rejilla=tarde,
+    )
+    solver, asignacion = resolver(model, variables, (len(df), tarde.franjas_totales))
+    desglose = evaluar_calidad(asignacion, df, len(tarde.franjas_por_dia), reglas, rejilla=tarde)
+    # Con periodos de 55 minutos una franja suelta ya es una clase: no hay término de bloques
+    assert "bloques" not in desglose
+    assert solver.ObjectiveValue() == total(desglose)
+
+
+def test_registro_de_busqueda_solo_al_medir():
+    solver = configurar_solver("Moderado")
+    assert not solver.parameters.log_search_progress
+    assert not solver.parameters.log_to_response
+    medido = configurar_solver("Moderado", registro_busqueda=True)
+    assert medido.parameters.log_search_progress and medido.parameters.log_to_response
+    assert not medido.parameters.log_to_stdout
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from conftest import compilar, tabla
+from horarios.reglas import _regla_desde_fila
+
+
+@pytest.fixture
+def df():
+    return tabla([
+        ("Ana", "Lengua", "1ºA", 2),
+        ("Ana", "Lengua", "1ºB", 2),
+        ("Luis", "Inglés", "1ºA", 1),
+        ("Marta", "Inglés", "1ºB", 1),
+    ])
+
+
+def test_fila_de_excel_a_regla():
+    regla = _regla_desde_fila({
+        "id": " ana ", "tipo": "disponibilidad", "profesor": "Ana", "curso": "1ºA;1ºB",
+        "dias": "Lunes; Martes", "desde": "09:00:00", "hasta": "11:00:00", "minimo": float("nan"),
+        "peso": 3, "descripcion": "",
+    })
+    assert regla == {
+        "id": "ana", "tipo": "disponibilidad", "grupo": "Profesores",
+        # Un solo valor se busca como subcadena; varios, por nombre exacto
+        "filas": {"profesor": "Ana", "curso": ["1ºA", "1ºB"]},
+        "dias": ["Lunes", "Martes"], "desde": "09:00", "hasta": "11:00", "peso": 3,
+    }
+
+
+def test_recreo_nunca_permitido(df, rejilla):
+    compiladas = compilar([], df, rejilla)
+    assert not compiladas.permitidas[:, list(rejilla.franjas_recreo)].any()
+    assert compiladas.permitidas.sum(axis=1).tolist() == [rejilla.franjas_utiles] * len(df)
+
+
+def test_disponibilidad_y_prohibido(df, rejilla):
+    reglas = [
+        {"id": "ana", "tipo": "disponibilidad", "filas": {"profesor": "Ana"},
+         "dias": ["Lunes"], "desde": "09:00", "hasta": "10:00"},
+        {"id": "luis", "tipo": "prohibido", "filas": {"profesor": "Luis"}, "desde": "09:00", "hasta": "12:00"},
+    ]
+    compiladas = compilar(reglas, df, rejilla)
+    # Ana: solo las dos medias horas del lunes de 9:00 a 10:00
+    for fila in (0, 1):
+        assert np.flatnonzero(compiladas.permitidas[fila]).tolist() == [0, 1]
+    # Luis: ninguna franja antes de las 12:00 ningún día
+    por_dia = compiladas.permitidas[2].reshape(len(rejilla.dias), -1)
+    assert not por_dia[:, :6].any() and por_dia[:, 7:].all()
+    # Marta no cambia
+    assert compiladas.permitidas[3].sum() == rejilla.franjas_utiles
+    assert compiladas.aplicadas == ["ana", "luis"]
+    assert [id_ for id_, _, _ in compiladas.ventanas] == ["ana", "luis"]
+
+
+def test_regla_con_peso_es_blanda(df, rejilla):
+    reglas = [{"id": "ana", "tipo": "disponibilidad", "filas": {"profesor": "Ana"}, "dias": ["Lunes"]}]
+    compiladas = compilar(reglas, df, rejilla, pesos={"ana": 5})
+    assert compiladas.permitidas[:2].sum() == 2 * rejilla.franjas_utiles
+    [(id_, tipo, filas, ventana, peso)] = compiladas.blandas
+    assert (id_, tipo, filas.tolist(), peso) == ("ana", "disponibilidad", [0, 1], 5)
+    assert ventana.sum() == len(rejilla.franjas_por_dia)
+
+
+def test_minimo_diario_y_exclusion(df, rejilla):
+    reglas = [
+        {"id": "ingles_diario", "tipo": "minimo_diario", "filas": {"asignatura": "Inglés"}, "minimo": 1},
+        {"id": "ana_sin_ingles", "tipo": "exclusion", "filas": {"profesor": "Ana", "curso": ["1ºA"]},
+         "con": {"asignatura": "Inglés"}},
+    ]
+    compiladas = compilar(reglas, df, rejilla)
+    [(id_, filas, minimo)] = compiladas.minimos_diarios
+    assert (id_, filas.tolist(), minimo) == ("ingles_diario", [2, 3], 1)
+    [(id_, filas)] = compiladas.exclusiones
+    assert (id_, filas.tolist()) == ("ana_sin_ingles", [0, 2, 3])
+
+
+def test_solo_en_otros_niveles_no_se_aplica(df, rejilla):
+    reglas = [{"id": "ana", "tipo": "prohibido", "filas": {"profesor": "Ana"}, "solo_en": ["Estricto"]}]
+    assert compilar(reglas, df, rejilla, "Moderado").aplicadas == []
+    assert compilar(reglas, df, rejilla, "Estricto").aplicadas == ["ana"]
+
+
+def test_dia_desconocido(df, rejilla):
+    reglas = [{"id": "ana", "tipo": "prohibido", "filas": {"profesor": "Ana"}, "dias": ["Sábado"]}]
+    with pytest.raises(ValueError, match="Regla 'ana'"):
+        compilar(reglas, df, rejilla)
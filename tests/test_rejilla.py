@@ -0,0 +1,44 @@
+import pytest
+
+from horarios.calidad import penaliza_sueltas, tope_diario
+from horarios.rejilla import rejilla_desde_datos
+from horarios.sesiones import DURACIONES_POR_DEFECTO
+
+
+@pytest.fixture
+def tarde():
+    """Periodos de 55 minutos, como la rejilla de ejemplo del módulo ``rejilla``."""
+    return rejilla_desde_datos({
+        "inicio": "15:00", "fin": "20:50", "minutos": 55, "recreos": ["16:50-17:15"],
+    })
+
+
+def test_rejilla_de_tarde(tarde):
+    assert tarde.franjas_por_dia[:3] == ("15:00-15:55", "15:55-16:50", "16:50-17:15")
+    assert tarde.minutos_franja == 55
+    assert (tarde.franjas_por_hora, tarde.franjas_clase_minima) == (1, 1)
+
+
+def test_duraciones_en_franjas(rejilla, tarde):
+    assert rejilla.duraciones_en_franjas(DURACIONES_POR_DEFECTO) == (2, 3)
+    # Con periodos de 55 minutos una sola franja ya es una clase
+    assert tarde.duraciones_en_franjas(DURACIONES_POR_DEFECTO) == (1, 2)
+    assert rejilla.duraciones_en_franjas((90, 60, 90)) == (2, 3)
+
+
+@pytest.mark.parametrize("minutos", [(30,), (30, 60), (), (0, 60)])
+def test_duraciones_mas_cortas_que_una_clase(rejilla, minutos):
+    with pytest.raises(ValueError, match="al menos 60 minutos"):
+        rejilla.duraciones_en_franjas(minutos)
+
+
+def test_tope_diario(rejilla, tarde):
+    # Medias horas: nunca menos de hora y media y, si no, horas completas del reparto equilibrado
+    assert tope_diario([2, 4, 11, 24], 5, rejilla).tolist() == [3, 3, 4, 6]
+    assert tope_diario([2, 4, 11, 24], 5, tarde).tolist() == [2, 2, 3, 5]
+
+
+def test_penaliza_sueltas(rejilla, tarde):
+    assert penaliza_sueltas(rejilla)
+    assert not penaliza_sueltas(tarde)
+
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from conftest import compilar, tabla
+from horarios.sesiones import (
+    dividir_en_sesiones,
+    filas_compatibles,
+    inicios_posibles,
+    sesiones_por_fila,
+    sesiones_que_caben,
+)
+
+
+@pytest.mark.parametrize("franjas, duraciones, esperado", [
+    (5, (2, 3), (3, 2)),
+    (4, (2, 3), (2, 2)),
+    (7, (2, 3), (3, 2, 2)),
+    (6, (3, 2), (2, 2, 2)),
+    # Rejilla de 55 minutos: sesiones de una y dos franjas
+    (3, (1, 2), (1, 1, 1)),
+    # Sin combinación exacta se admiten sesiones de una franja
+    (1, (2, 3), (1,)),
+])
+def test_dividir_en_sesiones(franjas, duraciones, esperado):
+    assert dividir_en_sesiones(franjas, duraciones) == esperado
+    assert sum(esperado) == franjas
+
+
+def test_minimo_diario_va_franja_a_franja(rejilla):
+    df = tabla([("Ana", "Lengua", "1ºA", 2.5), ("Luis", "Inglés", "1ºA", 3)])
+    reglas = [{"id": "ingles_diario", "tipo": "minimo_diario", "filas": {"asignatura": "Inglés"}, "minimo": 1}]
+    necesarias = df["Franjas_necesarias"].astype(int)
+    assert sesiones_por_fila(necesarias, (2, 3)) == [(3, 2), (2, 2, 2)]
+    assert sesiones_por_fila(necesarias, (2, 3), compilar(reglas, df, rejilla)) == [(3, 2), None]
+
+
+def test_inicios_respetan_recreo_y_final_del_dia(rejilla):
+    franjas_dia = len(rejilla.franjas_por_dia)
+    permitidas = np.ones((1, rejilla.franjas_totales), dtype=bool)
+    permitidas[:, list(rejilla.franjas_recreo)] = False
+    inicios = inicios_posibles(permitidas, 3, franjas_dia).reshape(len(rejilla.dias), franjas_dia)
+    recreo = rejilla.franjas_recreo[0] % franjas_dia
+    # Antes del recreo (franjas 0-5) caben inicios en 0-3; después (7-9), solo en 7
+    esperado = [f for f in range(franjas_dia) if f + 3 <= recreo or f == recreo + 1]
+    for dia in inicios:
+        assert np.flatnonzero(dia).tolist() == esperado
+
+
+def test_sesiones_no_cruzan_de_un_dia_al_siguiente():
+    # Dos días de cuatro franjas: libres las dos últimas del lunes y las dos primeras del martes
+    permitidas = np.array([[0, 0, 1, 1, 1, 1, 0, 0]], dtype=bool)
+    assert not inicios_posibles(permitidas, 3, 4).any()
+    assert np.flatnonzero(inicios_posibles(permitidas, 2, 4)).tolist() == [2, 4]
+    assert sesiones_que_caben(permitidas, 2, 4).tolist() == [2]
+    assert sesiones_que_caben(permitidas, 3, 4).tolist() == [0]
+
+
+def test_filas_compatibles():
+    asignacion = np.array([
+        [1, 1, 1, 0, 1, 1, 0, 0],
+        [1, 1, 1, 1, 1, 0, 0, 0],
+        [1, 0, 1, 0, 0, 0, 0, 0],
+    ])
+    sesiones = [(3, 2), (3, 2), None]
+    # La segunda fila junta sus dos sesiones en un tramo de cinco franjas
+    assert filas_compatibles(asignacion, sesiones, 8).tolist() == [True, False, True]
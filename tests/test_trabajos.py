@@ -0,0 +1,156 @@
+import random
+import threading
+import time
+
+import pytest
+
+from horarios import trabajos as modulo_trabajos
+from horarios.trabajos import ColaTrabajos
+
+ESPERA = 30
+
+
+def hasta_que(condicion, segundos=ESPERA):
+    """Espera activa corta: las pruebas solo avanzan cuando la cola llega al estado esperado."""
+    limite = time.perf_counter() + segundos
+    while not condicion():
+        assert time.perf_counter() < limite, "la cola no llegó al estado esperado"
+        time.sleep(0.01)
+
+
+def test_limite_de_resoluciones_simultaneas():
+    cola = ColaTrabajos(max_simultaneos=2)
+    soltar = threading.Event()
+    bloqueo = threading.Lock()
+    activos = [0]
+    maximo = [0]
+
+    def tarea(trabajo, n):
+        with bloqueo:
+            activos[0] += 1
+            maximo[0] = max(maximo[0], activos[0])
+        soltar.wait(ESPERA)
+        with bloqueo:
+            activos[0] -= 1
+        return n
+
+    enviados = [cola.enviar(tarea, n) for n in range(5)]
+    hasta_que(lambda: cola.en_curso() == 2)
+    assert [t.estado for t in enviados] == ["en_curso"] * 2 + ["en_cola"] * 3
+    assert [cola.posicion(t) for t in enviados[2:]] == [0, 1, 2]
+    soltar.set()
+    hasta_que(lambda: all(t.terminado for t in enviados))
+    assert maximo[0] == 2
+    assert [t.resultado for t in enviados] == list(range(5))
+    assert all(t.estado == "terminado" for t in enviados)
+
+
+def test_cancelar_en_cola_no_llega_a_ejecutarse():
+    cola = ColaTrabajos(max_simultaneos=1)
+    soltar = threading.Event()
+    ejecutados = []
+
+    def tarea(trabajo, n):
+        ejecutados.append(n)
+        soltar.wait(ESPERA)
+
+    primero = cola.enviar(tarea, 1)
+    segundo = cola.enviar(tarea, 2)
+    hasta_que(lambda: primero.estado == "en_curso")
+    segundo.cancelar()
+    assert segundo.estado == "cancelado" and segundo.terminado
+    soltar.set()
+    hasta_que(lambda: primero.terminado)
+    assert ejecutados == [1]
+
+
+def test_error_queda_en_el_trabajo():
+    cola = ColaTrabajos(max_simultaneos=1)
+
+    def tarea(trabajo):
+        raise ValueError("datos rotos")
+
+    trabajo = cola.enviar(tarea)
+    hasta_que(lambda: trabajo.terminado)
+    assert (trabajo.estado, trabajo.error) == ("error", "datos rotos")
+
+
+def test_retencion(monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr(modulo_trabajos.time, "time", lambda: reloj[0])
+    cola = ColaTrabajos(max_simultaneos=2, retencion=60)
+    soltar = threading.Event()
+
+    terminado = cola.enviar(lambda trabajo: "hecho")
+    largo = cola.enviar(lambda trabajo: soltar.wait(ESPERA))
+    hasta_que(lambda: terminado.terminado and largo.estado == "en_curso")
+
+    # Dentro del plazo sigue disponible
+    reloj[0] += 59
+    cola.enviar(lambda trabajo: None)
+    assert cola.obtener(terminado.id) is terminado
+    # Pasado el plazo se purga al enviar otro; el que sigue en curso se conserva aunque sea antiguo
+    reloj[0] += 2
+    cola.enviar(lambda trabajo: None)
+    assert cola.obtener(terminado.id) is None
+    assert cola.obtener(largo.id) is largo
+    soltar.set()
+
+
+@pytest.fixture
+def busqueda_larga():
+    """Tarea con una ``ResolucionEnCurso`` que no demuestra el óptimo antes del límite de 60 s."""
+    cp_model = pytest.importorskip("ortools.sat.python.cp_model")
+    from horarios.resolucion import ResolucionEnCurso
+
+    def tarea(trabajo, construido=None):
+        # MAX-3-SAT aleatorio con muchas más cláusulas que variables: la cota inferior no se alcanza
+        aleatorio = random.Random(0)
+        model = cp_model.CpModel()
+        x = [model.NewBoolVar(f"x{i}") for i in range(150)]
+        incumplidas = []
+        for c in range(900):
+            literales = [x[i] if aleatorio.random() < 0.5 else x[i].Not() for i in aleatorio.sample(range(150), 3)]
+            incumplida = model.NewBoolVar(f"incumplida{c}")
+            model.AddBoolOr(literales + [incumplida])
+            incumplidas.append(incumplida)
+        model.Minimize(cp_model.LinearExpr.Sum(incumplidas))
+        if construido is not None:
+            construido.wait(ESPERA)
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = 60
+        solver.parameters.num_workers = 1
+        ejecucion = ResolucionEnCurso(model, solver, {(0, i): v for i, v in enumerate(x)}, (1, len(x)), 60)
+        trabajo.asignar_ejecucion(ejecucion)
+        ejecucion.esperar()
+        return ejecucion
+
+    return tarea
+
+
+def test_cancelar_antes_de_la_busqueda_la_detiene(busqueda_larga):
+    cola = ColaTrabajos(max_simultaneos=1)
+    construido = threading.Event()
+    trabajo = cola.enviar(busqueda_larga, construido)
+    hasta_que(lambda: trabajo.estado == "en_curso")
+    # Cancelado mientras se construye el modelo: la búsqueda recibe la orden al registrarse
+    trabajo.cancelar()
+    assert trabajo.estado == "en_curso" and trabajo.cancelado
+    construido.set()
+    hasta_que(lambda: trabajo.terminado)
+    ejecucion = trabajo.resultado
+    assert ejecucion.detenida and ejecucion.seguimiento.detener.is_set()
+    assert ejecucion.tiempo_resolucion < 10
+    assert ejecucion.estado in ("UNKNOWN", "FEASIBLE")
+
+
+def test_cancelar_en_curso_conserva_la_mejor_solucion(busqueda_larga):
+    cola = ColaTrabajos(max_simultaneos=1)
+    trabajo = cola.enviar(busqueda_larga)
+    hasta_que(lambda: trabajo.ejecucion is not None and trabajo.ejecucion.seguimiento.soluciones > 0)
+    trabajo.cancelar()
+    hasta_que(lambda: trabajo.terminado)
+    ejecucion = trabajo.resultado
+    assert ejecucion.detenida and ejecucion.seguimiento.detener.is_set()
+    assert ejecucion.tiempo_resolucion < 10
+    assert ejecucion.estado == "FEASIBLE" and ejecucion.asignacion is not None